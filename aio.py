@@ -0,0 +1,155 @@
+"""
+Nextwave Company Website - Async view support
+Bounded thread pools that async views await for SQLite and file I/O, so the
+event loop never blocks on either, plus the runner that lets the same async
+views serve under the sync dev server and gunicorn workers.
+
+Under WSGI (`app.run()`, sync gunicorn workers) an async view runs on the
+request thread's own event loop and every executor call runs directly: the
+view behaves exactly like its sync predecessor, and any other await works
+as it would on any loop. The ASGI entry point (asgi.py) runs requests the
+same way, a thread each. Awaited on a shared event loop instead, each call
+is handed to the executor, with the request context copied along.
+"""
+
+import os
+import asyncio
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g, request
+import db
+
+DEFAULT_FILE_WORKERS = 4
+
+# Set while an async view is driven synchronously by a WSGI worker
+_inline = contextvars.ContextVar('aio_inline', default=False)
+# Per-thread event loop those views run on, reused across requests
+_loops = threading.local()
+
+
+class Executor:
+    """Bounded thread pool for blocking calls made from async views"""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self._pid = None
+        self._lock = threading.Lock()
+        self._submitted = 0
+
+    def _pool(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Threads do not survive a fork into a worker process
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+                    self._pid = os.getpid()
+        return self._executor
+
+    async def run(self, func, *args):
+        """Await func(*args) on the pool (called directly under WSGI)"""
+        if _inline.get():
+            return func(*args)
+        context = contextvars.copy_context()
+        self._submitted += 1
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool(), functools.partial(context.run, func, *args))
+
+    def stats(self):
+        pool = self._executor if self._pid == os.getpid() else None
+        return {
+            'workers': self.workers,
+            'queued': pool._work_queue.qsize() if pool is not None else 0,
+            'submitted': self._submitted,
+        }
+
+
+database = Executor('aio-db', db.DEFAULT_POOL_SIZE)
+files = Executor('aio-files', DEFAULT_FILE_WORKERS)
+
+
+def init_app(app):
+    """Size the executors and run async views inline under WSGI"""
+    # One thread per pooled connection, so a call never waits for both
+    database.workers = app.config.get('ASYNC_DB_WORKERS', app.config.get('DB_POOL_SIZE', db.DEFAULT_POOL_SIZE))
+    files.workers = app.config.get('ASYNC_FILE_WORKERS', DEFAULT_FILE_WORKERS)
+    app.async_to_sync = run_inline
+    app.extensions['aio'] = {'database': database, 'files': files}
+
+
+def serving_async():
+    """Whether the current view is running on a shared event loop"""
+    return not _inline.get()
+
+
+def _thread_loop():
+    loop = getattr(_loops, 'loop', None)
+    if loop is None or _loops.pid != os.getpid():
+        # A loop inherited through a fork shares its selector with the parent
+        loop = _loops.loop = asyncio.new_event_loop()
+        _loops.pid = os.getpid()
+    return loop
+
+
+def run_inline(func):
+    """Flask's async_to_sync for WSGI workers
+
+    Runs the view to completion on this thread's event loop, created once
+    per thread rather than per request. Executor calls return without
+    suspending while _inline is set; any other await (asyncio.sleep,
+    another library's client) suspends and resumes on that loop.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _inline.set(True)
+        try:
+            return _thread_loop().run_until_complete(func(*args, **kwargs))
+        finally:
+            _inline.reset(token)
+    return wrapper
+
+
+async def query(func, *args):
+    """Await func(conn, *args) with a database connection
+
+    On the event loop the connection is borrowed for this call only, so
+    requests do not hold pooled connections across awaits.
+    """
+    if _inline.get():
+        return func(current_app.extensions['instrumentation'].traced(db.get_db()), *args)
+
+    def call():
+        with db.borrowed() as conn:
+            return func(current_app.extensions['instrumentation'].traced(conn), *args)
+    return await database.run(call)
+
+
+async def call(func, *args):
+    """Await func(*args) on the database executor, for code using get_db()
+
+    A pooled connection the call takes for the request is returned before
+    the await completes, as with query().
+    """
+    if _inline.get():
+        return func(*args)
+
+    def run():
+        held = 'db' in g
+        try:
+            return func(*args)
+        finally:
+            if not held:
+                db.close_db()
+    return await database.run(run)
+
+
+async def load_form():
+    """Parse the request body off the event loop
+
+    Uploaded files are written to disk while the form is parsed.
+    """
+    def parse():
+        return request.form, request.files
+    return await files.run(parse)
@@ -4,13 +4,36 @@ Nextwave Company Website - Flask Application
 A dynamic and fully responsive corporate website for Nextwave
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
-import sqlite3
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, flash
+import io
 import os
+import inspect
+import contextlib
+import click
 import datetime
-from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+import time
+from werkzeug.security import generate_password_hash
 import logging
+import aio
+import archive
+import assets
+import bulk
+import dashboard_stats
+import db
+import http_cache
+import images
+import instrumentation
+import live_feed
+import login_throttle
+import migrations
+import page_cache
+import pagination
+import prerender
+import related
+import replication
+import search_index
+import uploads
+import write_behind
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,98 +42,72 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = 'nextwave_secret_key_2024'  # Change this in production
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024
+uploads.UploadStore(app)
+app.jinja_env.filters['highlight'] = search_index.highlight_snippet
+assets.init_app(app)
+images.ImageVariants(app)
 
 # Database setup
-DATABASE = 'nextwave.db'
+DATABASE = os.environ.get('NEXTWAVE_DATABASE', 'nextwave.db')
+app.config['DATABASE'] = DATABASE
+db.init_app(app)
+
+# Every entry point (app.run, gunicorn app:app, asgi:application) migrates on startup;
+# a new file is created with incremental vacuum (see init_db)
+with contextlib.closing(db.connect(DATABASE, auto_vacuum='INCREMENTAL')) as conn:
+    migrations.migrate(conn)
+
+# Async views run on a per-thread event loop, calling SQLite and file I/O directly (see aio.py)
+aio.init_app(app)
+
+# SQL, template and session timings (set PROFILE_SAMPLE_RATE to profile slow requests)
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+instrumentation.Instrumentation(app)
+
+# Login attempts are rate limited per IP and username before any hashing
+app.config['LOGIN_LIMIT_DATABASE'] = os.environ.get('LOGIN_LIMIT_DATABASE', login_throttle.DEFAULT_DATABASE)
+login_throttle.LoginThrottle(app)
+
+# Page cache (set PAGE_CACHE_DIR to share entries between gunicorn workers)
+app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR')
+page_cache.PageCache(app)
+write_behind.WriteBehindQueue(app)
+
+# Static snapshot of the public pages, served when present (set PRERENDER_DIR)
+app.config['PRERENDER_DIR'] = os.environ.get('PRERENDER_DIR')
+app.config['PRERENDER_WATCH_INTERVAL'] = float(os.environ.get('PRERENDER_WATCH_INTERVAL',
+                                                             prerender.DEFAULT_WATCH_INTERVAL))
+prerender.Prerenderer(app)
+
+# Cold job applications and messages move to ARCHIVE_DATABASE (set ARCHIVE_INTERVAL to run in the app)
+app.config['ARCHIVE_DATABASE'] = os.environ.get('ARCHIVE_DATABASE')
+app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', archive.DEFAULT_AFTER_DAYS))
+app.config['ARCHIVE_INTERVAL'] = float(os.environ.get('ARCHIVE_INTERVAL', 0))
+archive.Archiver(app)
+
+# Replication: the writer node sets REPLICATION_PUBLISH_DIR; reader nodes set
+# REPLICATION_SOURCE (that directory or its URL) and REPLICATION_REPLICA, and
+# serve anonymous GET requests from the local replica
+for key in ('REPLICATION_PUBLISH_DIR', 'REPLICATION_SOURCE', 'REPLICATION_REPLICA', 'REPLICATION_TOKEN'):
+    app.config[key] = os.environ.get(key)
+app.config['REPLICATION_PUBLISH_INTERVAL'] = float(os.environ.get('REPLICATION_PUBLISH_INTERVAL', 0))
+app.config['REPLICATION_SYNC_INTERVAL'] = float(os.environ.get('REPLICATION_SYNC_INTERVAL', 0))
+replication.Replica(app)
+
+# New submissions and counter changes pushed to open dashboards (/admin/events)
+app.config['LIVE_FEED_MAX_CLIENTS'] = int(os.environ.get('LIVE_FEED_MAX_CLIENTS', live_feed.DEFAULT_MAX_CLIENTS))
+live_feed.LiveFeed(app)
+http_cache.init_app(app)
 
 def init_db():
     """Initialize database with required tables"""
-    conn = sqlite3.connect(DATABASE)
+    # New files only; existing ones need `flask archive-data --enable-incremental-vacuum`
+    conn = db.connect(DATABASE, auto_vacuum='INCREMENTAL')
     c = conn.cursor()
-    
-    # Users table for admin authentication
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    email TEXT,
-                    role TEXT DEFAULT 'admin',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )''')
-    
-    # Blog posts table
-    c.execute('''CREATE TABLE IF NOT EXISTS blog_posts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    author TEXT NOT NULL,
-                    category TEXT,
-                    featured_image TEXT,
-                    published BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )''')
-    
-    # Services table
-    c.execute('''CREATE TABLE IF NOT EXISTS services (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    icon TEXT,
-                    featured BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )''')
-    
-    # Job listings table
-    c.execute('''CREATE TABLE IF NOT EXISTS jobs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    department TEXT NOT NULL,
-                    location TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    requirements TEXT,
-                    salary_range TEXT,
-                    active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )''')
-    
-    # Job applications table
-    c.execute('''CREATE TABLE IF NOT EXISTS job_applications (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    job_id INTEGER NOT NULL,
-                    name TEXT NOT NULL,
-                    email TEXT NOT NULL,
-                    phone TEXT,
-                    resume_path TEXT,
-                    cover_letter TEXT,
-                    status TEXT DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (job_id) REFERENCES jobs (id)
-                )''')
-    
-    # Contact messages table
-    c.execute('''CREATE TABLE IF NOT EXISTS contact_messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT NOT NULL,
-                    subject TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    status TEXT DEFAULT 'unread',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )''')
-    
-    # Events table (optional feature)
-    c.execute('''CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    date_time TEXT NOT NULL,
-                    location TEXT,
-                    category TEXT,
-                    active BOOLEAN DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )''')
+
+    # Bring the schema up to date
+    migrations.migrate(conn)
     
     # Create default admin user
     admin_exists = c.execute('SELECT COUNT(*) FROM users WHERE username = ?', ('admin',)).fetchone()[0]
@@ -176,22 +173,116 @@ def insert_sample_data(cursor):
         cursor.executemany('INSERT INTO jobs (title, department, location, type, description, requirements, salary_range, active) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', jobs)
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get the pooled database connection for the current request"""
+    return app.extensions['instrumentation'].traced(db.get_db())
 
 # Authentication decorator
 def login_required(f):
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            return redirect(url_for('admin_login'))
-        return f(*args, **kwargs)
+    if inspect.iscoroutinefunction(f):
+        async def decorated_function(*args, **kwargs):
+            if 'user_id' not in session:
+                return redirect(url_for('admin_login'))
+            return await f(*args, **kwargs)
+    else:
+        def decorated_function(*args, **kwargs):
+            if 'user_id' not in session:
+                return redirect(url_for('admin_login'))
+            return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
-    return decorated_function
+    # Pages behind the login are per-operator: never kept by any cache
+    return http_cache.no_store(decorated_function)
+
+# Conditional GET validators
+def blog_post_validator(post_id):
+    """ETag stamp for a published blog post
+
+    No Last-Modified: the page also lists related posts, and a rebuilt
+    related_posts list has no timestamp to report. The ETag covers it.
+    """
+    post = get_db_connection().execute(
+        'SELECT updated_at FROM blog_posts WHERE id = ? AND published = 1', (post_id,)
+    ).fetchone()
+    if not post:
+        return None
+    return post['updated_at'], None
+
+def job_validator(job_id):
+    """ETag stamp for an active job (jobs have no updated_at to trust)"""
+    job = get_db_connection().execute(
+        'SELECT created_at FROM jobs WHERE id = ? AND active = 1', (job_id,)
+    ).fetchone()
+    if not job:
+        return None
+    return job['created_at'], None
+
+# Listing queries shared by the HTML pages and the infinite-scroll API
+def fetch_blog_page(conn, search_query, category_filter, cursor, size):
+    """One page of published posts matching the blog filters"""
+    where = 'c.published = 1'
+    params = []
+    
+    if category_filter:
+        where += ' AND c.category = ?'
+        params.append(category_filter)
+    
+    if search_query:
+        # Ranked full-text search
+        return pagination.search_page(
+            lambda limit, offset: search_index.search(conn, 'blog_posts', search_query, where, params, limit, offset),
+            cursor, size)
+    
+    return pagination.keyset_page(conn, 'blog_posts', where, params, cursor, size)
+
+def fetch_jobs_page(conn, search_query, department_filter, location_filter, cursor, size):
+    """One page of active jobs matching the careers filters, plus the total"""
+    where = 'c.active = 1'
+    params = []
+    
+    if department_filter:
+        where += ' AND c.department = ?'
+        params.append(department_filter)
+    
+    if location_filter:
+        where += ' AND c.location LIKE ?'
+        params.append(f'%{location_filter}%')
+    
+    if search_query:
+        # Ranked full-text search
+        jobs, next_cursor = pagination.search_page(
+            lambda limit, offset: search_index.search(conn, 'jobs', search_query, where, params, limit, offset),
+            cursor, size)
+        total = search_index.count(conn, 'jobs', search_query, where, params)
+    else:
+        jobs, next_cursor = pagination.keyset_page(conn, 'jobs', where, params, cursor, size)
+        total = conn.execute(f'SELECT COUNT(*) FROM jobs c WHERE {where}', params).fetchone()[0]
+    
+    return jobs, next_cursor, total
+
+def fetch_blog_categories(conn):
+    """Categories for the blog filter"""
+    return page_cache.cached_fragment('blog_categories', ('blog_posts',), lambda: [
+        dict(row) for row in conn.execute('SELECT DISTINCT category FROM blog_posts WHERE published = 1')
+    ])
+
+def fetch_job_filters(conn):
+    """Departments and locations for the careers filters"""
+    departments = page_cache.cached_fragment('job_departments', ('jobs',), lambda: [
+        dict(row) for row in conn.execute('SELECT DISTINCT department FROM jobs WHERE active = 1')
+    ])
+    locations = page_cache.cached_fragment('job_locations', ('jobs',), lambda: [
+        dict(row) for row in conn.execute('SELECT DISTINCT location FROM jobs WHERE active = 1')
+    ])
+    return departments, locations
+
+# Global search memo (per worker, dropped whenever content changes)
+SEARCH_DEFAULT_LIMIT = 9
+SEARCH_MAX_LIMIT = 50
+search_memo = search_index.SearchMemo()
 
 # Routes
 @app.route('/')
+@http_cache.conditional('services', 'blog_posts')
+@page_cache.cached_page('services', 'blog_posts')
 def index():
     """Home page"""
     conn = get_db_connection()
@@ -210,14 +301,13 @@ def index():
         'years_experience': 8
     }
     
-    conn.close()
-    
     return render_template('index.html', 
                          featured_services=featured_services,
                          recent_posts=recent_posts,
                          stats=stats)
 
 @app.route('/about')
+@http_cache.conditional()
 def about():
     """About page"""
     team_members = [
@@ -230,106 +320,83 @@ def about():
     return render_template('about.html', team_members=team_members)
 
 @app.route('/services')
+@http_cache.conditional('services')
+@page_cache.cached_page('services')
 def services():
     """Services page"""
     conn = get_db_connection()
     all_services = conn.execute('SELECT * FROM services ORDER BY featured DESC, title').fetchall()
-    conn.close()
     
     return render_template('services.html', services=all_services)
 
 @app.route('/blog')
-def blog():
+@http_cache.conditional('blog_posts')
+@page_cache.cached_page('blog_posts')
+async def blog():
     """Blog page"""
-    conn = get_db_connection()
-    
     # Get search and category filters
     search_query = request.args.get('search', '')
     category_filter = request.args.get('category', '')
     
-    query = 'SELECT * FROM blog_posts WHERE published = 1'
-    params = []
-    
-    if search_query:
-        query += ' AND (title LIKE ? OR content LIKE ?)'
-        params.extend([f'%{search_query}%', f'%{search_query}%'])
-    
-    if category_filter:
-        query += ' AND category = ?'
-        params.append(category_filter)
-    
-    query += ' ORDER BY created_at DESC'
-    
-    posts = conn.execute(query, params).fetchall()
+    posts, next_cursor = await aio.query(fetch_blog_page, search_query, category_filter,
+                                         request.args.get('cursor'), pagination.page_size())
     
     # Get categories for filter
-    categories = conn.execute('SELECT DISTINCT category FROM blog_posts WHERE published = 1').fetchall()
-    
-    conn.close()
+    categories = await aio.query(fetch_blog_categories)
     
     return render_template('blog.html', 
                          posts=posts, 
+                         next_cursor=next_cursor,
                          categories=categories,
                          search_query=search_query,
                          category_filter=category_filter)
 
 @app.route('/blog/<int:post_id>')
+@http_cache.conditional('blog_posts', 'related_posts', validator=blog_post_validator)
+@page_cache.cached_page('blog_posts', 'related_posts')
 def blog_post(post_id):
     """Individual blog post page"""
     conn = get_db_connection()
     post = conn.execute('SELECT * FROM blog_posts WHERE id = ? AND published = 1', (post_id,)).fetchone()
     
     if not post:
-        conn.close()
         return render_template('404.html'), 404
     
-    # Get related posts
+    # Precomputed by `flask build-related`; same-category posts until then
     related_posts = conn.execute(
-        'SELECT * FROM blog_posts WHERE id != ? AND category = ? AND published = 1 ORDER BY created_at DESC LIMIT 3',
-        (post_id, post['category'])
+        'SELECT p.* FROM related_posts r JOIN blog_posts p ON p.id = r.related_id '
+        'WHERE r.post_id = ? AND p.published = 1 ORDER BY r.rank LIMIT 3',
+        (post_id,)
     ).fetchall()
-    
-    conn.close()
+    if not related_posts:
+        related_posts = conn.execute(
+            'SELECT * FROM blog_posts WHERE id != ? AND category = ? AND published = 1 ORDER BY created_at DESC LIMIT 3',
+            (post_id, post['category'])
+        ).fetchall()
     
     return render_template('blog_post.html', post=post, related_posts=related_posts)
 
 @app.route('/careers')
-def careers():
+@http_cache.conditional('jobs')
+@page_cache.cached_page('jobs')
+async def careers():
     """Careers page"""
-    conn = get_db_connection()
-    
     # Get search and filter parameters
     search_query = request.args.get('search', '')
     department_filter = request.args.get('department', '')
     location_filter = request.args.get('location', '')
     
-    query = 'SELECT * FROM jobs WHERE active = 1'
-    params = []
-    
-    if search_query:
-        query += ' AND (title LIKE ? OR description LIKE ?)'
-        params.extend([f'%{search_query}%', f'%{search_query}%'])
-    
-    if department_filter:
-        query += ' AND department = ?'
-        params.append(department_filter)
-    
-    if location_filter:
-        query += ' AND location LIKE ?'
-        params.append(f'%{location_filter}%')
-    
-    query += ' ORDER BY created_at DESC'
-    
-    jobs = conn.execute(query, params).fetchall()
+    jobs, next_cursor, total_jobs = await aio.query(fetch_jobs_page, search_query, department_filter,
+                                                    location_filter, request.args.get('cursor'),
+                                                    pagination.page_size())
     
     # Get departments and locations for filters
-    departments = conn.execute('SELECT DISTINCT department FROM jobs WHERE active = 1').fetchall()
-    locations = conn.execute('SELECT DISTINCT location FROM jobs WHERE active = 1').fetchall()
-    
-    conn.close()
+    departments, locations = await aio.query(fetch_job_filters)
     
     return render_template('careers.html', 
                          jobs=jobs,
+                         next_cursor=next_cursor,
+                         total_jobs=total_jobs,
                          departments=departments,
                          locations=locations,
                          search_query=search_query,
@@ -337,30 +404,36 @@ def careers():
                          location_filter=location_filter)
 
 @app.route('/job/<int:job_id>')
+@http_cache.conditional('jobs', 'similar_jobs', validator=job_validator)
+@page_cache.cached_page('jobs', 'similar_jobs')
 def job_detail(job_id):
     """Job detail page"""
     conn = get_db_connection()
     job = conn.execute('SELECT * FROM jobs WHERE id = ? AND active = 1', (job_id,)).fetchone()
     
     if not job:
-        conn.close()
         return render_template('404.html'), 404
     
-    conn.close()
+    similar_jobs = conn.execute(
+        'SELECT j.* FROM similar_jobs s JOIN jobs j ON j.id = s.related_id '
+        'WHERE s.job_id = ? AND j.active = 1 ORDER BY s.rank LIMIT 3',
+        (job_id,)
+    ).fetchall()
     
-    return render_template('job_detail.html', job=job)
+    return render_template('job_detail.html', job=job, similar_jobs=similar_jobs)
 
 @app.route('/apply/<int:job_id>', methods=['GET', 'POST'])
-def apply_job(job_id):
+async def apply_job(job_id):
     """Job application form"""
-    conn = get_db_connection()
-    job = conn.execute('SELECT * FROM jobs WHERE id = ? AND active = 1', (job_id,)).fetchone()
+    job = await aio.query(lambda conn: conn.execute('SELECT * FROM jobs WHERE id = ? AND active = 1',
+                                                    (job_id,)).fetchone())
     
     if not job:
-        conn.close()
         return render_template('404.html'), 404
     
     if request.method == 'POST':
+        # Parsing writes the resume to disk, so it happens off the event loop
+        await aio.load_form()
         name = request.form['name']
         email = request.form['email']
         phone = request.form.get('phone', '')
@@ -371,42 +444,41 @@ def apply_job(job_id):
         if 'resume' in request.files:
             file = request.files['resume']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                if not os.path.exists(app.config['UPLOAD_FOLDER']):
-                    os.makedirs(app.config['UPLOAD_FOLDER'])
-                resume_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(resume_path)
+                # Already streamed to disk while the request body was parsed
+                resume_path = await aio.files.run(app.extensions['uploads'].save, file)
         
-        # Save application
-        conn.execute(
-            'INSERT INTO job_applications (job_id, name, email, phone, resume_path, cover_letter) VALUES (?, ?, ?, ?, ?, ?)',
-            (job_id, name, email, phone, resume_path, cover_letter)
-        )
-        conn.commit()
-        conn.close()
+        # Save application (journaled now, written to the database in the background)
+        await aio.files.run(app.extensions['write_behind'].enqueue, 'job_applications', {
+            'job_id': job_id,
+            'name': name,
+            'email': email,
+            'phone': phone,
+            'resume_path': resume_path,
+            'cover_letter': cover_letter
+        })
         
         flash('Application submitted successfully!', 'success')
         return redirect(url_for('careers'))
     
-    conn.close()
     return render_template('apply.html', job=job)
 
 @app.route('/contact', methods=['GET', 'POST'])
-def contact():
+async def contact():
     """Contact page"""
     if request.method == 'POST':
+        await aio.load_form()
         name = request.form['name']
         email = request.form['email']
         subject = request.form['subject']
         message = request.form['message']
         
-        conn = get_db_connection()
-        conn.execute(
-            'INSERT INTO contact_messages (name, email, subject, message) VALUES (?, ?, ?, ?)',
-            (name, email, subject, message)
-        )
-        conn.commit()
-        conn.close()
+        # Journaled now, written to the database in the background
+        await aio.files.run(app.extensions['write_behind'].enqueue, 'contact_messages', {
+            'name': name,
+            'email': email,
+            'subject': subject,
+            'message': message
+        })
         
         flash('Message sent successfully! We will get back to you soon.', 'success')
         return redirect(url_for('contact'))
@@ -415,17 +487,33 @@ def contact():
 
 # Admin routes
 @app.route('/admin/login', methods=['GET', 'POST'])
+@http_cache.no_store
 def admin_login():
     """Admin login"""
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        throttle = app.extensions['login_throttle']
+        
+        retry_after = throttle.check(request.remote_addr, username)
+        if retry_after:
+            flash('Too many login attempts. Please try again later.', 'error')
+            response = app.make_response((render_template('admin/login.html'), 429))
+            response.headers['Retry-After'] = str(int(retry_after) + 1)
+            return response
         
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
         
-        if user and check_password_hash(user['password'], password):
+        try:
+            valid = user is not None and throttle.verify(user['password'], password)
+        except (login_throttle.Busy, TimeoutError):
+            flash('The server is busy. Please try again in a moment.', 'error')
+            response = app.make_response((render_template('admin/login.html'), 503))
+            response.headers['Retry-After'] = '5'
+            return response
+        
+        if valid:
             session['user_id'] = user['id']
             session['username'] = user['username']
             return redirect(url_for('admin_dashboard'))
@@ -435,39 +523,163 @@ def admin_login():
     return render_template('admin/login.html')
 
 @app.route('/admin/logout')
+@http_cache.no_store
 def admin_logout():
     """Admin logout"""
     session.clear()
     return redirect(url_for('index'))
 
+def newest(live, archived, limit=5):
+    """The `limit` most recent of live and archived rows"""
+    return sorted(list(live) + list(archived), key=lambda row: row['created_at'], reverse=True)[:limit]
+
 @app.route('/admin')
 @login_required
 def admin_dashboard():
     """Admin dashboard"""
     conn = get_db_connection()
     
-    # Get statistics
-    stats = {
-        'total_posts': conn.execute('SELECT COUNT(*) FROM blog_posts').fetchone()[0],
-        'published_posts': conn.execute('SELECT COUNT(*) FROM blog_posts WHERE published = 1').fetchone()[0],
-        'total_services': conn.execute('SELECT COUNT(*) FROM services').fetchone()[0],
-        'active_jobs': conn.execute('SELECT COUNT(*) FROM jobs WHERE active = 1').fetchone()[0],
-        'pending_applications': conn.execute('SELECT COUNT(*) FROM job_applications WHERE status = "pending"').fetchone()[0],
-        'unread_messages': conn.execute('SELECT COUNT(*) FROM contact_messages WHERE status = "unread"').fetchone()[0]
-    }
-    
-    # Get recent activities
-    recent_messages = conn.execute('SELECT * FROM contact_messages ORDER BY created_at DESC LIMIT 5').fetchall()
-    recent_applications = conn.execute(
-        'SELECT ja.*, j.title as job_title FROM job_applications ja JOIN jobs j ON ja.job_id = j.id ORDER BY ja.created_at DESC LIMIT 5'
-    ).fetchall()
-    
-    conn.close()
+    # Live updates resume from the last event this page already reflects
+    last_event_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM admin_events').fetchone()[0]
+    
+    # Get statistics (trigger-maintained counters)
+    stats = dashboard_stats.read_counters(conn)
+    
+    # Get recent activities, archived rows included when live ones are few
+    archiver = app.extensions['archive']
+    messages_query = 'SELECT * FROM {schema}.contact_messages ORDER BY created_at DESC LIMIT 5'
+    applications_query = (
+        'SELECT ja.*, j.title as job_title FROM {schema}.job_applications ja JOIN main.jobs j ON ja.job_id = j.id '
+        'ORDER BY ja.created_at DESC LIMIT 5'
+    )
+    archived_messages, archived_applications = archiver.archived_rows(
+        messages_query.format(schema=archive.SCHEMA), applications_query.format(schema=archive.SCHEMA))
+    recent_messages = newest(conn.execute(messages_query.format(schema='main')).fetchall(), archived_messages)
+    recent_applications = newest(conn.execute(applications_query.format(schema='main')).fetchall(),
+                                 archived_applications)
     
     return render_template('admin/dashboard.html', 
                          stats=stats,
                          recent_messages=recent_messages,
-                         recent_applications=recent_applications)
+                         recent_applications=recent_applications,
+                         has_archive=archiver.exists(),
+                         last_event_id=last_event_id)
+
+@app.route('/admin/events')
+@login_required
+async def admin_events():
+    """Server-Sent Events stream of new messages, applications and counters"""
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    feed = app.extensions['live_feed']
+    try:
+        # On a shared event loop an idle dashboard is a suspended task, not a blocked thread
+        stream = feed.astream(last_event_id) if aio.serving_async() else feed.stream(last_event_id)
+    except live_feed.Full:
+        response = jsonify({'error': 'Too many live dashboards'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    response = Response(stream, mimetype='text/event-stream')
+    # Keep proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/admin/live-feed-stats')
+@login_required
+def admin_live_feed_stats():
+    """Open dashboard streams and feed position for this worker"""
+    return jsonify(app.extensions['live_feed'].stats())
+
+@app.route('/admin/db-stats')
+@login_required
+def admin_db_stats():
+    """Connection pool statistics for this worker"""
+    return jsonify(db.pool_stats())
+
+@app.route('/admin/upload-stats')
+@login_required
+def admin_upload_stats():
+    """Upload throughput and post-processing queue depth for this worker"""
+    return jsonify(app.extensions['uploads'].stats.snapshot())
+
+@app.route('/admin/write-behind-stats')
+@login_required
+def admin_write_behind_stats():
+    """Submission queue lag and batch sizes for this worker"""
+    return jsonify(app.extensions['write_behind'].stats())
+
+@app.route('/admin/cache-stats')
+@login_required
+def admin_cache_stats():
+    """Page cache and search memo hit ratios and memory use for this worker"""
+    stats = app.extensions['page_cache'].stats()
+    stats['search_memo'] = search_memo.stats()
+    return jsonify(stats)
+
+@app.route('/admin/archive-stats')
+@login_required
+def admin_archive_stats():
+    """Live and archived row counts, file sizes and the last archival run"""
+    return jsonify(app.extensions['archive'].stats())
+
+@app.route('/admin/replication-stats')
+@login_required
+def admin_replication_stats():
+    """Published generation and sequence, replica state and lag"""
+    return jsonify(app.extensions['replica'].stats())
+
+@app.route('/metrics')
+@login_required
+def metrics():
+    """Request, SQL and template timings for this worker in Prometheus format"""
+    return Response(app.extensions['instrumentation'].expose() + app.extensions['replica'].expose(),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/export/<table>.<fmt>')
+@login_required
+def admin_export(table, fmt):
+    """Stream job applications or contact messages as CSV or NDJSON
+
+    Filtered by ?since=, ?until= (YYYY-MM-DD, inclusive) and ?status=;
+    ?history=1 includes archived rows.
+    """
+    if table not in bulk.EXPORTS or fmt not in bulk.FORMATS:
+        return jsonify({'error': f'Cannot export {table} as {fmt}'}), 404
+    archive_path = app.extensions['archive'].path if request.args.get('history') in ('1', 'true') else None
+    try:
+        chunks = bulk.export(app.config['DATABASE'], table, fmt, request.args.get('since'),
+                             request.args.get('until'), request.args.get('status'), archive_path)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    response = Response(chunks, content_type=bulk.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{table}.{fmt}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/admin/import/<table>', methods=['POST'])
+@login_required
+def admin_import(table):
+    """Import jobs, services or blog posts from an uploaded CSV or NDJSON file
+
+    Uploads are capped by MAX_CONTENT_LENGTH; use `flask import-data` for
+    larger files. ?upsert=1 updates rows whose id already exists.
+    """
+    upload = request.files.get('file')
+    if table not in bulk.IMPORTS or upload is None:
+        return jsonify({'error': 'Upload a file to jobs, services or blog_posts'}), 400
+    fmt = request.form.get('format') or os.path.splitext(upload.filename or '')[1].lstrip('.').lower()
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        records = bulk.read_records(stream, fmt)
+        summary = bulk.import_records(get_db_connection(), table, records,
+                                      upsert=request.values.get('upsert') in ('1', 'true', 'on'))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(summary)
 
 # API routes for theme toggle and search
 @app.route('/api/toggle-theme', methods=['POST'])
@@ -477,59 +689,275 @@ def toggle_theme():
     session['theme'] = theme
     return jsonify({'success': True, 'theme': theme})
 
+@app.route('/api/blog/posts')
+@http_cache.conditional('blog_posts')
+@page_cache.cached_page('blog_posts')
+def api_blog_posts():
+    """Next page of blog posts for infinite scroll"""
+    posts, next_cursor = fetch_blog_page(get_db_connection(),
+                                         request.args.get('search', ''),
+                                         request.args.get('category', ''),
+                                         request.args.get('cursor'),
+                                         pagination.page_size())
+    
+    return jsonify({
+        'html': render_template('partials/blog_cards.html', posts=posts),
+        'count': len(posts),
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/careers/jobs')
+@http_cache.conditional('jobs')
+@page_cache.cached_page('jobs')
+def api_careers_jobs():
+    """Next page of job openings for infinite scroll"""
+    jobs, next_cursor, total = fetch_jobs_page(get_db_connection(),
+                                               request.args.get('search', ''),
+                                               request.args.get('department', ''),
+                                               request.args.get('location', ''),
+                                               request.args.get('cursor'),
+                                               pagination.page_size())
+    
+    return jsonify({
+        'html': render_template('partials/job_cards.html', jobs=jobs),
+        'count': len(jobs),
+        'total': total,
+        'next_cursor': next_cursor
+    })
+
 @app.route('/api/search')
-def api_search():
-    """Global search API"""
+@http_cache.conditional('blog_posts', 'services', 'jobs')
+async def api_search():
+    """Global search API: one ranked query across blog posts, services and jobs"""
+    started = time.perf_counter()
     query = request.args.get('q', '')
+    tokens = search_index.SearchMemo.normalize(query)
     
-    if not query:
-        return jsonify({'results': []})
+    if not tokens:
+        return jsonify({'results': [], 'source': 'empty', 'took_ms': 0.0})
     
-    conn = get_db_connection()
-    results = []
-    
-    # Search blog posts
-    blog_results = conn.execute(
-        'SELECT title, "blog" as type, id FROM blog_posts WHERE (title LIKE ? OR content LIKE ?) AND published = 1 LIMIT 3',
-        (f'%{query}%', f'%{query}%')
-    ).fetchall()
-    
-    for post in blog_results:
-        results.append({
-            'title': post['title'],
-            'type': 'Blog Post',
-            'url': f'/blog/{post["id"]}'
-        })
+    # ?types=blog,job restricts the result types; ?limit= caps the count
+    types = sorted({t for t in request.args.get('types', '').split(',') if t in search_index.SEARCH_TYPES})
+    limit = min(max(request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
     
-    # Search services
-    service_results = conn.execute(
-        'SELECT title, "service" as type, id FROM services WHERE title LIKE ? OR description LIKE ? LIMIT 3',
-        (f'%{query}%', f'%{query}%')
-    ).fetchall()
+    versions = await aio.call(app.extensions['page_cache'].versions)
+    stamp = tuple(sorted(versions.items()))
+    candidates, source = search_memo.lookup(stamp, tokens, types)
+    if candidates is None:
+        rows = await aio.query(
+            lambda conn: search_index.search_all(conn, query, search_memo.candidates + 1, types=types))
+        candidates = search_memo.store(stamp, tokens, rows, types)
     
-    for service in service_results:
+    results = []
+    for row in candidates:
+        if row['type'] == 'blog':
+            url = url_for('blog_post', post_id=row['id'])
+        elif row['type'] == 'job':
+            url = url_for('job_detail', job_id=row['id'])
+        else:
+            url = url_for('services')
         results.append({
-            'title': service['title'],
-            'type': 'Service',
-            'url': '/services'
+            'title': row['title'],
+            'type': search_index.SEARCH_TYPES[row['type']]['label'],
+            'url': url,
+            'snippet': str(search_index.highlight_snippet(row['snippet']))
         })
-    
-    # Search jobs
-    job_results = conn.execute(
-        'SELECT title, "job" as type, id FROM jobs WHERE (title LIKE ? OR description LIKE ?) AND active = 1 LIMIT 3',
-        (f'%{query}%', f'%{query}%')
+        if len(results) == limit:
+            break
+    
+    return jsonify({
+        'results': results,
+        'source': source,
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+
+# CLI commands
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the full-text search index from the content tables"""
+    conn = get_db_connection()
+    search_index.create_search_index(conn.cursor())
+    counts = search_index.rebuild_search_index(conn)
+    for table, count in counts.items():
+        print(f'{table}: {count} rows indexed')
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Apply pending schema migrations"""
+    conn = get_db_connection()
+    applied = migrations.migrate(conn)
+    print(f'Applied migrations: {applied or "none"}; schema version {migrations.schema_version(conn)}')
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Print EXPLAIN QUERY PLAN for every route query, failing on full scans"""
+    conn = get_db_connection()
+    failures = 0
+    for name, plan, full_scan in migrations.check_query_plans(conn):
+        print(f'{"FULL SCAN" if full_scan else "ok":>9}  {name}')
+        for detail in plan:
+            print(f'           {detail}')
+        failures += full_scan
+    if failures:
+        raise SystemExit(f'{failures} route queries do a full table scan')
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Recount the dashboard counters from scratch and report any drift"""
+    drift = dashboard_stats.reconcile(get_db_connection())
+    if not drift:
+        print('Dashboard counters are accurate')
+    for name, (stored, actual) in drift.items():
+        print(f'{name}: stored {stored}, actual {actual} (corrected)')
+
+@app.cli.command('vendor-assets')
+def vendor_assets_command():
+    """Download the CDN-hosted CSS, scripts and fonts into static/vendor"""
+    for path in assets.vendor(app.static_folder):
+        print(f'vendored {path}')
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Minify, fingerprint and precompress static assets into static/dist"""
+    icons = get_db_connection().execute('SELECT DISTINCT icon FROM services').fetchall()
+    used = assets.used_icons(app.root_path, app.template_folder, app.static_folder,
+                             extra=[row['icon'] for row in icons])
+    manifest = assets.build(app.static_folder, app.config['ASSET_DIST_DIR'], icons=used)
+    assets.load_manifest(app)
+    for name, hashed in sorted(manifest.items()):
+        print(f'{name} -> {hashed}')
+
+@app.cli.command('warm-images')
+def warm_images_command():
+    """Generate every responsive variant of the site and blog images"""
+    sources = set()
+    for root, _, files in os.walk(os.path.join(app.static_folder, 'images')):
+        for name in files:
+            sources.add(os.path.relpath(os.path.join(root, name), app.static_folder))
+    rows = get_db_connection().execute(
+        'SELECT DISTINCT featured_image FROM blog_posts WHERE featured_image IS NOT NULL'
     ).fetchall()
-    
-    for job in job_results:
-        results.append({
-            'title': job['title'],
-            'type': 'Job Opening',
-            'url': f'/job/{job["id"]}'
-        })
-    
-    conn.close()
-    
-    return jsonify({'results': results})
+    sources.update(row['featured_image'] for row in rows)
+    variants = app.extensions['images']
+    for source in sorted(sources):
+        print(f'{source}: {variants.warm(source)} variants')
+
+@app.cli.command('prerender')
+@click.option('--full', is_flag=True, help='Re-render every page, not just those affected by changes')
+def prerender_command(full):
+    """Pre-render the public pages into PRERENDER_DIR"""
+    renderer = app.extensions['prerender']
+    if not renderer.directory:
+        raise SystemExit('Set PRERENDER_DIR to the snapshot directory')
+    result = renderer.regenerate(full=full)
+    if result is None:
+        raise SystemExit('Another process is regenerating the snapshot')
+    print(f"Rendered {result['rendered']} pages, removed {result['removed']} "
+          f"({result['changes']} changes) in {result['seconds']:.1f}s")
+
+@app.cli.command('export-data')
+@click.argument('table', type=click.Choice(sorted(bulk.EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(bulk.FORMATS)), default='csv')
+@click.option('--since', help='Earliest created_at date (YYYY-MM-DD)')
+@click.option('--until', help='Latest created_at date, inclusive (YYYY-MM-DD)')
+@click.option('--status', help='Only rows with this status')
+@click.option('--history', is_flag=True, help='Include archived rows')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-')
+def export_data_command(table, fmt, since, until, status, history, output):
+    """Export job applications or contact messages as CSV or NDJSON"""
+    archive_path = app.extensions['archive'].path if history else None
+    try:
+        for chunk in bulk.export(app.config['DATABASE'], table, fmt, since, until, status, archive_path):
+            output.write(chunk)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+@app.cli.command('import-data')
+@click.argument('table', type=click.Choice(sorted(bulk.IMPORTS)))
+@click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'fmt', type=click.Choice(sorted(bulk.FORMATS)),
+              help='Input format (default: from the file extension)')
+@click.option('--upsert', is_flag=True, help='Update rows whose id already exists')
+@click.option('--chunk-size', default=bulk.IMPORT_CHUNK_SIZE, show_default=True)
+def import_data_command(table, source, fmt, upsert, chunk_size):
+    """Import jobs, services or blog posts from a CSV or NDJSON file"""
+    fmt = fmt or os.path.splitext(source.name)[1].lstrip('.').lower()
+    if fmt not in bulk.FORMATS:
+        raise click.BadParameter('Pass --format csv or --format ndjson')
+
+    def progress(summary):
+        click.echo(f"\r{summary['processed']} processed, {summary['written']} written, "
+                   f"{summary['invalid']} invalid", nl=False, err=True)
+
+    summary = bulk.import_records(get_db_connection(), table, bulk.read_records(source, fmt),
+                                  upsert=upsert, chunk_size=chunk_size, progress=progress)
+    click.echo(err=True)
+    for error in summary['errors']:
+        print(f"line {error['line']}: {error['error']}")
+    if summary['invalid'] > len(summary['errors']):
+        print(f"... and {summary['invalid'] - len(summary['errors'])} more invalid rows")
+    print(f"Imported {summary['written']} of {summary['processed']} rows into {table}")
+
+@app.cli.command('archive-data')
+@click.option('--dry-run', is_flag=True, help='Only count the rows that would be archived')
+@click.option('--enable-incremental-vacuum', is_flag=True,
+              help='One-off VACUUM switching the live file to incremental vacuum (locks it meanwhile)')
+def archive_data_command(dry_run, enable_incremental_vacuum):
+    """Move old and closed applications and messages to the archive database"""
+    archiver = app.extensions['archive']
+    if enable_incremental_vacuum:
+        conn = db.connect(app.config['DATABASE'])
+        try:
+            changed = archive.enable_incremental_vacuum(conn)
+        finally:
+            conn.close()
+        print('Incremental vacuum enabled' if changed else 'Incremental vacuum was already enabled')
+    result = archiver.run(dry_run=dry_run)
+    if result is None:
+        raise SystemExit('Another process is archiving')
+    verb = 'Would archive' if dry_run else 'Archived'
+    for table, count in result['archived'].items():
+        print(f'{verb} {count} {table} rows to {archiver.path}')
+    if not dry_run:
+        print(f"Released {result['vacuumed_pages']} pages in {result['seconds']:.1f}s")
+
+@app.cli.command('publish-replica')
+@click.option('--force', is_flag=True, help='Publish even if nothing was committed since the last run')
+def publish_replica_command(force):
+    """Publish a snapshot or page-delta segment to REPLICATION_PUBLISH_DIR"""
+    publisher = app.extensions['replica'].publisher
+    if publisher is None:
+        raise SystemExit('Set REPLICATION_PUBLISH_DIR on the writer node')
+    result = publisher.publish(force=force)
+    if result is None:
+        print('Nothing to publish')
+    else:
+        print(f"Published {result['kind']} {result['file']} ({result['pages']} pages) in {result['seconds']:.2f}s")
+
+@app.cli.command('sync-replica')
+def sync_replica_command():
+    """Bring REPLICATION_REPLICA up to date from REPLICATION_SOURCE"""
+    replica = app.extensions['replica']
+    if not (replica.path and replica.source):
+        raise SystemExit('Set REPLICATION_SOURCE and REPLICATION_REPLICA on the reader node')
+    result = replica.sync()
+    if result is None:
+        raise SystemExit('Another process is syncing the replica')
+    print(f"{'Restored snapshot, ' if result['snapshot'] else ''}applied {result['applied']} segments; "
+          f"lag {replica.lag():.1f}s")
+
+@app.cli.command('build-related')
+@click.option('--full', is_flag=True, help='Recompute every list, not just those affected by changes')
+def build_related_command(full):
+    """Refresh the related-posts and similar-jobs lists (requires NumPy)"""
+    conn = get_db_connection()
+    for source in related.SOURCES:
+        try:
+            result = related.build(conn, source, full=full)
+        except ImportError:
+            raise SystemExit('NumPy is required: pip install numpy')
+        print(f"{source}: {result['changed']} of {result['items']} changed, "
+              f"{result['updated']} lists updated in {result['seconds']:.2f}s")
 
 # Error handlers
 @app.errorhandler(404)
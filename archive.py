@@ -0,0 +1,292 @@
+"""
+Nextwave Company Website - Hot/cold archival
+Moves old or closed job applications and contact messages out of the live
+database into an attached archive database, a small batch per short write
+transaction, then returns the freed pages to the filesystem with
+PRAGMA incremental_vacuum. History views read the union of both files:
+exports with history, and the dashboard's recent lists. Dashboard counters
+(pending applications, unread messages) count live rows only.
+
+Each batch copies and deletes in one transaction. In WAL mode SQLite commits
+attached databases separately, so a crash mid-commit can leave a row in both
+files; the copy is INSERT OR REPLACE, so the next run settles it.
+"""
+
+import os
+import time
+import fcntl
+import datetime
+import threading
+import logging
+import db
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = 'archive'
+DEFAULT_AFTER_DAYS = 365           # archive any row older than this
+DEFAULT_TERMINAL_AFTER_DAYS = 30   # ... or closed rows older than this
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_LOCK_MS = 50           # shrink batches that hold the write lock longer
+DEFAULT_PAUSE = 0.2                # seconds between batches, letting requests write
+DEFAULT_INTERVAL = 0               # seconds between runs in the app; 0 disables
+VACUUM_STEP_PAGES = 256
+
+# Archived table -> statuses after which a row is never looked at again
+TERMINAL_STATUSES = {
+    'job_applications': ('rejected', 'hired'),
+    'contact_messages': ('replied',),
+}
+
+
+def attach(conn, path):
+    """Attach the archive database as `archive` (no-op if already attached)
+
+    Creates any missing archive tables and columns from the live schema.
+    Must be called outside a transaction.
+    """
+    attached = {row[1] for row in conn.execute('PRAGMA database_list')}
+    if SCHEMA not in attached:
+        conn.execute(f'ATTACH DATABASE ? AS {SCHEMA}', (path,))
+        conn.execute(f'PRAGMA {SCHEMA}.journal_mode = WAL')
+    for table in TERMINAL_STATUSES:
+        live = columns(conn, 'main', table)
+        archived = columns(conn, SCHEMA, table)
+        if not archived:
+            definitions = ', '.join('id INTEGER PRIMARY KEY' if name == 'id' else f'{name} {kind}'
+                                    for name, kind in live)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {SCHEMA}.{table} ({definitions})')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_{table}_created ON {table} (created_at)')
+        else:
+            known = {name for name, _ in archived}
+            for name, kind in live:
+                if name not in known:
+                    conn.execute(f'ALTER TABLE {SCHEMA}.{table} ADD COLUMN {name} {kind}')
+    if conn.in_transaction:
+        conn.commit()
+
+
+def columns(conn, schema, table):
+    """[(name, declared type)] of a table, empty if it does not exist"""
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+def history_source(conn, table):
+    """FROM clause reading live and archived rows of `table` as one
+
+    Both sides list the live columns explicitly, since columns added to an
+    existing archive come after any it already had. Requires attach().
+    """
+    names = ', '.join(name for name, _ in columns(conn, 'main', table))
+    return (f'(SELECT {names} FROM main.{table} UNION ALL '
+            f'SELECT {names} FROM {SCHEMA}.{table}) AS {table}')
+
+
+def enable_incremental_vacuum(conn):
+    """Switch the live file to auto_vacuum=INCREMENTAL
+
+    Existing databases need one full VACUUM for this, which rewrites the
+    file and holds the write lock throughout; run it during a quiet period.
+    Returns False if it was already enabled.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+
+class Archiver:
+    """Throttled archival of cold rows plus incremental vacuum"""
+
+    def __init__(self, app=None):
+        self._pid = None
+        self._lock = threading.Lock()
+        self.last_run = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.database = app.config['DATABASE']
+        self.path = app.config.get('ARCHIVE_DATABASE') or os.path.splitext(self.database)[0] + '-archive.db'
+        self.after_days = app.config.get('ARCHIVE_AFTER_DAYS', DEFAULT_AFTER_DAYS)
+        self.terminal_after_days = app.config.get('ARCHIVE_TERMINAL_AFTER_DAYS', DEFAULT_TERMINAL_AFTER_DAYS)
+        self.batch_size = app.config.get('ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.max_lock_ms = app.config.get('ARCHIVE_MAX_LOCK_MS', DEFAULT_MAX_LOCK_MS)
+        self.pause = app.config.get('ARCHIVE_PAUSE', DEFAULT_PAUSE)
+        self.interval = app.config.get('ARCHIVE_INTERVAL', DEFAULT_INTERVAL)
+        app.extensions['archive'] = self
+
+        if self.interval:
+            @app.before_request
+            def start_archiver():
+                self.start()
+
+    def cutoffs(self, now=None):
+        """(age cutoff, terminal-status cutoff) as SQLite timestamps"""
+        now = now or datetime.datetime.utcnow()
+        fmt = '%Y-%m-%d %H:%M:%S'
+        return ((now - datetime.timedelta(days=self.after_days)).strftime(fmt),
+                (now - datetime.timedelta(days=self.terminal_after_days)).strftime(fmt))
+
+    def connect(self):
+        conn = db.connect(self.database)
+        attach(conn, self.path)
+        return conn
+
+    def exists(self):
+        """Whether anything has been archived yet (attach() creates the file)"""
+        return os.path.exists(self.path)
+
+    def archived_rows(self, *queries):
+        """Rows of each query, run on one connection with the archive attached as `archive`
+
+        Returns a list of row lists, one per query; all empty before the
+        archive file exists, without creating it.
+        """
+        if not self.exists():
+            return [[] for _ in queries]
+        conn = self.connect()
+        try:
+            return [conn.execute(query).fetchall() for query in queries]
+        finally:
+            conn.close()
+
+    def run(self, dry_run=False):
+        """Archive every eligible row, then vacuum the freed pages
+
+        Only one process archives at a time; others return None. Returns
+        {'archived': {table: n}, 'vacuumed_pages': n, 'seconds': s}.
+        """
+        with open(self.path + '.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+            started = time.perf_counter()
+            conn = self.connect()
+            try:
+                archived = {table: self._archive_table(conn, table, dry_run) for table in TERMINAL_STATUSES}
+                vacuumed = 0 if dry_run else self._vacuum(conn)
+            finally:
+                conn.close()
+
+        self.last_run = {
+            'archived': archived,
+            'vacuumed_pages': vacuumed,
+            'seconds': time.perf_counter() - started,
+            'finished_at': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+        }
+        if any(archived.values()):
+            logger.info('Archived %s; vacuumed %d pages', archived, vacuumed)
+        return self.last_run
+
+    def _predicate(self, table):
+        statuses = TERMINAL_STATUSES[table]
+        placeholders = ', '.join('?' for _ in statuses)
+        age_cutoff, terminal_cutoff = self.cutoffs()
+        return (f'(created_at < ? OR (status IN ({placeholders}) AND created_at < ?))',
+                [age_cutoff, *statuses, terminal_cutoff])
+
+    def _archive_table(self, conn, table, dry_run):
+        predicate, params = self._predicate(table)
+        if dry_run:
+            return conn.execute(f'SELECT COUNT(*) FROM main.{table} WHERE {predicate}', params).fetchone()[0]
+
+        names = ', '.join(name for name, _ in columns(conn, 'main', table))
+        batch_size = self.batch_size
+        last_id = 0
+        moved = 0
+        while True:
+            # Candidates are found without the write lock held
+            ids = [row[0] for row in conn.execute(
+                f'SELECT id FROM main.{table} WHERE id > ? AND {predicate} ORDER BY id LIMIT ?',
+                [last_id, *params, batch_size]
+            )]
+            if not ids:
+                return moved
+            last_id = ids[-1]
+
+            in_ids = ', '.join('?' for _ in ids)
+            started = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-checked under the lock in case a row changed since the scan
+                conn.execute(f'INSERT OR REPLACE INTO {SCHEMA}.{table} ({names}) '
+                             f'SELECT {names} FROM main.{table} WHERE id IN ({in_ids}) AND {predicate}',
+                             [*ids, *params])
+                moved += conn.execute(f'DELETE FROM main.{table} WHERE id IN ({in_ids}) AND {predicate}',
+                                      [*ids, *params]).rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            held_ms = (time.perf_counter() - started) * 1000
+
+            # Keep each write transaction under the lock budget
+            if held_ms > self.max_lock_ms and batch_size > 10:
+                batch_size = max(10, int(batch_size * self.max_lock_ms / held_ms))
+            elif held_ms < self.max_lock_ms / 2 and batch_size < self.batch_size:
+                batch_size = min(self.batch_size, batch_size * 2)
+            time.sleep(self.pause)
+
+    def _vacuum(self, conn):
+        """Release free pages a step at a time; 0 unless auto_vacuum is incremental"""
+        if conn.execute('PRAGMA main.auto_vacuum').fetchone()[0] != 2:
+            if conn.execute('PRAGMA main.freelist_count').fetchone()[0]:
+                logger.warning('auto_vacuum is not incremental; run `flask archive-data '
+                               '--enable-incremental-vacuum` once to shrink the live database')
+            return 0
+        released = 0
+        while True:
+            free = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+            if not free:
+                return released
+            step = min(free, VACUUM_STEP_PAGES)
+            # executescript steps the pragma to completion; execute() frees one page
+            conn.executescript(f'PRAGMA main.incremental_vacuum({step})')
+            released += step
+            time.sleep(self.pause)
+
+    def stats(self):
+        """Live and archived row counts and file sizes"""
+        archived = self.exists()
+        # Viewing stats must not create the archive file
+        conn = self.connect() if archived else db.connect(self.database)
+        try:
+            counts = {table: {
+                'live': conn.execute(f'SELECT COUNT(*) FROM main.{table}').fetchone()[0],
+                'archived': conn.execute(f'SELECT COUNT(*) FROM {SCHEMA}.{table}').fetchone()[0] if archived else 0,
+            } for table in TERMINAL_STATUSES}
+            free_pages = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+            auto_vacuum = conn.execute('PRAGMA main.auto_vacuum').fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            'tables': counts,
+            'live_bytes': os.path.getsize(self.database),
+            'archive_bytes': os.path.getsize(self.path) if archived else 0,
+            'free_pages': free_pages,
+            'incremental_vacuum': auto_vacuum == 2,
+            'last_run': self.last_run,
+        }
+
+    def start(self):
+        """Start this process's archival thread (cheap after the first call)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._watch, name='archiver', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run()
+            except Exception:
+                logger.exception('Archival run failed')
@@ -0,0 +1,101 @@
+"""
+Nextwave Company Website - ASGI entry point
+Serves the Flask app to an ASGI server through asgiref's WsgiToAsgi
+(asgiref comes with Flask's `async` extra). Each request runs on a thread
+of its own, where async views run on that thread's event loop exactly as
+under a WSGI worker (see aio.run_inline), so concurrency is bounded by the
+server's connection limit rather than a fixed pool.
+
+WsgiToAsgi stops listening to the client once it has the request body;
+this adapter keeps listening, so a long response such as a dashboard's
+event stream ends when its client disconnects instead of writing into the
+void forever.
+
+Production (uvicorn and asgiref are the extra dependencies):
+
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8000 asgi:application
+
+or `uvicorn asgi:application --workers 4 --limit-concurrency 1000`.
+`python -m benchmarks serving` compares its throughput with the sync
+gunicorn workers.
+"""
+
+import asyncio
+import contextlib
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from app import app
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was complete"""
+
+
+class ASGIAdapter:
+    """ASGI application around the Flask app"""
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self.wsgi = WsgiToAsgi(self._wsgi_app)
+
+    def _wsgi_app(self, environ, start_response):
+        # WsgiToAsgi buffers the whole body, so a chunked one (no Content-Length) can be read to the end
+        environ['wsgi.input_terminated'] = True
+        return self.app(environ, start_response)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            # No websocket routes: refuse the handshake
+            await receive()
+            return await send({'type': 'websocket.close', 'code': 1000})
+
+        body_read = asyncio.Event()
+        disconnected = asyncio.Event()
+
+        async def receive_body():
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+            if not message.get('more_body'):
+                body_read.set()
+            return message
+
+        async def watch():
+            await body_read.wait()
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        async def send_while_connected(message):
+            if disconnected.is_set():
+                # Raised in the request's thread, ending the response iterator there
+                raise ClientDisconnected()
+            await send(message)
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            # Its own thread per request; asgiref otherwise runs every one on a single thread
+            async with ThreadSensitiveContext():
+                await self.wsgi(scope, receive_body, send_while_connected)
+        except Exception:
+            if not disconnected.is_set():
+                raise
+        finally:
+            watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await watcher
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # The write-behind queue drains itself at exit
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = ASGIAdapter(app)
@@ -0,0 +1,512 @@
+"""
+Nextwave Company Website - Static asset pipeline
+`flask vendor-assets` downloads the third-party CSS, scripts and fonts the
+site used to load from CDNs into static/vendor. `flask build-assets` subsets
+Font Awesome to the icons in use, minifies and content-hashes the CSS and
+JavaScript, writes .gz/.br siblings and a manifest into static/dist. Hashed
+files are served with an immutable Cache-Control, precompressed when the
+client accepts it.
+"""
+
+import io
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+import urllib.request
+import logging
+from flask import current_app, request, send_from_directory, url_for, abort
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # .br files are skipped without the brotli package
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # icon fonts are copied whole without fontTools
+    font_subset = None
+
+DEFAULT_DIST_DIR = 'dist'
+VENDOR_DIR = 'vendor'
+MANIFEST = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0'
+GOOGLE_FONTS = 'https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap'
+GOOGLE_FONT_SUBSETS = ('latin',)
+# Google serves woff2 only to browsers it recognises
+GOOGLE_FONTS_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                           '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+# Vendored path (under static/vendor) -> the CDN URL it replaces. Templates
+# fall back to the CDN while a file has not been vendored.
+VENDOR_FILES = {
+    'bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'bootstrap/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'fontawesome/css/all.min.css': f'{FONT_AWESOME}/css/all.min.css',
+    'fontawesome/webfonts/fa-solid-900.woff2': f'{FONT_AWESOME}/webfonts/fa-solid-900.woff2',
+    'fontawesome/webfonts/fa-regular-400.woff2': f'{FONT_AWESOME}/webfonts/fa-regular-400.woff2',
+    'fontawesome/webfonts/fa-brands-400.woff2': f'{FONT_AWESOME}/webfonts/fa-brands-400.woff2',
+    'fonts/poppins.css': GOOGLE_FONTS,
+}
+
+# Logical names built into dist, relative to the static folder
+SOURCES = ('css/styles.css', 'js/main.js')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+
+_ICON_RE = re.compile(r'\bfa-([a-z0-9]+(?:-[a-z0-9]+)*)\b')
+_ICON_SELECTOR_RE = re.compile(r'^\.fa-([a-z0-9-]+)::?(?:before|after)$')
+_CONTENT_RE = re.compile(r'content:\s*"\\([0-9a-f]+)"')
+_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_FONT_FACE_SRC_RE = re.compile(r'src:([^;}]+)')
+
+
+def _fetch(url, user_agent=None):
+    req = urllib.request.Request(url, headers={'User-Agent': user_agent or 'nextwave-assets'})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.read()
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def vendor(static_folder, fetch=_fetch):
+    """Download every VENDOR_FILES entry into static/vendor
+
+    Google Fonts CSS is trimmed to GOOGLE_FONT_SUBSETS and its font files are
+    downloaded alongside it. Returns the vendored paths.
+    """
+    root = os.path.join(static_folder, VENDOR_DIR)
+    written = []
+    for path, url in VENDOR_FILES.items():
+        if url == GOOGLE_FONTS:
+            css = fetch(url, GOOGLE_FONTS_USER_AGENT).decode('utf-8')
+            css, fonts = _localize_google_fonts(css)
+            for font_path, font_url in fonts.items():
+                _write(os.path.join(root, os.path.dirname(path), font_path), fetch(font_url))
+                written.append(os.path.join(os.path.dirname(path), font_path))
+            data = css.encode('utf-8')
+        else:
+            data = fetch(url)
+        _write(os.path.join(root, path), data)
+        written.append(path)
+        logger.info('Vendored %s (%d bytes)', path, len(data))
+    return written
+
+
+def _localize_google_fonts(css):
+    """Keep the wanted unicode-range subsets and point them at local files"""
+    blocks = re.findall(r'/\*\s*([\w-]+)\s*\*/\s*(@font-face\s*\{[^}]*\})', css)
+    fonts = {}
+    kept = []
+    for subset_name, block in blocks:
+        if subset_name not in GOOGLE_FONT_SUBSETS:
+            continue
+        weight = re.search(r'font-weight:\s*(\d+)', block)
+        style = re.search(r'font-style:\s*(\w+)', block)
+        url = _URL_RE.search(block).group(2)
+        name = f'poppins-{subset_name}-{weight.group(1) if weight else 400}-{style.group(1) if style else "normal"}.woff2'
+        fonts[name] = url
+        kept.append(_URL_RE.sub(f'url({name})', block, count=1))
+    return '\n'.join(kept) + '\n', fonts
+
+
+def used_icons(root_path, template_folder, static_folder, extra=()):
+    """Font Awesome icon names referenced by templates, scripts and `extra`
+
+    `extra` holds icon class strings stored outside the code, such as the
+    services table's icon column.
+    """
+    names = set()
+    paths = []
+    for folder in (os.path.join(root_path, template_folder), os.path.join(static_folder, 'js')):
+        for root, _, files in os.walk(folder):
+            paths.extend(os.path.join(root, name) for name in files)
+    for path in paths:
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            names.update(_ICON_RE.findall(f.read()))
+    for value in extra:
+        names.update(_ICON_RE.findall(value or ''))
+    return names
+
+
+def _top_level_blocks(css):
+    """Split CSS into (prelude, body) pairs at brace depth zero"""
+    blocks = []
+    depth = 0
+    start = 0
+    body_start = None
+    for i, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                body_start = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:body_start].strip(), css[body_start + 1:i]))
+                start = i + 1
+    return blocks
+
+
+def subset_icon_css(css, icons):
+    """Drop Font Awesome icon rules for unused icons; woff2-only font-faces
+
+    Returns the CSS and the code points of the icons kept.
+    """
+    out = []
+    codepoints = set()
+    for prelude, body in _top_level_blocks(css):
+        selectors = [s.strip() for s in prelude.split(',')]
+        matches = [_ICON_SELECTOR_RE.match(s) for s in selectors]
+        if selectors and all(matches):
+            kept = [s for s, m in zip(selectors, matches) if m.group(1) in icons]
+            if not kept:
+                continue
+            codepoints.update(int(cp, 16) for cp in _CONTENT_RE.findall(body))
+            prelude = ','.join(kept)
+        elif prelude.startswith('@font-face'):
+            body = _FONT_FACE_SRC_RE.sub(lambda m: 'src:' + _woff2_only(m.group(1)), body)
+        out.append(f'{prelude}{{{body}}}')
+    return ''.join(out), codepoints
+
+
+def _woff2_only(sources):
+    woff2 = [s.strip() for s in sources.split(',') if 'woff2' in s]
+    return ','.join(woff2) if woff2 else sources
+
+
+def subset_font(data, codepoints):
+    """Keep only `codepoints` in a woff2 font when fontTools is available"""
+    if font_subset is None or not codepoints:
+        return data
+    from fontTools.ttLib import TTFont
+    font = TTFont(io.BytesIO(data))
+    options = font_subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = io.BytesIO()
+    font.save(out)
+    return out.getvalue()
+
+
+_CSS_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+_CSS_COMMENT_RE = re.compile(rf'({_CSS_STRING})|/\*.*?\*/', re.S)
+_CSS_STRING_RE = re.compile(rf'({_CSS_STRING})')
+
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = _CSS_COMMENT_RE.sub(lambda m: m.group(1) or ' ', css)
+    parts = _CSS_STRING_RE.split(css)
+    # Odd parts are string literals and stay verbatim
+    for k in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[k])
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        parts[k] = re.sub(r':\s+', ':', code).replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+_JS_IDENT = re.compile(r'[\w$]')
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^') | {''}
+_REGEX_KEYWORDS_RE = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|in|of|void|delete|throw|new)\s*$')
+
+
+def minify_js(js):
+    """Conservative JavaScript minifier
+
+    Removes comments and indentation and collapses whitespace, keeping line
+    breaks so automatic semicolon insertion still applies. String, template
+    and regular expression literals are copied unchanged.
+    """
+    out = []
+    i = 0
+    n = len(js)
+    stack = []  # open template literals: brace depth of their ${ } code
+
+    def regex_allowed():
+        if _REGEX_KEYWORDS_RE.search(''.join(out[-12:])):
+            return True
+        for piece in reversed(out):
+            stripped = piece.rstrip()
+            if stripped:
+                return stripped[-1] in _REGEX_PRECEDERS
+        return True
+
+    def emit_space(has_newline):
+        if out and out[-1] in (' ', '\n'):
+            if has_newline and out[-1] == ' ':
+                out[-1] = '\n'
+            return
+        out.append('\n' if has_newline else ' ')
+
+    while i < n:
+        char = js[i]
+        if stack and char == '}' and stack[-1] == 0:
+            # End of a ${ } expression: resume the template literal
+            stack.pop()
+            out.append('}')
+            i = _copy_template(js, i + 1, out, stack)
+            continue
+        if char == '`':
+            out.append('`')
+            i = _copy_template(js, i + 1, out, stack)
+            continue
+        if stack and char in '{}':
+            stack[-1] += 1 if char == '{' else -1
+        if js.startswith('//', i):
+            end = js.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if js.startswith('/*', i):
+            end = js.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            emit_space('\n' in js[i:end])
+            i = end
+            continue
+        if char in '"\'':
+            j = i + 1
+            while j < n and js[j] != char and js[j] != '\n':
+                j += 2 if js[j] == '\\' else 1
+            out.append(js[i:j + 1])
+            i = j + 1
+            continue
+        if char == '/' and regex_allowed():
+            j = i + 1
+            in_class = False
+            while j < n and js[j] != '\n':
+                if js[j] == '\\':
+                    j += 2
+                    continue
+                if js[j] == '[':
+                    in_class = True
+                elif js[j] == ']':
+                    in_class = False
+                elif js[j] == '/' and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and _JS_IDENT.match(js[j]):
+                j += 1
+            out.append(js[i:j])
+            i = j
+            continue
+        if char.isspace():
+            j = i
+            while j < n and js[j].isspace():
+                j += 1
+            emit_space('\n' in js[i:j])
+            i = j
+            continue
+        out.append(char)
+        i += 1
+
+    # Drop spaces that do not separate identifiers or repeated +/- operators
+    pieces = []
+    for k, piece in enumerate(out):
+        if piece == ' ':
+            before = out[k - 1][-1:] if k else ''
+            after = out[k + 1][:1] if k + 1 < len(out) else ''
+            if not ((_JS_IDENT.match(before or ' ') and _JS_IDENT.match(after or ' '))
+                    or (before == after and before in '+-/')):
+                continue
+        elif piece == '\n' and (not pieces or pieces[-1].endswith('\n')):
+            continue
+        pieces.append(piece)
+    text = ''.join(pieces)
+    return text.strip() + '\n'
+
+
+def _copy_template(js, i, out, stack):
+    """Copy a template literal body up to its end or its next ${"""
+    n = len(js)
+    start = i
+    while i < n:
+        if js[i] == '\\':
+            i += 2
+            continue
+        if js[i] == '`':
+            out.append(js[start:i + 1])
+            return i + 1
+        if js.startswith('${', i):
+            out.append(js[start:i + 2])
+            stack.append(0)
+            return i + 2
+        i += 1
+    out.append(js[start:])
+    return n
+
+
+def _hashed_name(logical, data):
+    stem, ext = os.path.splitext(logical)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _compress(path, data):
+    with open(path + '.gz', 'wb') as raw:
+        # mtime=0 keeps the output byte-for-byte reproducible
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9, mtime=0) as f:
+            f.write(data)
+    if brotli is not None:
+        _write(path + '.br', brotli.compress(data, quality=11))
+
+
+def build(static_folder, dist_dir=DEFAULT_DIST_DIR, icons=None):
+    """Build every asset into static/<dist_dir> and write the manifest
+
+    Fonts and other binary files are hashed first so the CSS that references
+    them can be rewritten to their hashed names. Files from the previous
+    build are kept for pages still cached with old URLs; anything older is
+    removed. Returns the manifest.
+    """
+    dist = os.path.join(static_folder, dist_dir)
+    previous = _read_manifest(os.path.join(dist, MANIFEST))
+
+    logical = list(SOURCES)
+    vendor_root = os.path.join(static_folder, VENDOR_DIR)
+    for root, _, files in os.walk(vendor_root):
+        for name in sorted(files):
+            logical.append(os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/'))
+
+    codepoints = set()
+    sources = {}
+    for name in logical:
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            sources[name] = f.read()
+    if icons is not None:
+        for name in logical:
+            if name.startswith(f'{VENDOR_DIR}/fontawesome/') and name.endswith('.css'):
+                css, kept = subset_icon_css(sources[name].decode('utf-8'), icons)
+                sources[name] = css.encode('utf-8')
+                codepoints.update(kept)
+
+    manifest = {}
+    ordered = sorted(logical, key=lambda name: name.endswith('.css'))
+    for name in ordered:
+        data = sources[name]
+        if name.endswith('.woff2') and '/fontawesome/' in name:
+            data = subset_font(data, codepoints)
+        elif name.endswith('.css'):
+            css = _rewrite_urls(data.decode('utf-8'), name, manifest)
+            data = (css if name.endswith('.min.css') else minify_css(css)).encode('utf-8')
+        elif name.endswith('.js') and not name.endswith('.min.js'):
+            data = minify_js(data.decode('utf-8')).encode('utf-8')
+
+        hashed = _hashed_name(name, data)
+        path = os.path.join(dist, hashed)
+        _write(path, data)
+        if name.endswith(COMPRESSIBLE):
+            _compress(path, data)
+        manifest[name] = f'{dist_dir}/{hashed}'
+
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _prune(dist, dist_dir, set(manifest.values()) | set(previous.values()))
+    return manifest
+
+
+def _rewrite_urls(css, name, manifest):
+    """Point url() references at hashed files, relative to the hashed CSS"""
+    directory = os.path.dirname(name)
+
+    def replace(match):
+        target = match.group(2)
+        if re.match(r'^(?:[a-z]+:|/|#)', target):
+            return match.group(0)
+        path, _, suffix = target.partition('?')
+        resolved = os.path.normpath(os.path.join(directory, path)).replace(os.sep, '/')
+        hashed = manifest.get(resolved)
+        if hashed is None:
+            return match.group(0)
+        relative = os.path.relpath(hashed.split('/', 1)[1], directory).replace(os.sep, '/')
+        return f'url({relative})'
+
+    return _URL_RE.sub(replace, css)
+
+
+def _prune(dist, dist_dir, keep):
+    keep = {path.split('/', 1)[1] for path in keep}
+    for root, _, files in os.walk(dist):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), dist).replace(os.sep, '/')
+            base = re.sub(r'\.(gz|br)$', '', relative)
+            if relative != MANIFEST and base not in keep:
+                os.remove(os.path.join(root, name))
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_manifest(app):
+    """(Re)load the build manifest, if the assets have been built"""
+    path = os.path.join(app.static_folder, app.config['ASSET_DIST_DIR'], MANIFEST)
+    app.extensions['asset_manifest'] = _read_manifest(path)
+    return app.extensions['asset_manifest']
+
+
+def asset_url(filename, **values):
+    """url_for('static', filename=...) that resolves built, hashed names
+
+    Unbuilt vendor files fall back to the CDN they were vendored from, so a
+    fresh checkout renders without running the pipeline.
+    """
+    app = current_app
+    if app.debug:
+        load_manifest(app)
+    hashed = app.extensions['asset_manifest'].get(filename)
+    if hashed is not None:
+        return url_for('static', filename=hashed, **values)
+    if filename.startswith(f'{VENDOR_DIR}/'):
+        cdn = VENDOR_FILES.get(filename[len(VENDOR_DIR) + 1:])
+        if cdn is not None and not os.path.exists(os.path.join(app.static_folder, filename)):
+            return cdn
+    return url_for('static', filename=filename, **values)
+
+
+def serve_built(filename):
+    """Serve a hashed asset, precompressed when the client accepts it"""
+    dist = os.path.join(current_app.static_folder, current_app.config['ASSET_DIST_DIR'])
+    if filename == MANIFEST or filename.endswith(('.gz', '.br')):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            encoding = candidate
+            break
+
+    served = filename + ('.br' if encoding == 'br' else '.gz' if encoding else '')
+    response = send_from_directory(dist, served, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if filename.endswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Register asset_url() for templates and the hashed asset route"""
+    app.config.setdefault('ASSET_DIST_DIR', DEFAULT_DIST_DIR)
+    load_manifest(app)
+    app.jinja_env.globals['asset_url'] = asset_url
+    # More specific than Flask's /static/<path:filename>, so it takes precedence
+    app.add_url_rule(f'{app.static_url_path}/{app.config["ASSET_DIST_DIR"]}/<path:filename>',
+                     'built_asset', serve_built)
@@ -0,0 +1,11 @@
+"""
+Nextwave Company Website - Benchmark suite
+Synthetic data generation, in-process route benchmarks, an HTTP load driver
+and latency reports that can be compared across runs.
+
+    python -m benchmarks generate --database bench.db --posts 200000
+    python -m benchmarks routes --database bench.db --output routes.json
+    python -m benchmarks load --start-gunicorn --database bench.db --output load.json
+    python -m benchmarks serving --database bench.db --concurrency 64 --output serving.json
+    python -m benchmarks compare baseline.json routes.json --threshold 0.2
+"""
@@ -0,0 +1,127 @@
+"""
+Command line entry point: python -m benchmarks <command>
+"""
+
+import os
+import sys
+import argparse
+from benchmarks import report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('generate', help='fill a database with seeded synthetic data')
+    gen.add_argument('--database', default='nextwave.db')
+    gen.add_argument('--seed', type=int, default=42)
+    for name, default in (('posts', 200000), ('services', 200), ('jobs', 20000),
+                          ('applications', 300000), ('messages', 300000)):
+        gen.add_argument(f'--{name}', type=int, default=default)
+
+    routes = commands.add_parser('routes', help='benchmark every route in-process')
+    routes.add_argument('--database', default='nextwave.db')
+    routes.add_argument('--iterations', type=int, default=200)
+    routes.add_argument('--warmup', type=int, default=10)
+    routes.add_argument('--seed', type=int, default=42)
+    routes.add_argument('--no-page-cache', action='store_true')
+    routes.add_argument('--output')
+
+    load = commands.add_parser('load', help='concurrent HTTP load test')
+    load.add_argument('--url', default='http://127.0.0.1:8000')
+    load.add_argument('--start-gunicorn', action='store_true')
+    load.add_argument('--database', default='nextwave.db')
+    load.add_argument('--workers', type=int, default=4)
+    load.add_argument('--threads', type=int, default=1)
+    load.add_argument('--worker-class', default='sync')
+    load.add_argument('--asgi', action='store_true', help='serve asgi:application with uvicorn workers')
+    load.add_argument('--duration', type=float, default=30.0)
+    load.add_argument('--concurrency', type=int, default=16)
+    load.add_argument('--seed', type=int, default=42)
+    load.add_argument('--output')
+
+    serving = commands.add_parser('serving', help='compare sync and ASGI throughput under the same load')
+    serving.add_argument('--database', default='nextwave.db')
+    serving.add_argument('--port', type=int, default=8000)
+    serving.add_argument('--workers', type=int, default=4)
+    serving.add_argument('--duration', type=float, default=30.0)
+    serving.add_argument('--concurrency', type=int, default=64)
+    serving.add_argument('--seed', type=int, default=42)
+    serving.add_argument('--output')
+
+    cmp_ = commands.add_parser('compare', help='fail when a run regressed against a baseline')
+    cmp_.add_argument('baseline')
+    cmp_.add_argument('current')
+    cmp_.add_argument('--threshold', type=float, default=0.2, help='allowed fractional slowdown')
+    cmp_.add_argument('--metric', default='p95_ms')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        from benchmarks import datagen
+        volumes = {name: getattr(args, name) for name in datagen.DEFAULT_VOLUMES}
+        datagen.generate(args.database, seed=args.seed, volumes=volumes)
+        return 0
+
+    if args.command == 'routes':
+        # Must be set before the app (and its connection pool) is imported
+        os.environ['NEXTWAVE_DATABASE'] = args.database
+        from benchmarks import routes as route_bench
+        results = route_bench.run(args.iterations, args.warmup, args.seed, page_cache=not args.no_page_cache)
+        report.print_table(results)
+        if args.output:
+            report.write_report(args.output, 'routes', results, database=args.database,
+                                iterations=args.iterations, seed=args.seed,
+                                page_cache=not args.no_page_cache)
+        return 0
+
+    if args.command == 'load':
+        from benchmarks import load as load_bench
+        server = None
+        url = args.url
+        if args.asgi:
+            args.worker_class, application = load_bench.MODES['asgi']
+        else:
+            application = load_bench.MODES['sync'][1]
+        if args.start_gunicorn:
+            port = int(url.rsplit(':', 1)[1])
+            server = load_bench.start_gunicorn(port, args.workers, args.database, args.threads,
+                                               args.worker_class, application)
+        try:
+            results = load_bench.run(url, args.duration, args.concurrency, args.seed)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        report.print_table(results)
+        if args.output:
+            report.write_report(args.output, 'load', results, url=url, duration=args.duration,
+                                concurrency=args.concurrency, workers=args.workers,
+                                worker_class=args.worker_class, seed=args.seed)
+        return 0
+
+    if args.command == 'serving':
+        from benchmarks import load as load_bench
+        results = load_bench.compare_modes(args.port, args.database, args.workers, args.duration,
+                                           args.concurrency, args.seed)
+        report.print_table(results)
+        print()
+        load_bench.print_mode_comparison(results)
+        if args.output:
+            report.write_report(args.output, 'serving', results, database=args.database,
+                                duration=args.duration, concurrency=args.concurrency,
+                                workers=args.workers, seed=args.seed)
+        return 0
+
+    if args.command == 'compare':
+        regressions = report.compare(args.baseline, args.current, args.threshold, args.metric)
+        for name, before, after, change in regressions:
+            print(f'REGRESSION {name}: {args.metric} {before:.2f} -> {after:.2f} ({change:+.0%})')
+        if regressions:
+            return 1
+        print(f'No {args.metric} regressions above {args.threshold:.0%}')
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Seeded synthetic data generator for production-sized benchmark databases
+"""
+
+import random
+import datetime
+import db
+import migrations
+
+WORDS = (
+    'cloud platform data pipeline security mobile design product engineering '
+    'analytics machine learning model api service scale performance startup '
+    'strategy customer experience team remote agile devops kubernetes python '
+    'react database migration architecture testing automation growth market '
+    'digital transformation innovation infrastructure monitoring latency cost'
+).split()
+
+CATEGORIES = ['Technology', 'Business', 'Design', 'Engineering', 'Culture', 'Product', 'Security']
+DEPARTMENTS = ['Engineering', 'Design', 'Marketing', 'Sales', 'Operations', 'Finance', 'People']
+LOCATIONS = ['San Francisco, CA', 'New York, NY', 'Remote', 'Austin, TX', 'London, UK', 'Berlin, DE', 'Toronto, CA']
+JOB_TYPES = ['Full-time', 'Part-time', 'Contract', 'Internship']
+APPLICATION_STATUSES = ['pending', 'reviewed', 'interview', 'rejected', 'hired']
+MESSAGE_STATUSES = ['unread', 'read', 'replied']
+
+DEFAULT_VOLUMES = {
+    'posts': 200000,
+    'services': 200,
+    'jobs': 20000,
+    'applications': 300000,
+    'messages': 300000,
+}
+
+CHUNK_SIZE = 5000
+
+
+class Generator:
+    """Deterministic row factory: the same seed always yields the same data"""
+
+    def __init__(self, seed, days=5 * 365):
+        self.rng = random.Random(seed)
+        self.start = datetime.datetime(2020, 1, 1)
+        self.days = days
+
+    def sentence(self, low, high):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def timestamp(self):
+        moment = self.start + datetime.timedelta(seconds=self.rng.randrange(self.days * 86400))
+        return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+    def person(self):
+        name = f'{self.rng.choice(WORDS).title()} {self.rng.choice(WORDS).title()}'
+        return name, f'{name.replace(" ", ".").lower()}{self.rng.randrange(10000)}@example.com'
+
+    def post(self):
+        created = self.timestamp()
+        return (self.sentence(3, 8).title(), self.sentence(150, 400), self.person()[0],
+                self.rng.choice(CATEGORIES), None, int(self.rng.random() < 0.9), created, created)
+
+    def service(self):
+        return (self.sentence(2, 4).title(), self.sentence(20, 60), 'fas fa-cogs',
+                int(self.rng.random() < 0.1), self.timestamp())
+
+    def job(self):
+        return (self.sentence(2, 5).title(), self.rng.choice(DEPARTMENTS), self.rng.choice(LOCATIONS),
+                self.rng.choice(JOB_TYPES), self.sentence(80, 200), self.sentence(20, 60),
+                f'${self.rng.randrange(60, 200)},000', int(self.rng.random() < 0.3), self.timestamp())
+
+    def application(self, job_count):
+        name, email = self.person()
+        return (self.rng.randint(1, job_count), name, email, f'555-{self.rng.randrange(10000):04d}', None,
+                self.sentence(30, 120), self.rng.choice(APPLICATION_STATUSES), self.timestamp())
+
+    def message(self):
+        name, email = self.person()
+        return (name, email, self.sentence(3, 8).capitalize(), self.sentence(20, 120),
+                self.rng.choice(MESSAGE_STATUSES), self.timestamp())
+
+
+INSERTS = {
+    'posts': ('INSERT INTO blog_posts (title, content, author, category, featured_image, published, created_at, updated_at) '
+              'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'),
+    'services': 'INSERT INTO services (title, description, icon, featured, created_at) VALUES (?, ?, ?, ?, ?)',
+    'jobs': ('INSERT INTO jobs (title, department, location, type, description, requirements, salary_range, active, created_at) '
+             'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'),
+    'applications': ('INSERT INTO job_applications (job_id, name, email, phone, resume_path, cover_letter, status, created_at) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'),
+    'messages': ('INSERT INTO contact_messages (name, email, subject, message, status, created_at) '
+                 'VALUES (?, ?, ?, ?, ?, ?)'),
+}
+
+
+def generate(database, seed=42, volumes=None, progress=print):
+    """Fill `database` with synthetic rows in chunked transactions
+
+    The schema is migrated first, so search indexes, counters and version
+    triggers are maintained exactly as they are in production.
+    """
+    volumes = dict(DEFAULT_VOLUMES, **(volumes or {}))
+    conn = db.connect(database)
+    migrations.migrate(conn)
+    gen = Generator(seed)
+
+    job_count = volumes['jobs'] + conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+    factories = {
+        'posts': gen.post,
+        'services': gen.service,
+        'jobs': gen.job,
+        'applications': lambda: gen.application(max(job_count, 1)),
+        'messages': gen.message,
+    }
+
+    for name in ('services', 'jobs', 'posts', 'applications', 'messages'):
+        total = volumes[name]
+        for start in range(0, total, CHUNK_SIZE):
+            rows = [factories[name]() for _ in range(min(CHUNK_SIZE, total - start))]
+            with conn:
+                conn.executemany(INSERTS[name], rows)
+            progress(f'{name}: {start + len(rows)}/{total}')
+
+    conn.execute('PRAGMA optimize')
+    conn.close()
+    return volumes
@@ -0,0 +1,127 @@
+"""
+Concurrent HTTP load driver, optionally against a locally started gunicorn
+serving either the sync WSGI app or the ASGI entry point
+"""
+
+import os
+import sys
+import time
+import socket
+import random
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from benchmarks.report import summarize
+
+# Weighted mix of public traffic; {word} and {prefix} are randomized
+TRAFFIC = [
+    (20, 'index', '/'),
+    (10, 'services', '/services'),
+    (15, 'blog', '/blog'),
+    (5, 'blog: search', '/blog?search={word}'),
+    (15, 'careers', '/careers'),
+    (5, 'careers: search', '/careers?search={word}'),
+    (25, 'api_search', '/api/search?q={prefix}'),
+    (5, 'about', '/about'),
+]
+
+# gunicorn worker class and application for each serving mode
+MODES = {
+    'sync': ('sync', 'app:app'),
+    'asgi': ('uvicorn.workers.UvicornWorker', 'asgi:application'),
+}
+
+
+def start_gunicorn(port, workers, database, threads=1, worker_class='sync', application='app:app'):
+    """Start gunicorn serving `application` and wait until it accepts connections"""
+    env = dict(os.environ, NEXTWAVE_DATABASE=database)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '--threads', str(threads),
+         '-k', worker_class, '-b', f'127.0.0.1:{port}', '--log-level', 'warning', application],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30s')
+
+
+def run(base_url, duration=30.0, concurrency=16, seed=42, traffic=None):
+    """Drive the traffic mix for `duration` seconds; returns {name: summary}"""
+    from benchmarks.datagen import WORDS
+
+    traffic = traffic or TRAFFIC
+    weights = [weight for weight, _, _ in traffic]
+    latencies = {name: [] for _, name, _ in traffic}
+    errors = {name: 0 for _, name, _ in traffic}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        rng = random.Random(seed + index)
+        while time.monotonic() < deadline:
+            _, name, template = rng.choices(traffic, weights)[0]
+            word = rng.choice(WORDS)
+            url = base_url + template.format(word=word, prefix=word[:rng.randint(2, len(word))])
+            started = time.perf_counter()
+            failed = False
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[name].append(elapsed)
+                errors[name] += failed
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    results = {name: summarize(values, errors[name], elapsed) for name, values in latencies.items()}
+    results['total'] = summarize([v for values in latencies.values() for v in values],
+                                 sum(errors.values()), elapsed)
+    return results
+
+
+def compare_modes(port, database, workers=4, duration=30.0, concurrency=64, seed=42, modes=('sync', 'asgi')):
+    """Run the same traffic against each serving mode in turn
+
+    Returns {'<mode>: <route>': summary}, one gunicorn at a time on `port`.
+    """
+    results = {}
+    for mode in modes:
+        worker_class, application = MODES[mode]
+        server = start_gunicorn(port, workers, database, worker_class=worker_class, application=application)
+        try:
+            run(f'http://127.0.0.1:{port}', min(duration, 5.0), concurrency, seed)  # warm caches
+            for name, summary in run(f'http://127.0.0.1:{port}', duration, concurrency, seed).items():
+                results[f'{mode}: {name}'] = summary
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def print_mode_comparison(results, modes=('sync', 'asgi')):
+    """Throughput of each route per mode, relative to the first"""
+    base = modes[0]
+    routes = [name.split(': ', 1)[1] for name in results if name.startswith(f'{base}: ')]
+    print(f'{"route":<24}' + ''.join(f'{mode + " rps":>12}' for mode in modes) + f'{"speedup":>10}')
+    for route in routes:
+        rps = [results.get(f'{mode}: {route}', {}).get('throughput_rps', 0.0) for mode in modes]
+        speedup = rps[-1] / rps[0] if rps[0] else 0.0
+        print(f'{route:<24}' + ''.join(f'{value:>12.1f}' for value in rps) + f'{speedup:>9.2f}x')
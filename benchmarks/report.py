@@ -0,0 +1,85 @@
+"""
+Latency summaries, JSON reports and regression checks for benchmark runs
+"""
+
+import json
+import math
+import time
+import platform
+import subprocess
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, errors=0, elapsed=None):
+    """p50/p95/p99, mean and throughput for a list of latencies in seconds"""
+    values = sorted(latencies)
+    count = len(values)
+    elapsed = elapsed if elapsed is not None else sum(values)
+    return {
+        'count': count,
+        'errors': errors,
+        'mean_ms': sum(values) / count * 1000 if count else 0.0,
+        'p50_ms': percentile(values, 0.50) * 1000,
+        'p95_ms': percentile(values, 0.95) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+        'max_ms': values[-1] * 1000 if values else 0.0,
+        'throughput_rps': count / elapsed if elapsed else 0.0,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path, kind, results, **meta):
+    """Save a run as JSON with enough metadata to compare it later"""
+    report = {
+        'kind': kind,
+        'meta': dict(meta, created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                     git_revision=git_revision(), python=platform.python_version()),
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+def print_table(results):
+    print(f'{"route":<40} {"count":>7} {"err":>5} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"rps":>9}')
+    for name, stats in results.items():
+        print(f'{name:<40} {stats["count"]:>7} {stats["errors"]:>5} {stats["p50_ms"]:>9.2f} '
+              f'{stats["p95_ms"]:>9.2f} {stats["p99_ms"]:>9.2f} {stats["throughput_rps"]:>9.1f}')
+
+
+def compare(baseline_path, current_path, threshold=0.2, metric='p95_ms', min_ms=1.0):
+    """Routes whose `metric` regressed by more than `threshold` (a fraction)
+
+    Latencies under `min_ms` in both runs are ignored as noise.
+    Returns a list of (route, baseline, current, change) tuples.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    with open(current_path) as f:
+        current = json.load(f)['results']
+
+    regressions = []
+    for name, stats in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name][metric], stats[metric]
+        if max(before, after) < min_ms:
+            continue
+        change = (after - before) / before if before else float('inf')
+        if change > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
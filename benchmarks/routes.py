@@ -0,0 +1,91 @@
+"""
+In-process route benchmarks through the Flask test client
+"""
+
+import time
+import logging
+import random
+
+# (name, path); {post}, {job} and {word} are filled from the database
+ROUTES = [
+    ('index', '/'),
+    ('about', '/about'),
+    ('services', '/services'),
+    ('blog', '/blog'),
+    ('blog: category', '/blog?category=Technology'),
+    ('blog: search', '/blog?search={word}'),
+    ('blog: deep page', '/api/blog/posts?cursor={blog_cursor}'),
+    ('blog_post', '/blog/{post}'),
+    ('careers', '/careers'),
+    ('careers: department', '/careers?department=Engineering'),
+    ('careers: search', '/careers?search={word}'),
+    ('job_detail', '/job/{job}'),
+    ('api_search', '/api/search?q={prefix}'),
+    ('admin_dashboard', '/admin'),
+]
+
+
+def sample_id(conn, rng, table, where):
+    """An existing id picked by `rng`, so a seeded run requests the same rows"""
+    low, high = conn.execute(f'SELECT MIN(id), MAX(id) FROM {table} WHERE {where}').fetchone()
+    if low is None:
+        return 1
+    return conn.execute(f'SELECT id FROM {table} WHERE id >= ? AND {where} ORDER BY id LIMIT 1',
+                        (rng.randint(low, high),)).fetchone()[0]
+
+
+def sample_params(conn, rng):
+    """Random existing ids and search terms, so cached paths are not all hot"""
+    from benchmarks.datagen import WORDS
+    import pagination
+
+    deep = conn.execute('SELECT created_at, id FROM blog_posts WHERE published = 1 '
+                        'ORDER BY created_at LIMIT 1').fetchone()
+    word = rng.choice(WORDS)
+    return {
+        'post': sample_id(conn, rng, 'blog_posts', 'published = 1'),
+        'job': sample_id(conn, rng, 'jobs', 'active = 1'),
+        'word': word,
+        'prefix': word[:rng.randint(2, len(word))],
+        'blog_cursor': pagination.encode_cursor(deep[0], deep[1]) if deep else '',
+    }
+
+
+def run(iterations=200, warmup=10, seed=42, page_cache=True, routes=None):
+    """Time every route; returns {name: summary}
+
+    Import the app only after NEXTWAVE_DATABASE points at the database to
+    measure.
+    """
+    from app import app
+    from db import connect
+    from benchmarks.report import summarize
+
+    logging.getLogger('app').setLevel(logging.CRITICAL)
+    app.config['PAGE_CACHE_ENABLED'] = page_cache
+    app.extensions['page_cache'].enabled = page_cache
+    rng = random.Random(seed)
+    conn = connect(app.config['DATABASE'])
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    results = {}
+    for name, template in routes or ROUTES:
+        latencies = []
+        errors = 0
+        for i in range(warmup + iterations):
+            path = template.format(**sample_params(conn, rng))
+            started = time.perf_counter()
+            try:
+                failed = client.get(path).status_code >= 400
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            if i < warmup:
+                continue
+            latencies.append(elapsed)
+            errors += failed
+        results[name] = summarize(latencies, errors)
+    conn.close()
+    return results
@@ -0,0 +1,323 @@
+"""
+Nextwave Company Website - Bulk export and import
+Exports stream job applications and contact messages as CSV or NDJSON in
+id-ordered batches, so memory stays flat however many rows match. Imports
+load jobs, services and blog posts from CSV or NDJSON in chunked
+executemany transactions, validating each row and optionally upserting on id.
+"""
+
+import io
+import csv
+import json
+import datetime
+import sqlite3
+import logging
+import archive
+import db
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+# Exportable table -> columns, in output order
+EXPORTS = {
+    'job_applications': ('id', 'job_id', 'name', 'email', 'phone', 'resume_path',
+                         'cover_letter', 'status', 'created_at'),
+    'contact_messages': ('id', 'name', 'email', 'subject', 'message', 'status', 'created_at'),
+}
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Importable table -> {column: (type, required)}; id is optional for upserts
+IMPORTS = {
+    'jobs': {
+        'id': ('int', False),
+        'title': ('text', True),
+        'department': ('text', True),
+        'location': ('text', True),
+        'type': ('text', True),
+        'description': ('text', True),
+        'requirements': ('text', False),
+        'salary_range': ('text', False),
+        'active': ('bool', False),
+    },
+    'services': {
+        'id': ('int', False),
+        'title': ('text', True),
+        'description': ('text', True),
+        'icon': ('text', False),
+        'featured': ('bool', False),
+    },
+    'blog_posts': {
+        'id': ('int', False),
+        'title': ('text', True),
+        'content': ('text', True),
+        'author': ('text', True),
+        'category': ('text', False),
+        'featured_image': ('text', False),
+        'published': ('bool', False),
+    },
+}
+
+_TRUE = ('1', 'true', 'yes', 'y', 'on')
+_FALSE = ('0', 'false', 'no', 'n', 'off', '')
+
+
+def parse_date_range(since=None, until=None):
+    """Validate YYYY-MM-DD[ HH:MM:SS] bounds; a date-only `until` is inclusive
+
+    Returns (since, until_exclusive) as SQLite timestamp strings or None.
+    Raises ValueError for malformed input.
+    """
+    def parse(value):
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+            try:
+                return datetime.datetime.strptime(value, fmt), fmt == '%Y-%m-%d'
+            except ValueError:
+                continue
+        raise ValueError(f'Invalid date: {value!r} (expected YYYY-MM-DD)')
+
+    start = end = None
+    if since:
+        start = parse(since)[0].strftime('%Y-%m-%d %H:%M:%S')
+    if until:
+        moment, date_only = parse(until)
+        if date_only:
+            moment += datetime.timedelta(days=1)
+        else:
+            moment += datetime.timedelta(seconds=1)
+        end = moment.strftime('%Y-%m-%d %H:%M:%S')
+    return start, end
+
+
+def iter_rows(database, table, since=None, until=None, status=None, batch_size=EXPORT_BATCH_SIZE,
+              archive_path=None):
+    """Yield matching rows of an export table as dicts, oldest id first
+
+    Each batch is a separate short query seeking past the last id, so no
+    read transaction is held open for the length of the export and WAL
+    checkpoints are not blocked. With `archive_path`, archived rows are
+    included.
+    """
+    columns = EXPORTS[table]
+    where = ['id > ?']
+    params = []
+    if since:
+        where.append('created_at >= ?')
+        params.append(since)
+    if until:
+        where.append('created_at < ?')
+        params.append(until)
+    if status:
+        where.append('status = ?')
+        params.append(status)
+
+    conn = db.connect(database)
+    try:
+        source = table
+        if archive_path:
+            archive.attach(conn, archive_path)
+            source = archive.history_source(conn, table)
+        query = f"SELECT {', '.join(columns)} FROM {source} WHERE {' AND '.join(where)} ORDER BY id LIMIT ?"
+        last_id = 0
+        while True:
+            rows = conn.execute(query, [last_id, *params, batch_size]).fetchall()
+            for row in rows:
+                yield dict(row)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]['id']
+    finally:
+        conn.close()
+
+
+def stream_csv(columns, rows, flush_every=EXPORT_BATCH_SIZE):
+    """CSV text chunks for `rows`, a header line first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= flush_every:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows, flush_every=EXPORT_BATCH_SIZE):
+    """Newline-delimited JSON chunks for `rows`"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+        if len(lines) >= flush_every:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def export(database, table, fmt, since=None, until=None, status=None, archive_path=None):
+    """Generator of text chunks exporting `table` in `fmt`
+
+    Pass the archive database as `archive_path` to include archived rows.
+    """
+    if table not in EXPORTS or fmt not in FORMATS:
+        raise ValueError(f'Cannot export {table} as {fmt}')
+    since, until = parse_date_range(since, until)
+    rows = iter_rows(database, table, since, until, status, archive_path=archive_path)
+    if fmt == 'csv':
+        return stream_csv(EXPORTS[table], rows)
+    return stream_ndjson(rows)
+
+
+def read_records(stream, fmt):
+    """Yield (line_number, dict) from a CSV or NDJSON text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'ndjson':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, e
+                continue
+            yield number, record
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def validate(table, record):
+    """Coerce one import record to column values; raises ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError('record is not an object')
+    spec = IMPORTS[table]
+    unknown = set(record) - set(spec)
+    if unknown:
+        raise ValueError(f"unknown column(s): {', '.join(sorted(unknown))}")
+
+    values = {}
+    for column, (kind, required) in spec.items():
+        value = record.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        if value in (None, ''):
+            if required:
+                raise ValueError(f'{column} is required')
+            continue
+        if kind == 'int':
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'{column} must be an integer') from None
+            if value < 1:
+                raise ValueError(f'{column} must be positive')
+        elif kind == 'bool':
+            text = str(value).lower()
+            if text in _TRUE:
+                value = 1
+            elif text in _FALSE:
+                value = 0
+            else:
+                raise ValueError(f'{column} must be true or false')
+        else:
+            value = str(value)
+        values[column] = value
+    return values
+
+
+def _statement(table, columns, upsert):
+    placeholders = ', '.join('?' for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if upsert and 'id' in columns:
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns if c != 'id')
+        sql += f' ON CONFLICT (id) DO UPDATE SET {updates}'
+    return sql
+
+
+def import_records(conn, table, records, upsert=False, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Validate and write `records` ((line, record) pairs) into `table`
+
+    Valid rows are grouped by their column set and written with
+    executemany, one transaction per chunk, so a failure loses at most the
+    current chunk and other writers are never blocked for long. Invalid
+    rows are skipped and reported. Without `upsert`, a row whose id already
+    exists is an error. `progress(summary)` is called after every chunk.
+    Returns the summary dict.
+    """
+    if table not in IMPORTS:
+        raise ValueError(f'Cannot import into {table}')
+
+    summary = {'table': table, 'processed': 0, 'written': 0, 'invalid': 0, 'errors': []}
+
+    def error(line, message):
+        summary['invalid'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line, 'error': message})
+
+    def flush(chunk):
+        groups = {}
+        for line, values in chunk:
+            groups.setdefault(tuple(values), []).append((line, values))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for columns, rows in groups.items():
+                sql = _statement(table, columns, upsert)
+                conn.execute('SAVEPOINT import_group')
+                try:
+                    conn.executemany(sql, [tuple(values.values()) for _, values in rows])
+                    conn.execute('RELEASE import_group')
+                    summary['written'] += len(rows)
+                except sqlite3.IntegrityError:
+                    # Undo the rows before the failing one, then find the
+                    # offending rows one by one; the rest still go in
+                    conn.execute('ROLLBACK TO import_group')
+                    conn.execute('RELEASE import_group')
+                    for line, values in rows:
+                        try:
+                            conn.execute(sql, tuple(values.values()))
+                            summary['written'] += 1
+                        except sqlite3.IntegrityError as row_error:
+                            error(line, str(row_error))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.debug('Imported chunk of %d rows into %s', len(chunk), table)
+        if progress is not None:
+            progress(summary)
+
+    if conn.in_transaction:
+        conn.commit()
+
+    chunk = []
+    for line, record in records:
+        summary['processed'] += 1
+        if isinstance(record, Exception):
+            error(line, f'invalid JSON: {record}')
+            continue
+        try:
+            chunk.append((line, validate(table, record)))
+        except ValueError as e:
+            error(line, str(e))
+            continue
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    elif progress is not None:
+        progress(summary)
+    return summary
@@ -0,0 +1,95 @@
+"""
+Nextwave Company Website - Admin dashboard counters
+Counters kept current by triggers, so the dashboard reads them in O(1)
+instead of counting whole tables on every load.
+"""
+
+# Counter name -> (table, SQL predicate on a row of that table, aliased {r})
+COUNTERS = {
+    'total_posts': ('blog_posts', '1'),
+    'published_posts': ('blog_posts', '{r}.published IS 1'),
+    'total_services': ('services', '1'),
+    'active_jobs': ('jobs', '{r}.active IS 1'),
+    'pending_applications': ('job_applications', "{r}.status IS 'pending'"),
+    'unread_messages': ('contact_messages', "{r}.status IS 'unread'"),
+}
+
+
+# Read by primary key so the dashboard never scans the table
+READ_SQL = 'SELECT name, value FROM dashboard_stats WHERE name IN ({})'.format(', '.join('?' * len(COUNTERS)))
+
+
+def _predicate(name, row):
+    return COUNTERS[name][1].format(r=row)
+
+
+def recompute(conn):
+    """Count every counter from scratch"""
+    values = {}
+    for name, (table, _) in COUNTERS.items():
+        values[name] = conn.execute(
+            f'SELECT COUNT(*) FROM {table} WHERE {_predicate(name, table)}'
+        ).fetchone()[0]
+    return values
+
+
+def create_counters(c):
+    """Create the dashboard_stats table, its triggers and initial values"""
+    c.execute('''CREATE TABLE IF NOT EXISTS dashboard_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                )''')
+
+    tables = {}
+    for name, (table, _) in COUNTERS.items():
+        tables.setdefault(table, []).append(name)
+
+    for table, names in tables.items():
+        inserts = ''.join(
+            f"UPDATE dashboard_stats SET value = value + ({_predicate(name, 'new')}) WHERE name = '{name}';\n"
+            for name in names
+        )
+        deletes = ''.join(
+            f"UPDATE dashboard_stats SET value = value - ({_predicate(name, 'old')}) WHERE name = '{name}';\n"
+            for name in names
+        )
+        # Unconditional counters cannot change on UPDATE
+        updates = ''.join(
+            f"UPDATE dashboard_stats SET value = value + ({_predicate(name, 'new')}) - ({_predicate(name, 'old')}) "
+            f"WHERE name = '{name}';\n"
+            for name in names if COUNTERS[name][1] != '1'
+        )
+
+        c.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_stats_insert AFTER INSERT ON {table} BEGIN\n{inserts}END')
+        c.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_stats_delete AFTER DELETE ON {table} BEGIN\n{deletes}END')
+        if updates:
+            c.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_stats_update AFTER UPDATE ON {table} BEGIN\n{updates}END')
+
+    for name, value in recompute(c).items():
+        c.execute('INSERT OR REPLACE INTO dashboard_stats (name, value) VALUES (?, ?)', (name, value))
+
+
+def read_counters(conn):
+    """Current value of every dashboard counter"""
+    values = {name: 0 for name in COUNTERS}
+    for row in conn.execute(READ_SQL, tuple(COUNTERS)).fetchall():
+        if row[0] in values:
+            values[row[0]] = row[1]
+    return values
+
+
+def reconcile(conn, fix=True):
+    """Compare counters with a full recount, optionally correcting them
+
+    Returns {name: (stored, actual)} for every counter that had drifted.
+    """
+    stored = read_counters(conn)
+    actual = recompute(conn)
+    drift = {name: (stored[name], actual[name]) for name in COUNTERS if stored[name] != actual[name]}
+
+    if fix and drift:
+        conn.executemany('INSERT OR REPLACE INTO dashboard_stats (name, value) VALUES (?, ?)',
+                         [(name, actual[name]) for name in drift])
+        conn.commit()
+
+    return drift
@@ -0,0 +1,238 @@
+"""
+Nextwave Company Website - Database connection layer
+Pooled SQLite connections in WAL mode, bound to the Flask application context
+"""
+
+import os
+import queue
+import contextlib
+import sqlite3
+import threading
+import time
+import logging
+from flask import g, current_app, has_request_context
+
+logger = logging.getLogger(__name__)
+
+# Connection defaults, overridable through app.config (DB_* keys)
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_TIMEOUT = 5.0           # seconds to wait for a free connection
+DEFAULT_MMAP_SIZE = 64 * 1024 * 1024  # bytes
+DEFAULT_CACHE_SIZE = -16000          # negative = KiB, so ~16 MB of page cache
+DEFAULT_BUSY_TIMEOUT = 5000          # milliseconds
+DEFAULT_CACHED_STATEMENTS = 256      # prepared statements kept per connection
+
+
+def connect(database, mmap_size=DEFAULT_MMAP_SIZE, cache_size=DEFAULT_CACHE_SIZE,
+            busy_timeout=DEFAULT_BUSY_TIMEOUT, cached_statements=DEFAULT_CACHED_STATEMENTS,
+            auto_vacuum=None):
+    """Open a tuned SQLite connection
+
+    WAL lets readers proceed while a writer commits, and synchronous=NORMAL
+    is durable across application crashes in WAL mode while skipping an
+    fsync per commit. auto_vacuum (e.g. 'INCREMENTAL') only applies to a
+    new, empty file, so it is set before the switch to WAL writes the header.
+    """
+    conn = sqlite3.connect(database, timeout=busy_timeout / 1000,
+                           check_same_thread=False, cached_statements=cached_statements)
+    conn.row_factory = sqlite3.Row
+    if auto_vacuum:
+        conn.execute(f'PRAGMA auto_vacuum = {auto_vacuum}')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA mmap_size = {int(mmap_size)}')
+    conn.execute(f'PRAGMA cache_size = {int(cache_size)}')
+    conn.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections for one worker process
+
+    Idle connections are handed out last-in first-out so a busy thread keeps
+    getting the same warm connection and its statement cache. The pool is
+    reset when it notices it is running in a forked child, so gunicorn
+    workers never share a connection inherited from the master.
+    """
+
+    def __init__(self, database, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_POOL_TIMEOUT, **connect_args):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.connect_args = connect_args
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._in_use = 0
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Connections opened by the parent are left untouched
+                    self._reset()
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if below the limit"""
+        self._check_fork()
+        start = time.perf_counter()
+
+        try:
+            conn = self._idle.get_nowait()
+            hit = True
+        except queue.Empty:
+            with self._lock:
+                can_open = self._created < self.size
+                if can_open:
+                    self._created += 1
+            if can_open:
+                try:
+                    conn = connect(self.database, **self.connect_args)
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                hit = False
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f'database connection pool exhausted after {self.timeout}s'
+                    ) from None
+                hit = True
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            self._waits += 1
+            self._wait_time += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            logger.warning('Discarding broken database connection')
+            with self._lock:
+                self._created -= 1
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        """Hit/miss counts and acquisition wait times"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'pid': self._pid,
+                'size': self.size,
+                'open': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / total if total else 0.0,
+                'avg_wait_ms': self._wait_time / self._waits * 1000 if self._waits else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+            }
+
+
+def init_app(app):
+    """Create the app's connection pool and register the teardown handler"""
+    app.extensions['db_pool'] = ConnectionPool(
+        app.config['DATABASE'],
+        size=app.config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+        timeout=app.config.get('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        mmap_size=app.config.get('DB_MMAP_SIZE', DEFAULT_MMAP_SIZE),
+        cache_size=app.config.get('DB_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+        busy_timeout=app.config.get('DB_BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT),
+        cached_statements=app.config.get('DB_CACHED_STATEMENTS', DEFAULT_CACHED_STATEMENTS),
+    )
+    app.teardown_appcontext(close_db)
+
+
+def get_db():
+    """Connection for the current app context, released on teardown
+
+    Anonymous GET requests get the local read-only replica instead when one
+    is configured (see replication.py).
+    """
+    if 'db' not in g:
+        replica = current_app.extensions.get('replica')
+        conn = replica.reader() if replica is not None and has_request_context() else None
+        if conn is not None:
+            g.db_replica = True
+        else:
+            conn = current_app.extensions['db_pool'].acquire()
+        g.db = conn
+    return g.db
+
+
+@contextlib.contextmanager
+def borrowed():
+    """Connection for a single call from an async view's executor thread
+
+    Uses the context's connection if it already holds one; otherwise the
+    replica or a pooled connection, returned as soon as the call is done.
+    """
+    if 'db' in g:
+        yield g.db
+        return
+    replica = current_app.extensions.get('replica')
+    conn = replica.reader() if replica is not None and has_request_context() else None
+    if conn is not None:
+        yield conn
+        return
+    pool = current_app.extensions['db_pool']
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def close_db(exception=None):
+    """Return the app context's connection to the pool"""
+    conn = g.pop('db', None)
+    if g.pop('db_replica', False):
+        return  # per-thread replica connection, kept open
+    if conn is not None:
+        current_app.extensions['db_pool'].release(conn)
+
+
+def pool_stats():
+    """Statistics for the current app's connection pool"""
+    return current_app.extensions['db_pool'].stats()
@@ -0,0 +1,168 @@
+"""
+Nextwave Company Website - HTTP caching
+ETag / Last-Modified validators and Cache-Control policies, checked before
+a view touches its templates so repeat visitors and the CDN get a 304.
+"""
+
+import os
+import inspect
+import hashlib
+import datetime
+import functools
+from flask import current_app, request, session, Response
+import aio
+
+DEFAULT_PUBLIC_MAX_AGE = 60  # seconds browsers and the CDN may reuse a page
+
+
+def parse_timestamp(value):
+    """Parse an SQLite CURRENT_TIMESTAMP value (UTC) into an aware datetime"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def _session_dependent():
+    """Whether the response may differ for this visitor's session"""
+    return bool(session.get('theme')) or 'user_id' in session
+
+
+def no_store(view):
+    """Mark a view whose responses no cache may store (admin and operator pages)"""
+    view.no_store = True
+    return view
+
+
+def cache_control_for(response, max_age=None):
+    """Apply the public or session-dependent Cache-Control policy"""
+    if max_age is None:
+        max_age = current_app.config.get('HTTP_CACHE_PUBLIC_MAX_AGE', DEFAULT_PUBLIC_MAX_AGE)
+    if _session_dependent():
+        # Theme and login live in the session cookie: only the browser may
+        # keep a copy, and it must revalidate every time
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    return response
+
+
+def conditional(*tables, validator=None):
+    """Answer conditional GETs for a view with a 304 before it renders
+
+    The ETag covers the build, endpoint, view arguments, query string, theme
+    and the version counters of `tables`. `validator(**view_args)` may add a
+    per-row stamp: it returns None when the row does not exist (the view then
+    runs normally), or a (stamp, last_modified) pair.
+    """
+    def validators(kwargs):
+        """(etag, last_modified), or None when the view should just run"""
+        if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+            return None
+
+        last_modified = None
+        row_stamp = ''
+        if validator is not None:
+            result = validator(**kwargs)
+            if result is None:
+                return None
+            row_stamp, last_modified = result
+
+        versions = current_app.extensions['page_cache'].versions()
+        parts = [
+            current_app.config['HTTP_CACHE_BUILD_ID'],
+            request.endpoint,
+            repr(sorted(kwargs.items())),
+            repr(sorted(request.args.items(multi=True))),
+            session.get('theme', 'light'),
+            ','.join(f'{table}:{versions.get(table, 0)}' for table in tables),
+            str(row_stamp),
+        ]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest(), last_modified
+
+    def finish(response, etag, last_modified):
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        return cache_control_for(response)
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                # Validators and table versions may read SQLite
+                checked = await aio.call(validators, kwargs)
+                if checked is None:
+                    return await view(*args, **kwargs)
+                etag, last_modified = checked
+                if _not_modified(etag, last_modified):
+                    return finish(Response(status=304), etag, last_modified)
+                response = current_app.make_response(await view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                return finish(response, etag, last_modified)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            checked = validators(kwargs)
+            if checked is None:
+                return view(*args, **kwargs)
+            etag, last_modified = checked
+            if _not_modified(etag, last_modified):
+                return finish(Response(status=304), etag, last_modified)
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            return finish(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def build_id(app):
+    """Stamp of the deployed code, templates and asset build, so a deploy changes ETags
+
+    Derived from file modification times so every worker on a host agrees.
+    """
+    paths = [os.path.join(app.root_path, name) for name in os.listdir(app.root_path) if name.endswith('.py')]
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        paths.extend(os.path.join(root, name) for name in files)
+    # Rebuilt assets change the hashed URLs pages link to
+    manifest = os.path.join(app.static_folder, app.config.get('ASSET_DIST_DIR', 'dist'), 'manifest.json')
+    if os.path.exists(manifest):
+        paths.append(manifest)
+    latest = max((os.path.getmtime(path) for path in paths), default=0.0)
+    return str(int(latest))
+
+
+def init_app(app):
+    """Register the default Cache-Control policy for no_store views and other pages"""
+    app.config.setdefault('HTTP_CACHE_BUILD_ID', build_id(app))
+
+    @app.after_request
+    def default_cache_control(response):
+        if getattr(current_app.view_functions.get(request.endpoint), 'no_store', False):
+            response.cache_control.no_store = True
+            response.cache_control.private = True
+        elif 'Cache-Control' not in response.headers and request.endpoint != 'static':
+            # Anything not explicitly validated is rendered per request
+            response.cache_control.no_cache = True
+            if _session_dependent():
+                response.cache_control.private = True
+                response.vary.add('Cookie')
+        return response
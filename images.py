@@ -0,0 +1,241 @@
+"""
+Nextwave Company Website - Responsive image variants
+Resized WebP and JPEG variants of static images at fixed widths, generated
+with Pillow on first request (or ahead of time with `flask warm-images`),
+stored on disk under the source's content hash and served immutable.
+Templates render them through responsive_image(), which emits a <picture>
+with srcset/sizes so browsers download only the width they display.
+"""
+
+import os
+import fcntl
+import hashlib
+import tempfile
+import threading
+import logging
+from markupsafe import Markup, escape
+from flask import current_app, request, send_file, url_for, abort
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280)
+DEFAULT_VARIANT_DIR = 'image_variants'
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class SourceInfo:
+    """Content hash and pixel size of a source image"""
+
+    def __init__(self, digest, width, height):
+        self.digest = digest
+        self.width = width
+        self.height = height
+
+
+class ImageVariants:
+    """Generates, caches and serves resized variants of static images"""
+
+    def __init__(self, app=None):
+        self._info = {}          # (path, mtime, size) -> SourceInfo or None
+        self._info_lock = threading.Lock()
+        self._inflight = {}      # variant path -> lock shared by its waiters
+        self._inflight_lock = threading.Lock()
+        self.generated = 0
+        self.collapsed = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.widths = tuple(app.config.get('IMAGE_WIDTHS', DEFAULT_WIDTHS))
+        self.directory = app.config.get('IMAGE_VARIANT_DIR', DEFAULT_VARIANT_DIR)
+        self.static_folder = app.static_folder
+        app.extensions['images'] = self
+        app.jinja_env.globals['responsive_image'] = responsive_image
+        app.jinja_env.globals['image_srcset'] = image_srcset
+        app.add_url_rule('/img/<int:width>/<fmt>/<path:source>', 'image_variant', serve_variant)
+
+    def source_path(self, source):
+        """Absolute path of a static image, or None if it is outside static/"""
+        path = os.path.realpath(os.path.join(self.static_folder, source))
+        root = os.path.realpath(self.static_folder)
+        if not path.startswith(root + os.sep) or not path.lower().endswith(SOURCE_EXTENSIONS):
+            return None
+        return path
+
+    def info(self, source):
+        """SourceInfo for a static image, or None when it cannot be decoded
+
+        Memoized by path, mtime and size so a page render costs a stat() per
+        image, not a hash.
+        """
+        path = self.source_path(source)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._info_lock:
+            if key in self._info:
+                return self._info[key]
+
+        info = None
+        try:
+            from PIL import Image
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            with Image.open(path) as image:
+                info = SourceInfo(digest, *image.size)
+        except Exception:
+            logger.warning('Cannot read image %s; serving it unresized', source)
+
+        with self._info_lock:
+            self._info[key] = info
+        return info
+
+    def widths_for(self, info):
+        """Variant widths worth offering: never upscaled past the source"""
+        widths = [w for w in self.widths if w < info.width]
+        return widths + [min(info.width, max(self.widths))]
+
+    def variant_path(self, info, width, fmt):
+        return os.path.join(self.directory, info.digest[:2], f'{info.digest}-{width}.{fmt}')
+
+    def ensure(self, source, width, fmt):
+        """Path of a variant, generating it if needed
+
+        Concurrent requests for the same variant wait on one generation: a
+        per-variant lock within the process and an flock across workers.
+        """
+        info = self.info(source)
+        if info is None or fmt not in FORMATS:
+            return None
+        width = min(width, info.width)
+        path = self.variant_path(info, width, fmt)
+        if os.path.exists(path):
+            return path
+
+        with self._inflight_lock:
+            lock = self._inflight.setdefault(path, threading.Lock())
+        with lock:
+            try:
+                if os.path.exists(path):
+                    self.collapsed += 1
+                    return path
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + '.lock', 'w') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    if os.path.exists(path):
+                        self.collapsed += 1
+                    else:
+                        self._generate(self.source_path(source), path, width, fmt)
+                        self.generated += 1
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(path, None)
+        return path
+
+    def _generate(self, source_path, path, width, fmt):
+        from PIL import Image, ImageOps
+
+        pil_format, _, options = FORMATS[fmt]
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            elif fmt == 'webp' and image.mode not in ('RGB', 'RGBA', 'L'):
+                image = image.convert('RGBA')
+            if image.width > width:
+                height = round(image.height * width / image.width)
+                image = image.resize((width, height), Image.LANCZOS)
+            # Written beside the target and renamed so readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    image.save(f, pil_format, **options)
+                os.replace(tmp, path)
+            except Exception:
+                os.remove(tmp)
+                raise
+        logger.info('Generated %s', path)
+
+    def warm(self, source):
+        """Generate every variant of a source; returns how many exist"""
+        info = self.info(source)
+        if info is None:
+            return 0
+        return sum(1 for width in self.widths_for(info) for fmt in FORMATS if self.ensure(source, width, fmt))
+
+    def stats(self):
+        return {'generated': self.generated, 'collapsed': self.collapsed, 'sources': len(self._info)}
+
+
+def variant_url(source, width, fmt, info):
+    return url_for('image_variant', width=width, fmt=fmt, source=source, v=info.digest[:12])
+
+
+def image_srcset(source, fmt='jpeg'):
+    """srcset value listing every width of a static image in one format"""
+    images = current_app.extensions['images']
+    info = images.info(source)
+    if info is None:
+        return url_for('static', filename=source)
+    return ', '.join(f'{variant_url(source, w, fmt, info)} {w}w' for w in images.widths_for(info))
+
+
+def responsive_image(source, alt, sizes='100vw', class_=None, lazy=True):
+    """<picture> offering WebP and JPEG variants of a static image
+
+    `sizes` tells the browser how wide the image is displayed so it can pick
+    the smallest sufficient variant. Falls back to a plain <img> when the
+    source cannot be decoded.
+    """
+    images = current_app.extensions['images']
+    info = images.info(source)
+    attrs = f' alt="{escape(alt)}"'
+    if class_:
+        attrs += f' class="{escape(class_)}"'
+    if lazy:
+        attrs += ' loading="lazy" decoding="async"'
+    if info is None:
+        return Markup(f'<img src="{escape(url_for("static", filename=source))}"{attrs}>')
+
+    widths = images.widths_for(info)
+    fallback = variant_url(source, widths[-1], 'jpeg', info)
+    height = round(info.height * widths[-1] / info.width)
+    return Markup(
+        f'<picture>'
+        f'<source type="image/webp" srcset="{escape(image_srcset(source, "webp"))}" sizes="{escape(sizes)}">'
+        f'<img src="{escape(fallback)}" srcset="{escape(image_srcset(source, "jpeg"))}" sizes="{escape(sizes)}"'
+        f' width="{widths[-1]}" height="{height}"{attrs}>'
+        f'</picture>'
+    )
+
+
+def serve_variant(width, fmt, source):
+    """Serve (generating on first request) one variant of a static image"""
+    images = current_app.extensions['images']
+    info = images.info(source)
+    # Only the advertised widths, so arbitrary sizes cannot fill the disk
+    if info is None or width not in images.widths_for(info):
+        abort(404)
+    path = images.ensure(source, width, fmt)
+    if path is None:
+        abort(404)
+
+    response = send_file(path, mimetype=FORMATS[fmt][1], conditional=True)
+    if request.args.get('v') == info.digest[:12]:
+        # The URL changes with the source's content, so it can be kept forever
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = 300
+    return response
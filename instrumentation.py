@@ -0,0 +1,414 @@
+"""
+Nextwave Company Website - Request instrumentation
+Times every SQL statement, template render and session cookie load/save per
+request, flags slow statements and N+1 query patterns, and exports it all as
+Prometheus histograms. Slow requests can optionally be profiled with cProfile.
+"""
+
+import os
+import re
+import time
+import random
+import pstats
+import cProfile
+import threading
+import logging
+from flask import g, request, has_request_context, before_render_template, template_rendered, request_finished
+from flask.sessions import SessionInterface
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through app.config (INSTRUMENTATION_* / PROFILE_* keys)
+DEFAULT_SLOW_QUERY_MS = 100
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5   # identical statements in one request
+DEFAULT_PROFILE_SAMPLE_RATE = 0.0  # fraction of requests profiled; 0 disables
+DEFAULT_PROFILE_SLOW_MS = 500
+DEFAULT_PROFILE_DIR = 'profiles'
+
+# Histogram bucket upper bounds
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Labelled Prometheus histogram with cumulative buckets"""
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(b), c, s)) for key, (b, c, s) in self._series.items())
+        for label_values, (buckets, count, total) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                le = _format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _format_labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {count}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, label_values)} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, label_values)} {total}')
+        return lines
+
+
+class Counter:
+    """Labelled Prometheus counter"""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class RequestTrace:
+    """Statements and timings collected while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = {}   # normalized SQL -> [count, seconds]
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.session_seconds = 0.0
+        self.profiler = None
+        self._templates = []
+
+    def record_statement(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        stats = self.statements.setdefault(_WHITESPACE_RE.sub(' ', sql).strip(), [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+
+
+def _current_trace(create=False):
+    if not has_request_context():
+        return None
+    trace = g.get('_trace')
+    if trace is None and create:
+        trace = g._trace = RequestTrace()
+    return trace
+
+
+class TracedCursor:
+    """sqlite3 cursor proxy that times execution and row fetching"""
+
+    def __init__(self, cursor, monitor):
+        self._cursor = cursor
+        self._monitor = monitor
+        self._sql = None
+
+    def _timed(self, sql, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._monitor.record(sql, time.perf_counter() - started)
+
+    def execute(self, sql, *args):
+        self._sql = sql
+        self._timed(sql, self._cursor.execute, sql, *args)
+        return self
+
+    def executemany(self, sql, *args):
+        self._sql = sql
+        self._timed(sql, self._cursor.executemany, sql, *args)
+        return self
+
+    def executescript(self, script):
+        self._sql = script
+        self._timed(script, self._cursor.executescript, script)
+        return self
+
+    # Rows are stepped lazily, so fetching is part of a statement's cost;
+    # it is recorded as time only, not as another query
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._monitor.record_fetch(self._sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TracedConnection:
+    """sqlite3 connection proxy whose statements are traced"""
+
+    def __init__(self, conn, monitor):
+        self._conn = conn
+        self._monitor = monitor
+
+    def cursor(self, *args):
+        return TracedCursor(self._conn.cursor(*args), self._monitor)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._conn.__exit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class TimedSessionInterface(SessionInterface):
+    """Wraps the app's session interface to time cookie decoding and signing
+
+    The session is opened before any before_request hook runs, so this is
+    where a request's trace starts.
+    """
+
+    def __init__(self, interface):
+        self.interface = interface
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            trace = _current_trace(create=True)
+            if trace is not None:
+                trace.session_seconds += time.perf_counter() - started
+
+    def open_session(self, app, request):
+        return self._timed(self.interface.open_session, app, request)
+
+    def save_session(self, app, session, response):
+        return self._timed(self.interface.save_session, app, session, response)
+
+    def __getattr__(self, name):
+        return getattr(self.interface, name)
+
+
+class Instrumentation:
+    """Per-request SQL, template and session timing with Prometheus export"""
+
+    def __init__(self, app=None):
+        self.request_duration = Histogram(
+            'nextwave_request_duration_seconds', 'Time spent handling a request',
+            ('endpoint', 'method', 'status'))
+        self.phase_duration = Histogram(
+            'nextwave_request_phase_seconds', 'Time per request spent in SQL, templates and the session cookie',
+            ('endpoint', 'phase'))
+        self.query_duration = Histogram(
+            'nextwave_sql_statement_duration_seconds', 'Execution and fetch time of a single SQL statement',
+            ('endpoint',))
+        self.queries_per_request = Histogram(
+            'nextwave_sql_queries_per_request', 'SQL statements executed per request',
+            ('endpoint',), buckets=COUNT_BUCKETS)
+        self.template_duration = Histogram(
+            'nextwave_template_render_seconds', 'Jinja render time per template',
+            ('endpoint', 'template'))
+        self.slow_queries = Counter(
+            'nextwave_sql_slow_statements_total', 'SQL statements slower than the slow query threshold',
+            ('endpoint',))
+        self.n_plus_one = Counter(
+            'nextwave_sql_n_plus_one_total', 'Requests repeating one statement at least the N+1 threshold',
+            ('endpoint',))
+        self.profiles = Counter(
+            'nextwave_profiles_written_total', 'cProfile dumps written for slow sampled requests',
+            ('endpoint',))
+        self._extra_metrics = []
+        self._profile_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('INSTRUMENTATION_ENABLED', True)
+        self.slow_query_seconds = app.config.get('INSTRUMENTATION_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS) / 1000
+        self.n_plus_one_threshold = app.config.get('INSTRUMENTATION_N_PLUS_ONE', DEFAULT_N_PLUS_ONE_THRESHOLD)
+        self.profile_rate = app.config.get('PROFILE_SAMPLE_RATE', DEFAULT_PROFILE_SAMPLE_RATE)
+        self.profile_slow_seconds = app.config.get('PROFILE_SLOW_MS', DEFAULT_PROFILE_SLOW_MS) / 1000
+        self.profile_dir = app.config.get('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        app.extensions['instrumentation'] = self
+        if not self.enabled:
+            return
+
+        app.session_interface = TimedSessionInterface(app.session_interface)
+        app.before_request(self._start_request)
+        app.after_request(self._add_server_timing)
+        app.teardown_request(self._stop_profiler)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        # Sent after the session cookie is saved, so every phase is complete
+        request_finished.connect(self._finish_request, app)
+
+    def traced(self, conn):
+        """Wrap a connection so its statements count towards this request"""
+        if not self.enabled or _current_trace() is None:
+            return conn
+        return TracedConnection(conn, self)
+
+    def record(self, sql, seconds):
+        trace = _current_trace()
+        if trace is None:
+            return
+        trace.record_statement(sql, seconds)
+        self.query_duration.observe(seconds, request.endpoint or 'unmatched')
+
+    def record_fetch(self, sql, seconds):
+        trace = _current_trace()
+        if trace is None or sql is None:
+            return
+        trace.sql_seconds += seconds
+        stats = trace.statements.get(_WHITESPACE_RE.sub(' ', sql).strip())
+        if stats is not None:
+            stats[1] += seconds
+
+    def _start_request(self):
+        trace = _current_trace(create=True)
+        if self.profile_rate and random.random() < self.profile_rate and self._profile_lock.acquire(blocking=False):
+            trace.profiler = cProfile.Profile()
+            trace.profiler.enable()
+
+    def _before_render(self, sender, template, context, **extra):
+        trace = _current_trace()
+        if trace is not None:
+            trace._templates.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        trace = _current_trace()
+        if trace is None or not trace._templates:
+            return
+        seconds = time.perf_counter() - trace._templates.pop()
+        # Nested renders (partials via render_template) count once, at the top
+        if not trace._templates:
+            trace.template_seconds += seconds
+        self.template_duration.observe(seconds, request.endpoint or 'unmatched', template.name or 'string')
+
+    def _add_server_timing(self, response):
+        trace = _current_trace()
+        if trace is not None:
+            response.headers['Server-Timing'] = (
+                f'sql;dur={trace.sql_seconds * 1000:.1f};desc="{trace.queries} queries", '
+                f'tpl;dur={trace.template_seconds * 1000:.1f}, '
+                f'app;dur={(time.perf_counter() - trace.started) * 1000:.1f}'
+            )
+        return response
+
+    def _finish_request(self, sender, response, **extra):
+        trace = _current_trace()
+        if trace is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        elapsed = time.perf_counter() - trace.started
+
+        self.request_duration.observe(elapsed, endpoint, request.method, str(response.status_code))
+        self.queries_per_request.observe(trace.queries, endpoint)
+        self.phase_duration.observe(trace.sql_seconds, endpoint, 'sql')
+        self.phase_duration.observe(trace.template_seconds, endpoint, 'template')
+        self.phase_duration.observe(trace.session_seconds, endpoint, 'session')
+
+        for sql, (count, seconds) in trace.statements.items():
+            if seconds / count > self.slow_query_seconds:
+                self.slow_queries.inc(endpoint, amount=count)
+                logger.warning('Slow SQL on %s: %.1f ms avg over %d run(s): %s',
+                               endpoint, seconds / count * 1000, count, sql[:200])
+            if count >= self.n_plus_one_threshold:
+                self.n_plus_one.inc(endpoint)
+                logger.warning('Possible N+1 on %s: statement ran %d times: %s', endpoint, count, sql[:200])
+
+        if trace.profiler is not None:
+            trace.profiler.disable()
+            if elapsed > self.profile_slow_seconds:
+                self._dump_profile(trace.profiler, endpoint, elapsed)
+            self._stop_profiler()
+
+    def _stop_profiler(self, exception=None):
+        """Release the sampling slot, even when the request failed"""
+        trace = _current_trace()
+        if trace is not None and trace.profiler is not None:
+            trace.profiler.disable()
+            trace.profiler = None
+            self._profile_lock.release()
+
+    def _dump_profile(self, profiler, endpoint, elapsed):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{endpoint}-{int(elapsed * 1000)}ms.prof'
+        path = os.path.join(self.profile_dir, name)
+        pstats.Stats(profiler).dump_stats(path)
+        self.profiles.inc(endpoint)
+        logger.info('Profiled slow request to %s (%.0f ms): %s', endpoint, elapsed * 1000, path)
+
+    def register(self, *metrics):
+        """Include other modules' Counters and Histograms in expose()"""
+        self._extra_metrics.extend(metrics)
+
+    def expose(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in (self.request_duration, self.phase_duration, self.query_duration,
+                       self.queries_per_request, self.template_duration,
+                       self.slow_queries, self.n_plus_one, self.profiles, *self._extra_metrics):
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,363 @@
+"""
+Nextwave Company Website - Live admin feed
+Pushes new contact messages, job applications and dashboard counter changes
+to open admin dashboards over Server-Sent Events.
+
+Triggers append every message and application that contact() and
+apply_job() submit to the admin_events table as the write-behind writer
+inserts it, whichever worker that is. One thread per process follows the
+table, checking PRAGMA data_version first so a quiet database costs no
+query, and hands each batch of events and any counter changes to every
+dashboard connected to that process. A connected dashboard costs a small
+buffer and a waiting response, never a query of its own. A trigger caps the
+table at MAX_EVENTS rows whether or not anyone is watching, and the
+follower also drops events older than LIVE_FEED_RETENTION seconds.
+
+A stream occupies its request's thread: under the ASGI entry point
+(asgi.py) that is a thread of its own per request, ended when the client
+disconnects. Sync gunicorn deployments should use cooperative workers,
+where each one is a greenlet rather than an OS thread:
+
+    gunicorn -k gevent --worker-connections 1000 app:app
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+import aio
+import db
+import dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.5   # seconds between checks for new events
+DEFAULT_HEARTBEAT = 15.0      # seconds of silence before a keep-alive comment
+DEFAULT_MAX_CLIENTS = 1000    # open streams per process
+DEFAULT_RETENTION = 3600      # seconds events are kept for reconnecting clients
+BUFFER_SIZE = 256             # undelivered events per client before it is dropped
+REPLAY_LIMIT = 500
+MAX_EVENTS = 10000            # newest events kept, however recent the rest
+PRUNE_INTERVAL = 300.0        # seconds between age prunes by the follower
+RETRY_MS = 3000               # EventSource reconnection delay
+KEEP_ALIVE = ': keep-alive\n\n'
+
+# Feed kind -> (table, query for the rows of a batch of ids)
+KINDS = {
+    'contact_message': ('contact_messages',
+                        'SELECT id, name, email, subject, status, created_at FROM contact_messages '
+                        'WHERE id IN ({ids})'),
+    'job_application': ('job_applications',
+                        'SELECT ja.id, ja.name, ja.email, ja.status, ja.created_at, j.title AS job_title '
+                        'FROM job_applications ja JOIN jobs j ON ja.job_id = j.id WHERE ja.id IN ({ids})'),
+}
+
+
+class Full(Exception):
+    """This process already streams to the maximum number of dashboards"""
+
+
+def create_feed(c):
+    """admin_events table and the triggers that fill it"""
+    c.execute('''CREATE TABLE IF NOT EXISTS admin_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+    for kind, (table, _) in KINDS.items():
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_feed_insert AFTER INSERT ON {table} BEGIN
+                        INSERT INTO admin_events (kind, row_id) VALUES ('{kind}', new.id);
+                    END''')
+
+
+def cap_events(c, keep=MAX_EVENTS):
+    """Trigger dropping all but the newest `keep` events on every insert"""
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS admin_events_cap AFTER INSERT ON admin_events BEGIN
+                    DELETE FROM admin_events WHERE id <= new.id - {int(keep)};
+                END''')
+
+
+def prune_events(conn, retention=DEFAULT_RETENTION):
+    """Drop events older than `retention` seconds"""
+    # Unindexed, but the cap trigger keeps this to at most MAX_EVENTS rows
+    conn.execute("DELETE FROM admin_events WHERE created_at < datetime('now', ?)", (f'-{int(retention)} seconds',))
+
+
+def read_events(conn, after_id, limit=REPLAY_LIMIT):
+    """Up to `limit` events logged after `after_id`, oldest first
+
+    Returns ([(event id, kind, row dict)], last id read). Rows deleted or
+    archived since they were logged are skipped.
+    """
+    logged = conn.execute('SELECT id, kind, row_id FROM admin_events WHERE id > ? ORDER BY id LIMIT ?',
+                          (after_id, limit)).fetchall()
+    rows = {}
+    for kind, (_, query) in KINDS.items():
+        ids = [row['row_id'] for row in logged if row['kind'] == kind]
+        if ids:
+            for row in conn.execute(query.format(ids=', '.join('?' * len(ids))), ids):
+                rows[kind, row['id']] = dict(row)
+    events = [(row['id'], row['kind'], rows[row['kind'], row['row_id']])
+              for row in logged if (row['kind'], row['row_id']) in rows]
+    return events, logged[-1]['id'] if logged else after_id
+
+
+def format_event(kind, data, event_id=None):
+    """One text/event-stream frame"""
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {kind}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscription:
+    """Events waiting for one connected dashboard
+
+    Given an event loop, the waiting side is a coroutine woken through
+    call_soon_threadsafe, since events are pushed from the follower thread.
+    """
+
+    def __init__(self, size=BUFFER_SIZE, loop=None):
+        self.size = size
+        self.dropped = False
+        self._events = deque()
+        self._loop = loop
+        self._ready = asyncio.Event() if loop is not None else threading.Event()
+
+    def push(self, events):
+        if len(self._events) + len(events) > self.size:
+            # Too far behind; the client reconnects and replays from its last id
+            self.dropped = True
+        else:
+            self._events.extend(events)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        else:
+            self._ready.set()
+
+    def wait(self, timeout):
+        """Pending events, [] after `timeout` seconds, None once dropped"""
+        self._ready.wait(timeout)
+        self._ready.clear()
+        return self._drain()
+
+    async def wait_async(self, timeout):
+        """wait() for subscriptions made with an event loop"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+        return self._drain()
+
+    def _drain(self):
+        if self.dropped:
+            return None
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+
+class LiveFeed:
+    """Per-process follower of admin_events fanning out to SSE streams"""
+
+    def __init__(self, app=None):
+        self._pid = None
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.last_id = 0
+        self.counters = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.database = app.config['DATABASE']
+        self.poll_interval = app.config.get('LIVE_FEED_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self.heartbeat = app.config.get('LIVE_FEED_HEARTBEAT', DEFAULT_HEARTBEAT)
+        self.max_clients = app.config.get('LIVE_FEED_MAX_CLIENTS', DEFAULT_MAX_CLIENTS)
+        self.retention = app.config.get('LIVE_FEED_RETENTION', DEFAULT_RETENTION)
+        app.extensions['live_feed'] = self
+
+    def start(self):
+        """Start this process's follower thread (cheap after the first call)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Subscribers and the position do not survive a fork
+            self._subscribers = set()
+            conn = db.connect(self.database)
+            try:
+                self.last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM admin_events').fetchone()[0]
+                self.counters = dashboard_stats.read_counters(conn)
+            finally:
+                conn.close()
+            self._pid = os.getpid()
+            threading.Thread(target=self._follow, name='live-feed', daemon=True).start()
+
+    def subscribe(self, loop=None):
+        """(subscription, id of the last event published before it)"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                raise Full()
+            subscription = Subscription(loop=loop)
+            self._subscribers.add(subscription)
+            return subscription, self.last_id
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _publish(self, events, last_id):
+        # Under the lock, so a new subscriber sees either the events or the new position
+        with self._lock:
+            self.last_id = last_id
+            if events:
+                for subscription in self._subscribers:
+                    subscription.push(events)
+
+    def _follow(self):
+        conn = db.connect(self.database)
+        data_version = None
+        last_prune = 0.0
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                if time.monotonic() - last_prune >= PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    self.prune(conn)
+                # Changes only when another connection has committed
+                version = conn.execute('PRAGMA data_version').fetchone()[0]
+                if version == data_version:
+                    continue
+                data_version = version
+                self.poll(conn)
+            except Exception:
+                logger.exception('Live feed poll failed')
+
+    def prune(self, conn):
+        try:
+            prune_events(conn, self.retention)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def poll(self, conn):
+        """Publish events logged since the last poll and changed counters"""
+        events = []
+        position = self.last_id
+        while True:
+            batch, last_id = read_events(conn, position)
+            if last_id == position:
+                break
+            events.extend(batch)
+            position = last_id
+        counters = dashboard_stats.read_counters(conn)
+        changed = {name: value for name, value in counters.items() if self.counters.get(name) != value}
+        self.counters = counters
+        if changed:
+            events.append((None, 'counters', changed))
+        self._publish(events, position)
+
+    def replay(self, last_event_id, sent_id):
+        """Frames for events after `last_event_id` and the current counters
+
+        Returns (frames, id of the last event sent).
+        """
+        conn = db.connect(self.database)
+        try:
+            replayed, _ = read_events(conn, last_event_id)
+            counters = dashboard_stats.read_counters(conn)
+        finally:
+            conn.close()
+        frames = [format_event(kind, row, event_id) for event_id, kind, row in replayed]
+        frames.append(format_event('counters', counters))
+        if replayed:
+            sent_id = max(sent_id, replayed[-1][0])
+        return frames, sent_id
+
+    def frames(self, events, sent_id):
+        """Frames for a published batch, skipping ids already sent"""
+        frames = []
+        for event_id, kind, data in events:
+            if event_id is not None:
+                if event_id <= sent_id:
+                    continue
+                sent_id = event_id
+            frames.append(format_event(kind, data, event_id))
+        return frames, sent_id
+
+    def stream(self, last_event_id=None):
+        """text/event-stream frames for one dashboard
+
+        Subscribes before anything is read so no event falls between the
+        replay and the live feed; ids already sent are skipped. Raises Full
+        when this process is at LIVE_FEED_MAX_CLIENTS.
+        """
+        self.start()
+        if len(self._subscribers) >= self.max_clients:
+            raise Full()
+
+        def generate():
+            # Subscribed on first iteration, so a response never sent leaks nothing
+            try:
+                subscription, sent_id = self.subscribe()
+            except Full:
+                return
+            try:
+                yield f'retry: {RETRY_MS}\n\n'
+                if last_event_id is not None:
+                    frames, sent_id = self.replay(last_event_id, sent_id)
+                    yield ''.join(frames)
+                while True:
+                    events = subscription.wait(self.heartbeat)
+                    if events is None:
+                        return
+                    frames, sent_id = self.frames(events, sent_id)
+                    yield ''.join(frames) or KEEP_ALIVE
+            finally:
+                self.unsubscribe(subscription)
+
+        return generate()
+
+    def astream(self, last_event_id=None):
+        """stream() as an async iterator, for views awaited on a shared event loop"""
+        self.start()
+        if len(self._subscribers) >= self.max_clients:
+            raise Full()
+
+        async def generate():
+            try:
+                subscription, sent_id = self.subscribe(asyncio.get_running_loop())
+            except Full:
+                return
+            try:
+                yield f'retry: {RETRY_MS}\n\n'
+                if last_event_id is not None:
+                    frames, sent_id = await aio.database.run(self.replay, last_event_id, sent_id)
+                    yield ''.join(frames)
+                while True:
+                    events = await subscription.wait_async(self.heartbeat)
+                    if events is None:
+                        return
+                    frames, sent_id = self.frames(events, sent_id)
+                    yield ''.join(frames) or KEEP_ALIVE
+            finally:
+                self.unsubscribe(subscription)
+
+        return generate()
+
+    def stats(self):
+        with self._lock:
+            clients = len(self._subscribers)
+        return {
+            'clients': clients,
+            'max_clients': self.max_clients,
+            'last_event_id': self.last_id,
+            'poll_interval': self.poll_interval,
+        }
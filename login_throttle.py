@@ -0,0 +1,171 @@
+"""
+Nextwave Company Website - Login throttling
+Token buckets keyed by client IP and by username, shared by every worker
+through a small SQLite file, are checked before any password hashing. The
+hashing itself is a concurrency cap, not an offload: it runs on the request
+thread, but at most LOGIN_HASH_WORKERS verifications per process hash at
+once and only LOGIN_HASH_QUEUE more may wait, so a credential-stuffing burst
+is refused with a 503 instead of spending every CPU and request thread on
+PBKDF2/scrypt work.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import logging
+from werkzeug.security import check_password_hash
+from instrumentation import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable through app.config (LOGIN_* keys)
+DEFAULT_DATABASE = 'login_limits.db'
+DEFAULT_IP_BURST = 10
+DEFAULT_IP_PER_MINUTE = 5
+DEFAULT_USER_BURST = 20
+DEFAULT_USER_PER_MINUTE = 10
+DEFAULT_HASH_WORKERS = 2      # concurrent hashes per process
+DEFAULT_HASH_QUEUE = 8        # verifications waiting for a slot before new ones are refused
+DEFAULT_HASH_TIMEOUT = 10.0   # seconds a verification may wait for a slot
+PRUNE_EVERY = 1000            # bucket updates between removals of idle buckets
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Busy(Exception):
+    """Every hashing slot and queue place is taken"""
+
+
+class TokenBucketLimiter:
+    """Token buckets in SQLite, so all workers on the host share them
+
+    Each check is one UPSERT that refills the bucket for the time elapsed
+    and takes a token if one is available, atomically across processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._updates = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')   # losing a bucket on power loss is harmless
+            conn.execute('''CREATE TABLE IF NOT EXISTS buckets (
+                                key TEXT PRIMARY KEY,
+                                tokens REAL NOT NULL,
+                                updated REAL NOT NULL,
+                                allowed INTEGER NOT NULL
+                            ) WITHOUT ROWID''')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, burst, per_minute):
+        """Take a token from `key`'s bucket
+
+        Returns (allowed, retry_after_seconds).
+        """
+        rate = per_minute / 60.0
+        now = time.time()
+        conn = self._conn()
+        level = 'MIN(:burst, tokens + (:now - updated) * :rate)'
+        row = conn.execute(f'''
+            INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = CASE WHEN {level} >= 1 THEN {level} - 1 ELSE {level} END,
+                allowed = {level} >= 1,
+                updated = :now
+            RETURNING tokens, allowed''', {'key': key, 'burst': burst, 'now': now, 'rate': rate}).fetchone()
+        conn.commit()
+
+        self._updates += 1
+        if self._updates % PRUNE_EVERY == 0:
+            self.prune(max(burst / rate, 3600))
+
+        tokens, allowed = row
+        if allowed:
+            return True, 0
+        return False, (1 - tokens) / rate
+
+    def prune(self, idle_seconds):
+        """Drop buckets idle long enough to have refilled completely"""
+        conn = self._conn()
+        conn.execute('DELETE FROM buckets WHERE updated < ?', (time.time() - idle_seconds,))
+        conn.commit()
+
+
+class LoginThrottle:
+    """Rate-limited, concurrency-capped password verification for admin_login()"""
+
+    def __init__(self, app=None):
+        self.decisions = Counter(
+            'nextwave_login_limiter_decisions_total', 'Login attempts allowed or rejected by the rate limiter',
+            ('scope', 'decision'))
+        self.hash_duration = Histogram(
+            'nextwave_password_hash_seconds', 'Time to verify a password hash',
+            ('result',), buckets=HASH_BUCKETS)
+        self.hash_wait = Histogram(
+            'nextwave_password_hash_wait_seconds', 'Time a login waited for a free hashing slot',
+            buckets=HASH_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.limiter = TokenBucketLimiter(app.config.get('LOGIN_LIMIT_DATABASE', DEFAULT_DATABASE))
+        self.ip_limit = (app.config.get('LOGIN_LIMIT_IP_BURST', DEFAULT_IP_BURST),
+                         app.config.get('LOGIN_LIMIT_IP_PER_MINUTE', DEFAULT_IP_PER_MINUTE))
+        self.user_limit = (app.config.get('LOGIN_LIMIT_USER_BURST', DEFAULT_USER_BURST),
+                           app.config.get('LOGIN_LIMIT_USER_PER_MINUTE', DEFAULT_USER_PER_MINUTE))
+        self.workers = app.config.get('LOGIN_HASH_WORKERS', DEFAULT_HASH_WORKERS)
+        self.queue = app.config.get('LOGIN_HASH_QUEUE', DEFAULT_HASH_QUEUE)
+        self.timeout = app.config.get('LOGIN_HASH_TIMEOUT', DEFAULT_HASH_TIMEOUT)
+        self._hashing = threading.BoundedSemaphore(self.workers)
+        self._admitted = threading.BoundedSemaphore(self.workers + self.queue)
+        app.extensions['login_throttle'] = self
+        instrumentation = app.extensions.get('instrumentation')
+        if instrumentation is not None:
+            instrumentation.register(self.decisions, self.hash_duration, self.hash_wait)
+
+    def check(self, ip, username):
+        """Take a token for the IP, then the username
+
+        Returns 0 when the attempt may proceed, otherwise the seconds until
+        it may be retried. The username bucket stops slow spraying of one
+        account from many addresses.
+        """
+        for scope, key, (burst, per_minute) in (('ip', f'ip:{ip}', self.ip_limit),
+                                                ('user', f'user:{username.lower()}', self.user_limit)):
+            allowed, retry_after = self.limiter.take(key, burst, per_minute)
+            self.decisions.inc(scope, 'allowed' if allowed else 'rejected')
+            if not allowed:
+                return retry_after
+        return 0
+
+    def verify(self, pwhash, password):
+        """check_password_hash on the calling thread, within the hashing cap
+
+        Raises Busy instead of queueing once every slot and queue place is
+        taken, and TimeoutError after waiting `timeout` seconds for a slot.
+        """
+        if not self._admitted.acquire(blocking=False):
+            self.decisions.inc('hash', 'rejected')
+            raise Busy()
+        try:
+            submitted = time.perf_counter()
+            if not self._hashing.acquire(timeout=self.timeout):
+                self.decisions.inc('hash', 'rejected')
+                raise TimeoutError('No password hashing slot became free')
+            started = time.perf_counter()
+            self.hash_wait.observe(started - submitted)
+            try:
+                ok = check_password_hash(pwhash, password)
+            finally:
+                self._hashing.release()
+        finally:
+            self._admitted.release()
+        self.hash_duration.observe(time.perf_counter() - started, 'match' if ok else 'mismatch')
+        return ok
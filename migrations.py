@@ -0,0 +1,305 @@
+"""
+Nextwave Company Website - Schema migrations
+Numbered, idempotent migrations tracked in PRAGMA user_version, plus a
+query-plan check that fails when a route query falls back to a full scan.
+"""
+
+import logging
+import dashboard_stats
+import live_feed
+import page_cache
+import prerender
+import related
+import search_index
+import uploads
+import write_behind
+
+logger = logging.getLogger(__name__)
+
+
+def _initial_schema(c):
+    """Core tables"""
+    # Users table for admin authentication
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    email TEXT,
+                    role TEXT DEFAULT 'admin',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+    
+    # Blog posts table
+    c.execute('''CREATE TABLE IF NOT EXISTS blog_posts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    author TEXT NOT NULL,
+                    category TEXT,
+                    featured_image TEXT,
+                    published BOOLEAN DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+    
+    # Keep updated_at current so it can serve as Last-Modified
+    c.execute('''CREATE TRIGGER IF NOT EXISTS blog_posts_touch_updated_at
+                    AFTER UPDATE ON blog_posts
+                    WHEN new.updated_at IS old.updated_at
+                    BEGIN
+                        UPDATE blog_posts SET updated_at = CURRENT_TIMESTAMP WHERE id = new.id;
+                    END''')
+    
+    # Services table
+    c.execute('''CREATE TABLE IF NOT EXISTS services (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    icon TEXT,
+                    featured BOOLEAN DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+    
+    # Job listings table
+    c.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    department TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    requirements TEXT,
+                    salary_range TEXT,
+                    active BOOLEAN DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+    
+    # Job applications table
+    c.execute('''CREATE TABLE IF NOT EXISTS job_applications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    phone TEXT,
+                    resume_path TEXT,
+                    cover_letter TEXT,
+                    status TEXT DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (job_id) REFERENCES jobs (id)
+                )''')
+    
+    # Contact messages table
+    c.execute('''CREATE TABLE IF NOT EXISTS contact_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    status TEXT DEFAULT 'unread',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+    
+    # Events table (optional feature)
+    c.execute('''CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    date_time TEXT NOT NULL,
+                    location TEXT,
+                    category TEXT,
+                    active BOOLEAN DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+
+
+def _search_index(c):
+    """FTS5 search tables and their sync triggers"""
+    search_index.create_search_index(c)
+
+
+def _table_versions(c):
+    """Version counters used to invalidate cached pages"""
+    page_cache.create_version_triggers(c)
+
+
+def _listing_indexes(c):
+    """Composite indexes for keyset pagination of the public listings"""
+    c.execute('CREATE INDEX IF NOT EXISTS idx_blog_posts_published_created ON blog_posts (published, created_at, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_blog_posts_published_category_created ON blog_posts (published, category, created_at, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_jobs_active_created ON jobs (active, created_at, id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_jobs_active_department_created ON jobs (active, department, created_at, id)')
+
+
+def _hot_query_indexes(c):
+    """Covering and partial indexes for the remaining route and dashboard queries"""
+    # Home page featured services and the services page ordering
+    c.execute('CREATE INDEX IF NOT EXISTS idx_services_featured_title ON services (featured DESC, title)')
+    # Careers location filter options
+    c.execute('CREATE INDEX IF NOT EXISTS idx_jobs_active_location ON jobs (active, location)')
+    # Dashboard recent activity and the applications -> jobs join
+    c.execute('CREATE INDEX IF NOT EXISTS idx_job_applications_created ON job_applications (created_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_job_applications_job ON job_applications (job_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_contact_messages_created ON contact_messages (created_at)')
+    # Dashboard pending/unread counts only ever look at the open rows
+    c.execute("CREATE INDEX IF NOT EXISTS idx_job_applications_pending ON job_applications (created_at) WHERE status = 'pending'")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contact_messages_unread ON contact_messages (created_at) WHERE status = 'unread'")
+
+
+def _dashboard_counters(c):
+    """Trigger-maintained admin dashboard counters"""
+    dashboard_stats.create_counters(c)
+
+
+def _applied_submissions(c):
+    """Idempotency table for write-behind journal replays"""
+    write_behind.create_applied_table(c)
+
+
+def _content_change_log(c):
+    """Row change log driving incremental pre-rendering"""
+    prerender.create_change_log(c)
+
+
+def _related_content(c):
+    """Precomputed related-posts and similar-jobs lists"""
+    related.create_related_tables(c)
+
+
+def _admin_event_feed(c):
+    """Feed of new submissions pushed to live admin dashboards"""
+    live_feed.create_feed(c)
+
+
+def _capped_change_log(c):
+    """Size cap on the content change log, enforced by a trigger"""
+    prerender.cap_change_log(c)
+
+
+def _capped_admin_events(c):
+    """Size cap on the admin event feed, enforced by a trigger"""
+    live_feed.cap_events(c)
+
+
+def _upload_metadata(c):
+    """Upload metadata, formerly JSON sidecars in the public upload folder"""
+    uploads.create_upload_table(c)
+
+
+# (version, description, function) -- append only, never renumber
+MIGRATIONS = [
+    (1, 'initial schema', _initial_schema),
+    (2, 'full-text search index', _search_index),
+    (3, 'table version counters', _table_versions),
+    (4, 'listing pagination indexes', _listing_indexes),
+    (5, 'hot query indexes', _hot_query_indexes),
+    (6, 'dashboard counters', _dashboard_counters),
+    (7, 'applied submissions', _applied_submissions),
+    (8, 'content change log', _content_change_log),
+    (9, 'related content', _related_content),
+    (10, 'admin event feed', _admin_event_feed),
+    (11, 'capped content change log', _capped_change_log),
+    (12, 'capped admin event feed', _capped_admin_events),
+    (13, 'upload metadata', _upload_metadata),
+]
+
+
+def schema_version(conn):
+    """Schema version recorded in the database file"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=None):
+    """Apply every pending migration, each in its own transaction
+
+    Migrations use IF NOT EXISTS throughout, so a database created before
+    versioning (user_version 0) is brought up to date without errors. Safe
+    to run from several processes at once: each step re-reads the version
+    under the write lock. Returns the list of applied versions.
+    """
+    current = schema_version(conn)
+    applied = []
+
+    for version, description, step in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute('BEGIN IMMEDIATE')
+        if schema_version(conn) >= version:
+            conn.rollback()  # another process applied it meanwhile
+            continue
+        try:
+            step(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception('Migration %d (%s) failed', version, description)
+            raise
+
+        logger.info('Applied migration %d: %s', version, description)
+        applied.append(version)
+
+    return applied
+
+
+# Representative query for every hot path in app.py, keyed by route
+ROUTE_QUERIES = {
+    'index: featured services': ('SELECT * FROM services WHERE featured = 1 LIMIT 4', ()),
+    'index: recent posts': ('SELECT * FROM blog_posts WHERE published = 1 ORDER BY created_at DESC LIMIT 3', ()),
+    'services': ('SELECT * FROM services ORDER BY featured DESC, title', ()),
+    'blog: page': (
+        'SELECT * FROM blog_posts c WHERE c.published = 1 AND (c.created_at, c.id) < (?, ?) '
+        'ORDER BY c.created_at DESC, c.id DESC LIMIT 13', ('9999-12-31', 0)),
+    'blog: category page': (
+        'SELECT * FROM blog_posts c WHERE c.published = 1 AND c.category = ? '
+        'ORDER BY c.created_at DESC, c.id DESC LIMIT 13', ('Technology',)),
+    'blog: categories': ('SELECT DISTINCT category FROM blog_posts WHERE published = 1', ()),
+    'blog_post': ('SELECT * FROM blog_posts WHERE id = ? AND published = 1', (1,)),
+    'blog_post: related': (
+        'SELECT p.* FROM related_posts r JOIN blog_posts p ON p.id = r.related_id '
+        'WHERE r.post_id = ? AND p.published = 1 ORDER BY r.rank LIMIT 3', (1,)),
+    'blog_post: same category': (
+        'SELECT * FROM blog_posts WHERE id != ? AND category = ? AND published = 1 '
+        'ORDER BY created_at DESC LIMIT 3', (1, 'Technology')),
+    'careers: page': (
+        'SELECT * FROM jobs c WHERE c.active = 1 ORDER BY c.created_at DESC, c.id DESC LIMIT 13', ()),
+    'careers: department page': (
+        'SELECT * FROM jobs c WHERE c.active = 1 AND c.department = ? '
+        'ORDER BY c.created_at DESC, c.id DESC LIMIT 13', ('Engineering',)),
+    'careers: count': ('SELECT COUNT(*) FROM jobs c WHERE c.active = 1', ()),
+    'careers: departments': ('SELECT DISTINCT department FROM jobs WHERE active = 1', ()),
+    'careers: locations': ('SELECT DISTINCT location FROM jobs WHERE active = 1', ()),
+    'job_detail': ('SELECT * FROM jobs WHERE id = ? AND active = 1', (1,)),
+    'job_detail: similar': (
+        'SELECT j.* FROM similar_jobs s JOIN jobs j ON j.id = s.related_id '
+        'WHERE s.job_id = ? AND j.active = 1 ORDER BY s.rank LIMIT 3', (1,)),
+    'admin_login': ('SELECT * FROM users WHERE username = ?', ('admin',)),
+    'admin_dashboard: counters': (dashboard_stats.READ_SQL, tuple(dashboard_stats.COUNTERS)),
+    'admin_dashboard: recent messages': ('SELECT * FROM contact_messages ORDER BY created_at DESC LIMIT 5', ()),
+    'admin_dashboard: recent applications': (
+        'SELECT ja.*, j.title as job_title FROM job_applications ja JOIN jobs j ON ja.job_id = j.id '
+        'ORDER BY ja.created_at DESC LIMIT 5', ()),
+    'api_search: blog posts': (
+        'SELECT c.* FROM blog_posts_fts JOIN blog_posts c ON c.id = blog_posts_fts.rowid '
+        'WHERE blog_posts_fts MATCH ? AND c.published = 1 ORDER BY bm25(blog_posts_fts) LIMIT 3', ('"cloud"*',)),
+}
+
+
+def check_query_plans(conn, queries=None):
+    """EXPLAIN QUERY PLAN every route query
+
+    Returns a list of (name, plan lines, full_scan) tuples. A full scan is a
+    plain `SCAN <table>` step: walking a whole index is allowed, since that
+    is how an unfiltered ORDER BY or COUNT(*) is expected to run.
+    """
+    results = []
+    for name, (sql, params) in (queries or ROUTE_QUERIES).items():
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+        full_scan = any(
+            detail.startswith('SCAN ') and ' USING ' not in detail and 'VIRTUAL TABLE' not in detail
+            for detail in plan
+        )
+        results.append((name, plan, full_scan))
+    return results
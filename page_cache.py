@@ -0,0 +1,342 @@
+"""
+Nextwave Company Website - Page and fragment cache
+Read-through caching for public pages, invalidated by per-table version
+counters that SQLite triggers bump on every content write.
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import inspect
+import tempfile
+import threading
+import functools
+import logging
+from collections import OrderedDict
+from flask import current_app, request, session, Response
+from db import get_db
+import aio
+
+logger = logging.getLogger(__name__)
+
+# Content tables whose writes invalidate cached pages
+VERSIONED_TABLES = ('blog_posts', 'services', 'jobs')
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = 300             # seconds
+DEFAULT_VERSION_INTERVAL = 1.0  # seconds between table version checks
+
+
+def create_version_triggers(cursor):
+    """Create the table_versions counters and the triggers that bump them"""
+    cursor.execute('''CREATE TABLE IF NOT EXISTS table_versions (
+                        name TEXT PRIMARY KEY,
+                        version INTEGER NOT NULL DEFAULT 0
+                    )''')
+    for table in VERSIONED_TABLES:
+        cursor.execute('INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                               AFTER {event} ON {table} BEGIN
+                                   UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                               END''')
+
+
+def read_versions(conn):
+    """Current version counter of every versioned table"""
+    rows = conn.execute('SELECT name, version FROM table_versions').fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+class MemoryCache:
+    """In-process LRU cache bounded by entry count and total bytes, with TTL"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes,
+                    'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+
+class DiskCache:
+    """File-per-entry cache shared by every worker on the host"""
+
+    PRUNE_EVERY = 256
+
+    def __init__(self, directory, ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, stored_key, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        if expires_at < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value):
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((time.time() + self.ttl, key, value), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            logger.warning('Could not write page cache entry to %s', self.directory)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete expired and superseded entries"""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class PageCache:
+    """Two-level page and fragment cache keyed on content table versions"""
+
+    def __init__(self, app=None):
+        self.memory = None
+        self.disk = None
+        self._versions = {}
+        self._versions_checked = float('-inf')
+        self._version_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self.version_reader = None   # connection factory overriding get_db(), e.g. a replica
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        ttl = app.config.get('PAGE_CACHE_TTL', DEFAULT_TTL)
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.version_interval = app.config.get('PAGE_CACHE_VERSION_INTERVAL', DEFAULT_VERSION_INTERVAL)
+        self.memory = MemoryCache(
+            max_entries=app.config.get('PAGE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            max_bytes=app.config.get('PAGE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+            ttl=ttl,
+        )
+        if app.config.get('PAGE_CACHE_DIR'):
+            self.disk = DiskCache(app.config['PAGE_CACHE_DIR'], ttl=ttl)
+        app.extensions['page_cache'] = self
+
+    def versions(self):
+        """Table versions, re-read from SQLite at most once per interval"""
+        now = time.monotonic()
+        if now - self._versions_checked >= self.version_interval:
+            with self._version_lock:
+                if now - self._versions_checked >= self.version_interval:
+                    conn = self.version_reader() if self.version_reader else None
+                    self._versions = read_versions(conn or get_db())
+                    self._versions_checked = now
+        return self._versions
+
+    def invalidate(self):
+        """Force the next lookup to re-read table versions"""
+        self._versions_checked = float('-inf')
+
+    def make_key(self, name, tables, vary=''):
+        versions = self.versions()
+        stamp = ','.join(f'{table}:{versions.get(table, 0)}' for table in tables)
+        return f'{name}|{vary}|{stamp}'
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value, _sizeof(value))
+        if value is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value, _sizeof(value))
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        total = self._hits + self._misses
+        stats = {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_ratio': self._hits / total if total else 0.0,
+            'memory': self.memory.stats(),
+            'versions': dict(self._versions),
+        }
+        if self.disk is not None:
+            stats['disk_dir'] = self.disk.directory
+        return stats
+
+
+def _sizeof(value):
+    if isinstance(value, tuple) and len(value) == 3 and isinstance(value[2], bytes):
+        return len(value[2])
+    return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _page_cache():
+    return current_app.extensions['page_cache']
+
+
+def cached_page(*tables):
+    """Cache a GET view's rendered response until one of `tables` changes
+
+    The key covers the endpoint, view arguments, query string and theme.
+    Requests carrying flashed messages are rendered live so the message is
+    neither lost nor cached.
+    """
+    def lookup(kwargs):
+        """(key, cached response or None), or None when the view should just run"""
+        cache = _page_cache()
+        if not cache.enabled or request.method != 'GET' or '_flashes' in session:
+            return None
+
+        vary = '&'.join([
+            ','.join(f'{k}={v}' for k, v in sorted(kwargs.items())),
+            ','.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True))),
+            f"theme={session.get('theme', 'light')}",
+        ])
+        key = cache.make_key(request.endpoint, tables, vary)
+
+        entry = cache.get(key)
+        if entry is None:
+            return key, None
+        status, mimetype, body = entry
+        response = Response(body, status=status, mimetype=mimetype)
+        response.headers['X-Cache'] = 'HIT'
+        return key, response
+
+    def store(key, rv):
+        response = current_app.make_response(rv)
+        if response.status_code == 200 and not response.direct_passthrough:
+            _page_cache().set(key, (response.status_code, response.mimetype, response.get_data()))
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                # Table versions may read SQLite and the disk backend reads files
+                found = await aio.call(lookup, kwargs)
+                if found is None:
+                    return await view(*args, **kwargs)
+                key, response = found
+                if response is not None:
+                    return response
+                rv = await view(*args, **kwargs)
+                return await aio.files.run(store, key, rv)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            found = lookup(kwargs)
+            if found is None:
+                return view(*args, **kwargs)
+            key, response = found
+            if response is not None:
+                return response
+            return store(key, view(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def cached_fragment(name, tables, builder):
+    """Return builder()'s result, cached until one of `tables` changes
+
+    Values must be picklable when a disk backend is configured, so callers
+    should convert sqlite3.Row results to dicts.
+    """
+    cache = _page_cache()
+    if not cache.enabled:
+        return builder()
+    key = cache.make_key(f'fragment:{name}', tables)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value)
+    return value
@@ -0,0 +1,79 @@
+"""
+Nextwave Company Website - Listing pagination
+Keyset (cursor) pagination on (created_at, id) for browse listings, and
+offset cursors for ranked search results.
+"""
+
+import base64
+from flask import current_app, request
+
+DEFAULT_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 50
+
+
+def page_size():
+    """Page size from ?per_page=, bounded by MAX_PAGE_SIZE"""
+    default = current_app.config.get('PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    try:
+        size = int(request.args.get('per_page', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, current_app.config.get('MAX_PAGE_SIZE', MAX_PAGE_SIZE)))
+
+
+def encode_cursor(*values):
+    """Opaque, URL-safe cursor for the given sort key values"""
+    raw = '\x1f'.join(str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Sort key values from a cursor, or None for a missing or invalid one"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('\x1f')
+    except (ValueError, UnicodeError):
+        return None
+
+
+def keyset_page(conn, table, where, params, cursor, size):
+    """One page of `table` (aliased `c`) newest first, after `cursor`
+
+    Seeks on (created_at, id) so every page costs the same regardless of how
+    deep it is; the matching composite index makes this an index range scan.
+    Returns (rows, next_cursor) where next_cursor is None on the last page.
+    """
+    query = f'SELECT * FROM {table} c WHERE {where}'
+    query_params = list(params)
+
+    key = decode_cursor(cursor)
+    if key and len(key) == 2 and key[1].isdigit():
+        query += ' AND (c.created_at, c.id) < (?, ?)'
+        query_params.extend([key[0], int(key[1])])
+
+    query += ' ORDER BY c.created_at DESC, c.id DESC LIMIT ?'
+    query_params.append(size + 1)
+
+    rows = conn.execute(query, query_params).fetchall()
+    if len(rows) > size:
+        rows = rows[:size]
+        return rows, encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    return rows, None
+
+
+def search_page(search, cursor, size):
+    """One page of ranked search results
+
+    `search(limit, offset)` runs the ranked query. bm25 order has no stable
+    seek key, so the cursor carries an offset; search result sets are small
+    compared with the full archive.
+    """
+    key = decode_cursor(cursor)
+    offset = int(key[1]) if key and len(key) == 2 and key[0] == 'offset' and key[1].isdigit() else 0
+
+    rows = search(size + 1, offset)
+    if len(rows) > size:
+        return rows[:size], encode_cursor('offset', offset + size)
+    return rows, None
@@ -0,0 +1,288 @@
+"""
+Nextwave Company Website - Static pre-rendering
+Renders every public page into a static HTML tree that nginx (or the app
+itself) serves without touching SQLite or Jinja. Triggers log changed
+blog_posts, services and jobs rows; regeneration maps those rows through a
+page dependency map and re-renders only the affected pages. A trigger caps
+the log at the newest CHANGE_LOG_ROWS changes whether or not anything
+regenerates; a snapshot that falls further behind than that is rebuilt in
+full.
+
+nginx can serve the snapshot ahead of the app for anonymous visitors:
+
+    location / {
+        if ($args != "") { proxy_pass http://app; }
+        if ($cookie_session != "") { proxy_pass http://app; }
+        try_files /prerendered$uri/index.html @app;
+    }
+"""
+
+import os
+import json
+import time
+import fcntl
+import tempfile
+import threading
+import logging
+from flask import request, session, send_file
+import db
+import http_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WATCH_INTERVAL = 10  # seconds between change checks in the app; 0 disables (and serving)
+MANIFEST = '.prerender.json'
+LOCK_FILE = '.prerender.lock'
+BYPASS_HEADER = 'X-Prerender'
+CHANGE_LOG_ROWS = 50000   # newest changes kept for regeneration
+
+# Tracked table -> column whose old and new values are logged with each change
+# (pages listing related rows depend on it, e.g. posts in the same category)
+TRACKED_TABLES = {
+    'blog_posts': 'category',
+    'services': None,
+    'jobs': None,
+}
+
+# Endpoints that may be answered from the snapshot
+ENDPOINTS = ('index', 'about', 'services', 'blog', 'blog_post', 'careers', 'job_detail')
+
+
+def create_change_log(c):
+    """content_changes table and the triggers that fill it"""
+    c.execute('''CREATE TABLE IF NOT EXISTS content_changes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_name TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    group_value TEXT
+                )''')
+    for table, column in TRACKED_TABLES.items():
+        new_group = f'new.{column}' if column else 'NULL'
+        old_group = f'old.{column}' if column else 'NULL'
+        log = "INSERT INTO content_changes (table_name, row_id, group_value) VALUES ('{t}', {r}.id, {g});"
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_changes_insert AFTER INSERT ON {table} BEGIN
+                        {log.format(t=table, r='new', g=new_group)}
+                    END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_changes_delete AFTER DELETE ON {table} BEGIN
+                        {log.format(t=table, r='old', g=old_group)}
+                    END''')
+        update = log.format(t=table, r='new', g=new_group)
+        if column:
+            # A row moving between groups changes pages of both
+            update += (f" INSERT INTO content_changes (table_name, row_id, group_value) "
+                       f"SELECT '{table}', old.id, {old_group} WHERE {old_group} IS NOT {new_group};")
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_changes_update AFTER UPDATE ON {table} BEGIN
+                        {update}
+                    END''')
+
+
+def cap_change_log(c, keep=CHANGE_LOG_ROWS):
+    """Trigger dropping all but the newest `keep` logged changes on every insert"""
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS content_changes_cap AFTER INSERT ON content_changes BEGIN
+                    DELETE FROM content_changes WHERE id <= new.id - {int(keep)};
+                END''')
+
+
+def change_keys(table, row_id, group_value):
+    """Dependency keys touched by one logged change"""
+    keys = {f'{table}:*', f'{table}:{row_id}'}
+    column = TRACKED_TABLES.get(table)
+    if column and group_value is not None:
+        keys.add(f'{table}:{column}={group_value}')
+    return keys
+
+
+def public_pages(conn):
+    """{path: dependency keys} for every page in the snapshot
+
+    A page depends on `table:*` when it lists rows of a table, `table:id`
+    when it shows one row, and `table:column=value` when it lists rows
+    sharing a value with it.
+    """
+    pages = {
+        '/': {'services:*', 'blog_posts:*'},
+        '/about': set(),
+        '/services': {'services:*'},
+        '/blog': {'blog_posts:*'},
+        '/careers': {'jobs:*'},
+    }
+    for row in conn.execute('SELECT id, category FROM blog_posts WHERE published = 1'):
+        pages[f'/blog/{row[0]}'] = {f'blog_posts:{row[0]}', f'blog_posts:category={row[1]}',
+                                    f'related_posts:{row[0]}'}
+    for row in conn.execute('SELECT id FROM jobs WHERE active = 1'):
+        pages[f'/job/{row[0]}'] = {f'jobs:{row[0]}', f'similar_jobs:{row[0]}'}
+    return pages
+
+
+def page_file(directory, path):
+    """Snapshot file for a URL path: /blog/3 -> <dir>/blog/3/index.html"""
+    return os.path.join(directory, path.strip('/'), 'index.html')
+
+
+class Prerenderer:
+    """Builds, incrementally refreshes and serves the static page snapshot"""
+
+    def __init__(self, app=None):
+        self._pid = None
+        self._lock = threading.Lock()
+        self.last_run = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config.get('PRERENDER_DIR')
+        self.watch_interval = app.config.get('PRERENDER_WATCH_INTERVAL', DEFAULT_WATCH_INTERVAL)
+        app.extensions['prerender'] = self
+        if not self.directory:
+            return
+
+        # Without a watcher nothing would refresh the snapshot, so the app
+        # renders live; nginx may still serve a snapshot rebuilt by `flask prerender`
+        if not self.watch_interval:
+            return
+
+        @app.before_request
+        def serve_prerendered():
+            self.start()
+            return self.serve()
+
+    def serve(self):
+        """Answer an anonymous, unfiltered GET from the snapshot if present"""
+        if (request.method not in ('GET', 'HEAD') or request.endpoint not in ENDPOINTS
+                or request.args or BYPASS_HEADER in request.headers):
+            return None
+        # Theme, login and flashed messages live in the session and change the page
+        if session.get('theme') or 'user_id' in session or '_flashes' in session:
+            return None
+        path = page_file(self.directory, request.path)
+        if not os.path.isfile(path):
+            return None
+        response = send_file(path, mimetype='text/html', conditional=True)
+        response.cache_control.no_cache = None
+        response.headers['X-Cache'] = 'STATIC'
+        return http_cache.cache_control_for(response)
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'last_change_id': 0, 'pages': {}}
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _remove(self, path):
+        try:
+            os.remove(page_file(self.directory, path))
+        except FileNotFoundError:
+            pass
+
+    def regenerate(self, full=False):
+        """Re-render pages affected by logged changes (every page if `full`)
+
+        Only one process regenerates at a time; others return None. Returns
+        {'rendered': n, 'removed': n, 'changes': n, 'seconds': s}.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+            return self._regenerate(full)
+
+    def _regenerate(self, full):
+        started = time.perf_counter()
+        manifest = self._read_manifest()
+        previous = {path: set(deps) for path, deps in manifest['pages'].items()}
+
+        conn = db.connect(self.app.config['DATABASE'])
+        try:
+            changes = conn.execute(
+                'SELECT id, table_name, row_id, group_value FROM content_changes WHERE id > ? ORDER BY id',
+                (manifest['last_change_id'],)
+            ).fetchall()
+            last_change_id = changes[-1]['id'] if changes else manifest['last_change_id']
+            # Changes pruned before this snapshot saw them: every page may be stale
+            pruned = conn.execute('SELECT MIN(id) > ? FROM content_changes',
+                                  (manifest['last_change_id'] + 1,)).fetchone()[0]
+            current = public_pages(conn)
+        finally:
+            conn.close()
+
+        if full or not previous or pruned:
+            stale = set(current)
+        else:
+            keys = set()
+            for change in changes:
+                keys |= change_keys(change['table_name'], change['row_id'], change['group_value'])
+            stale = {path for path, deps in current.items() if deps & keys or path not in previous}
+        removed = set(previous) - set(current)
+
+        # Render from current data, not page cache entries up to a second old
+        self.app.extensions['page_cache'].invalidate()
+        client = self.app.test_client()
+        rendered = 0
+        for path in sorted(stale):
+            try:
+                response = client.get(path, headers={BYPASS_HEADER: '1'})
+                status = response.status_code
+            except Exception:
+                logger.exception('Rendering %s failed', path)
+                status = 500
+            if status == 200:
+                self._write(page_file(self.directory, path), response.get_data())
+                rendered += 1
+            else:
+                # Kept in the map so it is retried only when its rows change
+                logger.warning('Not pre-rendering %s: status %d', path, status)
+                self._remove(path)
+        for path in removed:
+            self._remove(path)
+
+        self._write(os.path.join(self.directory, MANIFEST), json.dumps({
+            'last_change_id': last_change_id,
+            'pages': {path: sorted(deps) for path, deps in current.items()},
+        }).encode('utf-8'))
+
+        # Changes at or before last_change_id are reflected in the snapshot
+        conn = db.connect(self.app.config['DATABASE'])
+        try:
+            conn.execute('DELETE FROM content_changes WHERE id <= ?', (last_change_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.last_run = {
+            'rendered': rendered,
+            'removed': len(removed),
+            'changes': len(changes),
+            'seconds': time.perf_counter() - started,
+        }
+        if rendered or removed:
+            logger.info('Pre-rendered %(rendered)d pages, removed %(removed)d (%(changes)d changes)', self.last_run)
+        return self.last_run
+
+    def start(self):
+        """Start this process's change watcher (cheap after the first call)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._watch, name='prerender', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                self.regenerate()
+            except Exception:
+                logger.exception('Incremental pre-render failed')
@@ -0,0 +1,289 @@
+"""
+Nextwave Company Website - Related content index
+TF-IDF vectors over blog post and job text with top-k cosine neighbours,
+stored in related_posts and similar_jobs so a detail page reads its list
+with one indexed lookup. Vectors are kept as sparse CSR rows (a document
+uses a few dozen of the vocabulary's terms); similarity is computed one
+fixed-size batch x block tile at a time with NumPy, keeping only each
+row's running top k, so memory stays flat however many rows there are.
+
+Runs are incremental: a fingerprint per row finds what changed, and only
+those rows, rows that listed them, and rows they now outrank get new lists.
+IDF weights drift a little between full rebuilds (`flask build-related
+--full`). NumPy is optional: until lists are built, blog posts show
+same-category posts and jobs show no similar openings.
+"""
+
+import re
+import math
+import time
+import array
+import hashlib
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_K = 6
+DEFAULT_MAX_FEATURES = 2048
+DEFAULT_BATCH_SIZE = 256      # rows whose neighbours are found together
+DEFAULT_BLOCK_SIZE = 4096     # rows compared against at a time: 4096 x features float32 = 32 MB
+MIN_SCORE = 0.05
+TITLE_WEIGHT = 2              # title tokens count this many times
+
+# Source -> (neighbour table, item column, query returning id, title, body)
+SOURCES = {
+    'blog_posts': ('related_posts', 'post_id',
+                   'SELECT id, title, content AS body FROM blog_posts WHERE published = 1'),
+    'jobs': ('similar_jobs', 'job_id',
+             "SELECT id, title, department || ' ' || description || ' ' || COALESCE(requirements, '') AS body "
+             'FROM jobs WHERE active = 1'),
+}
+
+_TOKEN_RE = re.compile(r'[a-z][a-z0-9+#]{1,}')
+STOP_WORDS = frozenset('''
+    a about above after again all also am an and any are as at be because been before being below
+    between both but by can could did do does doing down during each few for from further had has
+    have having he her here hers him his how i if in into is it its itself just more most my no nor
+    not now of off on once only or other our ours out over own same she should so some such than
+    that the their theirs them then there these they this those through to too under until up very
+    was we were what when where which while who whom why will with would you your yours
+'''.split())
+
+
+def create_related_tables(c):
+    """Neighbour tables and the fingerprints that make runs incremental"""
+    for table, column, _ in SOURCES.values():
+        c.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                        {column} INTEGER NOT NULL,
+                        rank INTEGER NOT NULL,
+                        related_id INTEGER NOT NULL,
+                        score REAL NOT NULL,
+                        PRIMARY KEY ({column}, rank)
+                    ) WITHOUT ROWID''')
+        c.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_related ON {table} (related_id)')
+        c.execute('INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)', (table,))
+    c.execute('''CREATE TABLE IF NOT EXISTS related_fingerprints (
+                    source TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    PRIMARY KEY (source, item_id)
+                ) WITHOUT ROWID''')
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or '').lower()) if t not in STOP_WORDS]
+
+
+def fingerprint(row):
+    return hashlib.sha1(f"{row['title']}\0{row['body']}".encode('utf-8')).hexdigest()
+
+
+class SparseRows:
+    """Rows of a float32 matrix in compressed sparse row form"""
+
+    def __init__(self, indptr, indices, data, columns):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def dense(self, rows):
+        """The given rows as a dense len(rows) x columns array"""
+        import numpy as np
+
+        rows = np.asarray(rows)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        out = np.zeros((len(rows), self.columns), dtype=np.float32)
+        if lengths.sum():
+            # Position of every stored value of every requested row
+            offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+            positions = offsets + np.arange(lengths.sum())
+            out[np.repeat(np.arange(len(rows)), lengths), self.indices[positions]] = self.data[positions]
+        return out
+
+
+def tfidf_matrix(documents, max_features=DEFAULT_MAX_FEATURES):
+    """L2-normalised TF-IDF rows (SparseRows) for token-count documents
+
+    Keeps the `max_features` terms with the highest document frequency,
+    skipping terms in a single document or in more than half of them.
+    """
+    import numpy as np
+
+    n = len(documents)
+    df = Counter()
+    for counts in documents:
+        df.update(counts.keys())
+    ceiling = max(1, n // 2)
+    candidates = [term for term, count in df.items() if 2 <= count <= ceiling] or list(df)
+    candidates.sort(key=lambda term: (-df[term], term))
+    vocabulary = {term: i for i, term in enumerate(candidates[:max_features])}
+    idf = np.array([math.log((1 + n) / (1 + df[term])) + 1 for term in vocabulary], dtype=np.float32)
+
+    # Typed arrays: a Python list costs ~30 bytes per stored value
+    indptr = array.array('q', [0])
+    indices = array.array('i')
+    data = array.array('f')
+    for counts in documents:
+        for term, count in counts.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                indices.append(column)
+                data.append(1 + math.log(count))
+        indptr.append(len(indices))
+    indptr = np.frombuffer(indptr, dtype=np.int64)
+    indices = np.frombuffer(indices, dtype=np.int32)
+    data = np.frombuffer(data, dtype=np.float32) * idf[indices]
+
+    owner = np.repeat(np.arange(n), np.diff(indptr))
+    norms = np.zeros(n, dtype=np.float32)
+    np.add.at(norms, owner, data * data)
+    norms = np.sqrt(norms)
+    norms[norms == 0] = 1
+    data /= norms[owner]
+    return SparseRows(indptr, indices, data, len(vocabulary))
+
+
+def similarity_blocks(matrix, batch, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield (first row, scores) tiles of cosine similarity for `batch`
+
+    scores[i, j] compares batch[i] with row first + j. Unit vectors, so it
+    is a dot product of the batch against one densified block at a time.
+    """
+    import numpy as np
+
+    query = matrix.dense(batch)
+    for start in range(0, len(matrix), block_size):
+        block = matrix.dense(np.arange(start, min(start + block_size, len(matrix))))
+        yield start, query @ block.T
+
+
+def top_neighbours(matrix, rows, k, batch_size=DEFAULT_BATCH_SIZE, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield (row, [(neighbour row, score)]) for each of `rows`
+
+    Each batch keeps a batch x k running best list, merged with every
+    block's scores by an argpartition.
+    """
+    import numpy as np
+
+    n = len(matrix)
+    k = min(k, n - 1)
+    if k <= 0:
+        for row in rows:
+            yield row, []
+        return
+    for start in range(0, len(rows), batch_size):
+        batch = np.asarray(rows[start:start + batch_size])
+        best_scores = np.full((len(batch), k), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(batch), k), dtype=np.int64)
+        for first, scores in similarity_blocks(matrix, batch, block_size):
+            own = (batch >= first) & (batch < first + scores.shape[1])
+            scores[own, batch[own] - first] = -1.0   # never your own neighbour
+            merged_scores = np.hstack([best_scores, scores])
+            merged_rows = np.hstack([best_rows, np.broadcast_to(
+                np.arange(first, first + scores.shape[1]), scores.shape)])
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+            best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        for i, row in enumerate(batch):
+            yield int(row), [(int(j), float(score)) for j, score in zip(best_rows[i], best_scores[i])
+                             if score >= MIN_SCORE]
+
+
+def build(conn, source, full=False, top_k=DEFAULT_TOP_K, max_features=DEFAULT_MAX_FEATURES):
+    """Refresh the neighbour lists of `source` that may have changed
+
+    Returns {'items': n, 'changed': n, 'updated': n, 'seconds': s}.
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    table, column, query = SOURCES[source]
+    rows = conn.execute(query).fetchall()
+    ids = [row['id'] for row in rows]
+    position = {item_id: i for i, item_id in enumerate(ids)}
+    digests = {row['id']: fingerprint(row) for row in rows}
+    stored = dict(conn.execute('SELECT item_id, digest FROM related_fingerprints WHERE source = ?',
+                               (source,)).fetchall())
+    changed = [item_id for item_id in ids if stored.get(item_id) != digests[item_id]]
+    removed = [item_id for item_id in stored if item_id not in position]
+    summary = {'items': len(ids), 'changed': len(changed), 'updated': 0}
+    if not (full or changed or removed):
+        summary['seconds'] = time.perf_counter() - started
+        return summary
+
+    documents = [Counter(tokenize(row['title']) * TITLE_WEIGHT + tokenize(row['body'])) for row in rows]
+    matrix = tfidf_matrix(documents, max_features)
+
+    if full:
+        targets = set(ids)
+    else:
+        targets = set(changed)
+        # Lists that include a changed or removed row have stale scores
+        touched = changed + removed
+        for start in range(0, len(touched), 500):
+            chunk = touched[start:start + 500]
+            targets.update(row[0] for row in conn.execute(
+                f"SELECT DISTINCT {column} FROM {table} WHERE related_id IN ({', '.join('?' * len(chunk))})", chunk))
+        # Lists a changed row now belongs in: it beats their weakest entry
+        if changed and len(ids) > 1:
+            weakest = {row[0]: (row[1], row[2]) for row in conn.execute(
+                f'SELECT {column}, COUNT(*), MIN(score) FROM {table} GROUP BY {column}')}
+            floor = np.full(len(ids), MIN_SCORE, dtype=np.float32)
+            for item_id, (count, lowest) in weakest.items():
+                if item_id in position and count >= min(top_k, len(ids) - 1):
+                    floor[position[item_id]] = lowest
+            changed_rows = np.array([position[i] for i in changed])
+            beaten = np.zeros(len(ids), dtype=bool)
+            for start in range(0, len(changed_rows), DEFAULT_BATCH_SIZE):
+                batch = changed_rows[start:start + DEFAULT_BATCH_SIZE]
+                for first, scores in similarity_blocks(matrix, batch):
+                    own = (batch >= first) & (batch < first + scores.shape[1])
+                    scores[own, batch[own] - first] = -1.0
+                    beaten[first:first + scores.shape[1]] |= (scores > floor[first:first + scores.shape[1]]).any(axis=0)
+            targets.update(ids[j] for j in np.nonzero(beaten)[0])
+        targets &= set(position)
+
+    target_rows = sorted(position[item_id] for item_id in targets)
+    neighbours = {ids[row]: [(ids[j], score) for j, score in pairs]
+                  for row, pairs in top_neighbours(matrix, target_rows, top_k)}
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        stale = list(neighbours) + removed
+        for start in range(0, len(stale), 500):
+            chunk = stale[start:start + 500]
+            conn.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join('?' * len(chunk))})", chunk)
+        conn.executemany(f'INSERT INTO {table} ({column}, rank, related_id, score) VALUES (?, ?, ?, ?)',
+                         [(item_id, rank, related_id, round(score, 6))
+                          for item_id, pairs in neighbours.items()
+                          for rank, (related_id, score) in enumerate(pairs)])
+        conn.executemany('DELETE FROM related_fingerprints WHERE source = ? AND item_id = ?',
+                         [(source, item_id) for item_id in removed])
+        conn.executemany('INSERT OR REPLACE INTO related_fingerprints (source, item_id, digest) VALUES (?, ?, ?)',
+                         [(source, item_id, digests[item_id]) for item_id in (ids if full else changed)])
+        # Cached pages and ETags key on table_versions; pre-rendered pages on content_changes
+        conn.execute('UPDATE table_versions SET version = version + 1 WHERE name = ?', (table,))
+        conn.executemany('INSERT INTO content_changes (table_name, row_id) VALUES (?, ?)',
+                         [(table, item_id) for item_id in neighbours])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    summary['updated'] = len(neighbours)
+    summary['seconds'] = time.perf_counter() - started
+    logger.info('Related %s: %d changed, %d lists updated in %.2fs',
+                source, summary['changed'], summary['updated'], summary['seconds'])
+    return summary
+
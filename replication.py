@@ -0,0 +1,500 @@
+"""
+Nextwave Company Website - Snapshot and page-delta replication
+One writer node publishes the database; reader nodes keep a local read-only
+replica that anonymous GET requests read from, while form submissions and
+admin requests keep using the primary DATABASE.
+
+The publisher copies the live database with the sqlite3 online backup API
+(a consistent image taken in one read transaction, without blocking
+writers) and ships the pages that changed since the previous copy as a
+segment, much like the page frames of a WAL. Every so often it starts a new
+generation from a full snapshot. Published files are plain files: share the
+directory, serve it with nginx, or let the primary serve it to bearer-token
+holders at /replication/<file>.
+
+A publish that finds a change costs a full backup and a page-by-page diff
+of the copy against the previous one: O(database size), however small the
+change. It is skipped when the database and its WAL are unchanged since
+the last publish (a stat stamp kept in the manifest, so every worker and
+the CLI agree), which makes an idle check cost two stat() calls. On a large,
+busy database, raise REPLICATION_PUBLISH_INTERVAL to bound the cost.
+
+Readers rebuild the replica beside the old one and os.replace() it, so open
+connections keep reading a consistent file and new ones see the update.
+Replica lag is the age of the data: the manifest's `current_at` is the last
+time the primary was seen to match the published state, refreshed by every
+publish check, so the lag grows when the publisher stops as well as when
+syncs fail.
+"""
+
+import os
+import json
+import gzip
+import zlib
+import time
+import fcntl
+import hmac
+import shutil
+import struct
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import logging
+import urllib.request
+from urllib.parse import quote
+from flask import request, session, send_from_directory, abort
+import db
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+BASE_FILE = '.base.db'            # publisher's copy of the last published state
+LOCK_FILE = '.publish.lock'
+DEFAULT_PUBLISH_INTERVAL = 0      # seconds between publishes in the app; 0 disables
+DEFAULT_SYNC_INTERVAL = 0         # seconds between replica syncs in the app; 0 disables
+DEFAULT_SNAPSHOT_EVERY = 100      # segments per generation before a fresh snapshot
+FETCH_TIMEOUT = 30
+_FRAME = struct.Struct('>I')      # page number preceding each page image
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def backup(database, target):
+    """Consistent copy of `database` at `target` via the online backup API
+
+    The copy is switched out of WAL mode so it is a single self-contained
+    file that can be opened immutable.
+    """
+    source = sqlite3.connect(database)
+    copy = sqlite3.connect(target)
+    try:
+        source.backup(copy)
+        copy.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        copy.close()
+        source.close()
+
+
+def source_stamp(database):
+    """Sizes and mtimes of the database and its WAL, which move on every commit"""
+    stamp = []
+    for path in (database, database + '-wal'):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append([st.st_size, st.st_mtime_ns])
+    return stamp
+
+
+def page_size(path):
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    size = struct.unpack('>H', header[16:18])[0]
+    return 65536 if size == 1 else size
+
+
+def diff_pages(old_path, new_path, size):
+    """Yield (page number, bytes) for every page of `new_path` that differs"""
+    with open(old_path, 'rb') as old, open(new_path, 'rb') as new:
+        number = 1
+        while True:
+            page = new.read(size)
+            if not page:
+                return
+            if old.read(size) != page:
+                yield number, page
+            number += 1
+
+
+def write_segment(path, frames):
+    """Write zlib-compressed frames; returns how many were written"""
+    compressor = zlib.compressobj(6)
+    count = 0
+    with open(path, 'wb') as f:
+        for number, page in frames:
+            f.write(compressor.compress(_FRAME.pack(number) + page))
+            count += 1
+        f.write(compressor.flush())
+    return count
+
+
+def apply_segment(segment, target, size, page_count):
+    """Patch the pages of a segment into the database file `target`"""
+    data = zlib.decompress(segment)
+    frame = _FRAME.size + size
+    with open(target, 'r+b') as f:
+        for offset in range(0, len(data), frame):
+            number = _FRAME.unpack_from(data, offset)[0]
+            f.seek((number - 1) * size)
+            f.write(data[offset + _FRAME.size:offset + frame])
+        f.truncate(page_count * size)
+
+
+class Publisher:
+    """Publishes snapshots and page-delta segments of the primary database"""
+
+    def __init__(self, database, directory, snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+        self.database = database
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+
+    def manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        self._install(tmp, MANIFEST)
+
+    def _install(self, tmp, name):
+        """Move a finished temp file into place, readable by a web server"""
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, os.path.join(self.directory, name))
+
+    def publish(self, force=False):
+        """Publish the current state; returns a summary or None if unchanged
+
+        Only one process publishes at a time (others also return None).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+            manifest = self.manifest()
+            base = os.path.join(self.directory, BASE_FILE)
+            # Taken before the backup: a commit during it shows up next time
+            checked_at = time.time()
+            stamp = source_stamp(self.database)
+            if (not force and manifest and os.path.exists(base)
+                    and manifest.get('source_stamp') == stamp):
+                self._confirm(manifest, stamp, checked_at)
+                return None
+            return self._publish(manifest, base, stamp, checked_at)
+
+    def _confirm(self, manifest, stamp, checked_at):
+        """Record that the published state still matches the primary"""
+        manifest.update(source_stamp=stamp, current_at=checked_at)
+        self._write_manifest(manifest)
+
+    def _publish(self, manifest, base, stamp, checked_at):
+        started = time.perf_counter()
+        staging = os.path.join(self.directory, '.staging.db')
+        backup(self.database, staging)
+        size = page_size(staging)
+        page_count = os.path.getsize(staging) // size
+        digest = file_sha256(staging)
+
+        if manifest and manifest['sha256'] == digest and os.path.exists(base):
+            # Commits that left the content unchanged, or a checkpoint
+            os.remove(staging)
+            self._confirm(manifest, stamp, checked_at)
+            return None
+
+        if (manifest is None or not os.path.exists(base) or manifest['page_size'] != size
+                or len(manifest['segments']) >= self.snapshot_every):
+            result = self._snapshot(staging, size, page_count, digest, stamp, checked_at)
+        else:
+            result = self._segment(manifest, base, staging, size, page_count, digest, stamp, checked_at)
+        os.replace(staging, base)
+        self._prune()
+        result['seconds'] = time.perf_counter() - started
+        logger.info('Published %(kind)s %(file)s (%(pages)d pages) in %(seconds).2fs', result)
+        return result
+
+    def _snapshot(self, staging, size, page_count, digest, stamp, checked_at):
+        generation = f'{int(time.time() * 1000):x}'
+        name = f'snapshot-{generation}.db.gz'
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with open(staging, 'rb') as src, os.fdopen(fd, 'wb') as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        self._install(tmp, name)
+        self._write_manifest({
+            'generation': generation,
+            'page_size': size,
+            'snapshot': {'file': name, 'sha256': digest, 'page_count': page_count},
+            'segments': [],
+            'sequence': 0,
+            'sha256': digest,
+            'published_at': time.time(),
+            'current_at': checked_at,
+            'source_stamp': stamp,
+        })
+        return {'kind': 'snapshot', 'file': name, 'pages': page_count}
+
+    def _segment(self, manifest, base, staging, size, page_count, digest, stamp, checked_at):
+        sequence = manifest['sequence'] + 1
+        name = f"segment-{manifest['generation']}-{sequence:08d}.bin"
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        pages = write_segment(tmp, diff_pages(base, staging, size))
+        self._install(tmp, name)
+        manifest['segments'].append({
+            'sequence': sequence,
+            'file': name,
+            'page_count': page_count,
+            'sha256': digest,
+            'published_at': time.time(),
+        })
+        manifest.update(sequence=sequence, sha256=digest, published_at=time.time(),
+                        current_at=checked_at, source_stamp=stamp)
+        self._write_manifest(manifest)
+        return {'kind': 'segment', 'file': name, 'pages': pages}
+
+    def _prune(self):
+        """Drop files of generations before the previous one
+
+        The previous generation stays so a reader mid-download can finish.
+        """
+        generations = sorted({name.split('-')[1].split('.')[0] for name in os.listdir(self.directory)
+                              if name.startswith(('snapshot-', 'segment-'))})
+        for old in generations[:-2]:
+            for name in os.listdir(self.directory):
+                if name.startswith((f'snapshot-{old}.', f'segment-{old}-')):
+                    os.remove(os.path.join(self.directory, name))
+
+
+class Replica:
+    """Local read-only replica kept current from a publisher's files"""
+
+    def __init__(self, app=None):
+        self._local = threading.local()
+        self._pid = None
+        self._lock = threading.Lock()
+        self.app = None
+        self.path = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.path = app.config.get('REPLICATION_REPLICA')
+        self.source = app.config.get('REPLICATION_SOURCE')
+        self.token = app.config.get('REPLICATION_TOKEN')
+        self.sync_interval = app.config.get('REPLICATION_SYNC_INTERVAL', DEFAULT_SYNC_INTERVAL)
+        self.publish_dir = app.config.get('REPLICATION_PUBLISH_DIR')
+        self.publish_interval = app.config.get('REPLICATION_PUBLISH_INTERVAL', DEFAULT_PUBLISH_INTERVAL)
+        self.publisher = None
+        if self.publish_dir:
+            self.publisher = Publisher(app.config['DATABASE'], self.publish_dir,
+                                       app.config.get('REPLICATION_SNAPSHOT_EVERY', DEFAULT_SNAPSHOT_EVERY))
+            if self.token:
+                app.add_url_rule('/replication/<path:name>', 'replication_file', self.serve_file)
+        app.extensions['replica'] = self
+        if self.path and 'page_cache' in app.extensions:
+            # Cache keys must come from the data pages are rendered from
+            app.extensions['page_cache'].version_reader = self.connection
+
+        if (self.path and self.source and self.sync_interval) or (self.publisher and self.publish_interval):
+            @app.before_request
+            def start_replication():
+                self.start()
+
+    # Reading
+
+    def reader(self):
+        """Replica connection for this request, or None to use the primary
+
+        Only anonymous GET/HEAD requests read the replica; form posts and
+        logged-in admins keep reading their own writes from the primary.
+        """
+        if not self.path or request.method not in ('GET', 'HEAD') or 'user_id' in session:
+            return None
+        return self.connection()
+
+    def connection(self):
+        """This thread's connection to the current replica file, or None"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except (OSError, TypeError):
+            return None
+        cached = getattr(self._local, 'conn', None)
+        if cached is not None and cached[0] == inode:
+            return cached[1]
+        if cached is not None:
+            cached[1].close()
+        # The file is only ever replaced, never modified in place
+        conn = sqlite3.connect(f'file:{quote(os.path.abspath(self.path))}?mode=ro&immutable=1',
+                               uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {int(self.app.config.get('DB_MMAP_SIZE', db.DEFAULT_MMAP_SIZE))}")
+        conn.execute(f"PRAGMA cache_size = {int(self.app.config.get('DB_CACHE_SIZE', db.DEFAULT_CACHE_SIZE))}")
+        self._local.conn = (inode, conn)
+        return conn
+
+    # Syncing
+
+    def _fetch(self, name):
+        if self.source.startswith(('http://', 'https://')):
+            req = urllib.request.Request(f"{self.source.rstrip('/')}/{quote(name)}")
+            if self.token:
+                req.add_header('Authorization', f'Bearer {self.token}')
+            with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as response:
+                return response.read()
+        with open(os.path.join(self.source, name), 'rb') as f:
+            return f.read()
+
+    def state(self):
+        try:
+            with open(self.path + '.json', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def sync(self):
+        """Bring the replica up to the published state
+
+        Returns {'applied': n segments, 'snapshot': bool} or None when
+        another process is syncing.
+        """
+        with open(self.path + '.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+            manifest = json.loads(self._fetch(MANIFEST))
+            state = self.state()
+            result = {'applied': 0, 'snapshot': False}
+            if (state is None or state['generation'] != manifest['generation']
+                    or not os.path.exists(self.path)):
+                self._restore_snapshot(manifest)
+                state = self.state()
+                result['snapshot'] = True
+
+            pending = [s for s in manifest['segments'] if s['sequence'] > state['sequence']]
+            if pending:
+                self._apply(manifest, pending)
+                result['applied'] = len(pending)
+            self._write_state(manifest['generation'], manifest['sequence'],
+                              manifest['published_at'], manifest['sequence'],
+                              manifest.get('current_at', manifest['published_at']))
+            return result
+
+    def _restore_snapshot(self, manifest):
+        snapshot = manifest['snapshot']
+        data = gzip.decompress(self._fetch(snapshot['file']))
+        tmp = self._stage()
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        self._commit(tmp, snapshot['sha256'])
+        self._write_state(manifest['generation'], 0, None, manifest['sequence'])
+
+    def _apply(self, manifest, segments):
+        tmp = self._stage()
+        shutil.copyfile(self.path, tmp)
+        for segment in segments:
+            apply_segment(self._fetch(segment['file']), tmp, manifest['page_size'], segment['page_count'])
+        self._commit(tmp, segments[-1]['sha256'])
+
+    def _stage(self):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        os.close(fd)
+        return tmp
+
+    def _commit(self, tmp, digest):
+        if file_sha256(tmp) != digest:
+            os.remove(tmp)
+            # A fresh snapshot is fetched on the next sync
+            self._write_state(None, 0, None, None)
+            raise ValueError('Replica checksum mismatch; resyncing from the snapshot')
+        os.replace(tmp, self.path)
+
+    def _write_state(self, generation, sequence, published_at, published_sequence, current_at=None):
+        state = {
+            'generation': generation,
+            'sequence': sequence,
+            'published_at': published_at,
+            'published_sequence': published_sequence,
+            'current_at': current_at,
+            'synced_at': time.time(),
+        }
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path + '.json')
+
+    def lag(self):
+        """Seconds since the primary last held the data the replica serves
+
+        None when there is no replica yet. While publishing and syncing
+        work it stays under the publish interval plus the sync interval;
+        it grows when either stops, even if syncs keep succeeding.
+        """
+        state = self.state()
+        if not state or state['generation'] is None or state.get('current_at') is None:
+            return None
+        return max(0.0, time.time() - state['current_at'])
+
+    def stats(self):
+        stats = {'replica': self.path, 'source': self.source, 'publish_dir': self.publish_dir}
+        if self.path:
+            state = self.state() or {}
+            stats.update(state=state, lag_seconds=self.lag())
+        if self.publisher:
+            manifest = self.publisher.manifest() or {}
+            stats['published'] = {key: manifest.get(key)
+                                  for key in ('generation', 'sequence', 'published_at', 'current_at')}
+        return stats
+
+    def expose(self):
+        """Replica lag in the Prometheus text exposition format"""
+        lag = self.lag() if self.path else None
+        if lag is None:
+            return ''
+        return ('# HELP nextwave_replica_lag_seconds Seconds since the primary last held the replica\'s data\n'
+                '# TYPE nextwave_replica_lag_seconds gauge\n'
+                f'nextwave_replica_lag_seconds {lag}\n')
+
+    def serve_file(self, name):
+        """Published files for readers presenting the replication token"""
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {self.token}'.encode()):
+            abort(403)
+        if name.startswith('.'):
+            abort(404)
+        response = send_from_directory(os.path.abspath(self.publish_dir), name)
+        # Token-protected: shared caches must not keep a copy
+        response.cache_control.no_store = True
+        response.cache_control.private = True
+        return response
+
+    # Background work
+
+    def start(self):
+        """Start this process's publish or sync thread (cheap after the first call)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            if self.publisher and self.publish_interval:
+                threading.Thread(target=self._loop, args=(self.publisher.publish, self.publish_interval),
+                                 name='replication-publish', daemon=True).start()
+            if self.path and self.source and self.sync_interval:
+                threading.Thread(target=self._loop, args=(self.sync, self.sync_interval),
+                                 name='replication-sync', daemon=True).start()
+
+    def _loop(self, step, interval):
+        while True:
+            try:
+                step()
+            except Exception:
+                logger.exception('Replication %s failed', step.__name__)
+            time.sleep(interval)
@@ -0,0 +1,294 @@
+"""
+Nextwave Company Website - Full-text search index
+SQLite FTS5 external-content tables for blog posts, services and jobs,
+kept in sync with their source tables by triggers.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from markupsafe import escape, Markup
+
+# Searchable tables: FTS table name, indexed columns and bm25 column weights.
+# Titles weigh more than bodies so a title hit ranks above a passing mention.
+SEARCH_TABLES = {
+    'blog_posts': {
+        'fts': 'blog_posts_fts',
+        'columns': ('title', 'content', 'category'),
+        'weights': (10.0, 1.0, 2.0),
+        'snippet_column': 1,
+    },
+    'services': {
+        'fts': 'services_fts',
+        'columns': ('title', 'description'),
+        'weights': (10.0, 1.0),
+        'snippet_column': 1,
+    },
+    'jobs': {
+        'fts': 'jobs_fts',
+        'columns': ('title', 'description', 'department', 'location'),
+        'weights': (10.0, 1.0, 3.0, 3.0),
+        'snippet_column': 1,
+    },
+}
+
+# Control characters used as snippet markers so the surrounding text can be
+# HTML-escaped before the markers are turned into <mark> tags.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def create_search_index(cursor):
+    """Create FTS tables and sync triggers, populating any new table"""
+    for table, spec in SEARCH_TABLES.items():
+        fts = spec['fts']
+        columns = ', '.join(spec['columns'])
+        new_values = ', '.join(f'new.{col}' for col in spec['columns'])
+        old_values = ', '.join(f'old.{col}' for col in spec['columns'])
+
+        exists = cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).fetchone()[0]
+
+        cursor.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                            {columns},
+                            content='{table}',
+                            content_rowid='id',
+                            tokenize='porter unicode61',
+                            prefix='2 3'
+                        )''')
+
+        cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                            INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_values});
+                        END''')
+        cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                            INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                        END''')
+        cursor.execute(f'''CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN
+                            INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                            INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_values});
+                        END''')
+
+        # Rows written before the index existed are picked up by a rebuild
+        if not exists:
+            cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def rebuild_search_index(conn):
+    """Rebuild every FTS table from its content table and optimize it"""
+    counts = {}
+    for table, spec in SEARCH_TABLES.items():
+        fts = spec['fts']
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+        counts[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    conn.commit()
+    return counts
+
+
+def build_match_query(text):
+    """Turn free-form user input into a safe FTS5 MATCH expression
+
+    Every token is quoted so FTS5 operators in user input are treated as
+    plain text, and the last token is a prefix query for type-ahead.
+    Returns None when the input has no searchable tokens.
+    """
+    tokens = _TOKEN_RE.findall(text or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight_snippet(raw):
+    """Escape a raw FTS snippet and wrap matched terms in <mark> tags"""
+    if not raw:
+        return Markup('')
+    html = str(escape(raw))
+    return Markup(html.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search(conn, table, text, where='', params=(), limit=None, offset=0, snippet_tokens=16):
+    """Ranked full-text search over one content table
+
+    `where` is an extra SQL condition on the content table (aliased `c`),
+    with its values in `params`. Rows come back ordered by bm25 rank and
+    carry `rank` and `snippet` columns in addition to the table's own.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    spec = SEARCH_TABLES[table]
+    fts = spec['fts']
+    weights = ', '.join(str(w) for w in spec['weights'])
+
+    query = f'''SELECT c.*,
+                       bm25({fts}, {weights}) AS rank,
+                       snippet({fts}, {spec['snippet_column']}, '{_MARK_START}', '{_MARK_END}', '…', {int(snippet_tokens)}) AS snippet
+                FROM {fts}
+                JOIN {table} c ON c.id = {fts}.rowid
+                WHERE {fts} MATCH ?'''
+    query_params = [match]
+
+    if where:
+        query += f' AND ({where})'
+        query_params.extend(params)
+
+    query += ' ORDER BY rank'
+
+    if limit is not None:
+        query += ' LIMIT ? OFFSET ?'
+        query_params.extend([int(limit), int(offset)])
+
+    return conn.execute(query, query_params).fetchall()
+
+
+def count(conn, table, text, where='', params=()):
+    """Number of rows a search() with the same arguments would return"""
+    match = build_match_query(text)
+    if match is None:
+        return 0
+
+    fts = SEARCH_TABLES[table]['fts']
+    query = f'''SELECT COUNT(*) FROM {fts}
+                JOIN {table} c ON c.id = {fts}.rowid
+                WHERE {fts} MATCH ?'''
+    query_params = [match]
+
+    if where:
+        query += f' AND ({where})'
+        query_params.extend(params)
+
+    return conn.execute(query, query_params).fetchone()[0]
+
+
+# Content types covered by the global search, in display order
+SEARCH_TYPES = {
+    'blog': {'table': 'blog_posts', 'where': 'c.published = 1', 'label': 'Blog Post'},
+    'service': {'table': 'services', 'where': '1', 'label': 'Service'},
+    'job': {'table': 'jobs', 'where': 'c.active = 1', 'label': 'Job Opening'},
+}
+
+
+def search_all(conn, text, limit, snippet_tokens=12, types=None):
+    """One ranked query over the given search types (default: all)
+
+    Each row has type, id, title, rank, snippet and body (the indexed
+    columns concatenated, used to refine results for longer prefixes).
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    selects = []
+    params = []
+    for type_name, type_spec in SEARCH_TYPES.items():
+        if types and type_name not in types:
+            continue
+        table = type_spec['table']
+        spec = SEARCH_TABLES[table]
+        fts = spec['fts']
+        weights = ', '.join(str(w) for w in spec['weights'])
+        body = " || ' ' || ".join(f"IFNULL(c.{col}, '')" for col in spec['columns'])
+        selects.append(f'''SELECT '{type_name}' AS type, c.id AS id, c.title AS title,
+                                  bm25({fts}, {weights}) AS rank,
+                                  snippet({fts}, {spec['snippet_column']}, '{_MARK_START}', '{_MARK_END}', '…', {int(snippet_tokens)}) AS snippet,
+                                  {body} AS body
+                           FROM {fts}
+                           JOIN {table} c ON c.id = {fts}.rowid
+                           WHERE {fts} MATCH ? AND {type_spec['where']}''')
+        params.append(match)
+
+    query = ' UNION ALL '.join(selects) + ' ORDER BY rank LIMIT ?'
+    params.append(int(limit))
+    return conn.execute(query, params).fetchall()
+
+
+class SearchMemo:
+    """LRU memo of recent global search results
+
+    Each entry keeps up to `candidates` ranked matches for a normalized
+    query and set of result types. When an entry holds every match ("complete"), a longer query that
+    only extends the last token ("clo" -> "clou") is answered by filtering
+    that entry in memory instead of querying SQLite. The filter checks word
+    prefixes on the raw indexed text, so it can differ from FTS5's stemmed
+    matching on a handful of inflected words. The whole memo is dropped when
+    the content version stamp changes.
+    """
+
+    def __init__(self, size=256, candidates=200):
+        self.size = size
+        self.candidates = candidates
+        self._entries = OrderedDict()
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text):
+        return [token.lower() for token in _TOKEN_RE.findall(text or '')]
+
+    @staticmethod
+    def _key(tokens, types):
+        return ' '.join(tokens) + '|' + ','.join(sorted(types or ()))
+
+    def lookup(self, stamp, tokens, types=None):
+        """(results, source) for a query, or (None, 'miss')"""
+        key = self._key(tokens, types)
+        with self._lock:
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], 'hit'
+
+            head, last = tokens[:-1], tokens[-1]
+            for length in range(len(last) - 1, 0, -1):
+                parent = self._entries.get(self._key(head + [last[:length]], types))
+                if parent is None or not parent[0]:
+                    continue
+                results = [row for row in parent[1] if any(word.startswith(last) for word in row['words'])]
+                self._store(key, results, complete=True)
+                self.prefix_hits += 1
+                return results, 'prefix'
+
+            self.misses += 1
+            return None, 'miss'
+
+    def store(self, stamp, tokens, rows, types=None):
+        """Remember the ranked rows from search_all() for a query"""
+        results = []
+        for row in rows[:self.candidates]:
+            result = dict(row)
+            result['words'] = frozenset(word.lower() for word in _TOKEN_RE.findall(result.pop('body') or ''))
+            results.append(result)
+        with self._lock:
+            if stamp == self._stamp:
+                self._store(self._key(tokens, types), results, complete=len(rows) <= self.candidates)
+        return results
+
+    def _store(self, key, results, complete):
+        self._entries[key] = (complete, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.prefix_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'prefix_hits': self.prefix_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.prefix_hits) / total if total else 0.0,
+            }
@@ -9,6 +9,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initContactForm();
     initJobFilters();
     initBlogFilters();
+    initInfiniteScroll();
     
     // Load saved theme
     const savedTheme = localStorage.getItem('theme') || 'light';
@@ -111,6 +112,7 @@ function displaySearchResults(results) {
         <div class="search-result-item">
             <a href="${result.url}" onclick="closeSearchDropdown()">
                 <div class="fw-bold">${result.title}</div>
+                ${result.snippet ? `<div class="search-result-snippet small text-muted">${result.snippet}</div>` : ''}
                 <div class="search-result-type">${result.type}</div>
             </a>
         </div>
@@ -228,6 +230,60 @@ function initBlogFilters() {
     });
 }
 
+// Infinite Scroll for paginated listings
+function initInfiniteScroll() {
+    const loadMoreButtons = document.querySelectorAll('[data-load-more]');
+    
+    loadMoreButtons.forEach(button => {
+        const container = document.getElementById(button.dataset.loadMore);
+        if (!container || !container.dataset.endpoint) return;
+        
+        let loading = false;
+        
+        const loadNextPage = () => {
+            if (loading || !button.dataset.nextCursor) return;
+            loading = true;
+            
+            // Keep the current search and filters, continue after the cursor
+            const params = new URLSearchParams(window.location.search);
+            params.set('cursor', button.dataset.nextCursor);
+            
+            fetch(`${container.dataset.endpoint}?${params.toString()}`)
+                .then(response => response.json())
+                .then(data => {
+                    container.insertAdjacentHTML('beforeend', data.html);
+                    if (data.next_cursor) {
+                        button.dataset.nextCursor = data.next_cursor;
+                    } else {
+                        observer.disconnect();
+                        button.parentElement.remove();
+                    }
+                })
+                .catch(error => {
+                    console.error('Load more error:', error);
+                    showNotification('Could not load more results. Please try again.', 'danger');
+                })
+                .finally(() => {
+                    loading = false;
+                });
+        };
+        
+        button.addEventListener('click', function(e) {
+            e.preventDefault();
+            loadNextPage();
+        });
+        
+        // Load the next page shortly before the button scrolls into view
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadNextPage();
+            }
+        }, { rootMargin: '0px 0px 400px 0px' });
+        
+        observer.observe(button);
+    });
+}
+
 // Utility Functions
 function showNotification(message, type = 'success') {
     const notification = document.createElement('div');
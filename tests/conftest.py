@@ -0,0 +1,20 @@
+import pytest
+import db
+import migrations
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Path of a freshly migrated database"""
+    path = str(tmp_path / 'nextwave.db')
+    conn = db.connect(path)
+    migrations.migrate(conn)
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def conn(database):
+    conn = db.connect(database)
+    yield conn
+    conn.close()
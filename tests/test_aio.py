@@ -0,0 +1,23 @@
+import asyncio
+import threading
+import aio
+
+
+def test_executor_calls_run_directly():
+    async def view():
+        return await aio.files.run(threading.get_ident), aio.serving_async()
+
+    assert aio.run_inline(view)() == (threading.get_ident(), False)
+
+
+def test_view_may_await_other_things():
+    async def view():
+        await asyncio.sleep(0.01)
+        first = await aio.files.run(threading.get_ident)
+        await asyncio.gather(asyncio.sleep(0), asyncio.sleep(0.01))
+        return first
+
+    run = aio.run_inline(view)
+    assert run() == threading.get_ident()
+    # The thread's loop is reused by the next request
+    assert run() == threading.get_ident()
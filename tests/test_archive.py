@@ -0,0 +1,30 @@
+import os
+from flask import Flask
+import archive
+
+MESSAGES = 'SELECT * FROM archive.contact_messages ORDER BY created_at DESC LIMIT 5'
+APPLICATIONS = 'SELECT * FROM archive.job_applications ORDER BY created_at DESC LIMIT 5'
+
+
+def make_archiver(database):
+    app = Flask(__name__)
+    app.config.update(DATABASE=database, ARCHIVE_PAUSE=0)
+    return archive.Archiver(app)
+
+
+def test_archived_rows_before_any_archive_does_not_create_it(database):
+    archiver = make_archiver(database)
+    assert archiver.archived_rows(MESSAGES, APPLICATIONS) == [[], []]
+    assert not os.path.exists(archiver.path)
+
+
+def test_archived_rows_reads_every_query_from_the_archive(database, conn):
+    conn.execute("INSERT INTO contact_messages (name, email, subject, message, status, created_at) "
+                 "VALUES ('A', 'a@example.com', 'Hello', 'Hi', 'replied', '2000-01-01 00:00:00')")
+    conn.commit()
+    archiver = make_archiver(database)
+    assert archiver.run()['archived']['contact_messages'] == 1
+
+    messages, applications = archiver.archived_rows(MESSAGES, APPLICATIONS)
+    assert [row['email'] for row in messages] == ['a@example.com']
+    assert applications == []
@@ -0,0 +1,38 @@
+import bulk
+
+
+def service(id, title='Consulting'):
+    return {'id': id, 'title': title, 'description': 'Advice'}
+
+
+def test_import_writes_valid_rows(conn):
+    summary = bulk.import_records(conn, 'services', enumerate([service(1), service(2)], 1))
+    assert summary['written'] == 2
+    assert summary['invalid'] == 0
+    assert conn.execute('SELECT COUNT(*) FROM services').fetchone()[0] == 2
+
+
+def test_failing_row_does_not_leave_earlier_rows_of_its_chunk(conn):
+    bulk.import_records(conn, 'services', [(1, service(2, 'Existing'))])
+    # id 2 collides; id 100 comes before it in the same executemany
+    summary = bulk.import_records(conn, 'services', enumerate([service(100), service(2), service(101)], 1))
+    assert summary['written'] == 2
+    assert summary['invalid'] == 1
+    assert summary['errors'][0]['line'] == 2
+    ids = [row[0] for row in conn.execute('SELECT id FROM services ORDER BY id')]
+    assert ids == [2, 100, 101]
+    assert conn.execute('SELECT title FROM services WHERE id = 2').fetchone()[0] == 'Existing'
+
+
+def test_upsert_updates_existing_rows(conn):
+    bulk.import_records(conn, 'services', [(1, service(5, 'Old'))])
+    summary = bulk.import_records(conn, 'services', [(1, service(5, 'New'))], upsert=True)
+    assert summary['written'] == 1
+    assert conn.execute('SELECT title FROM services WHERE id = 5').fetchone()[0] == 'New'
+
+
+def test_invalid_records_are_reported(conn):
+    summary = bulk.import_records(conn, 'services', [(1, {'id': 'x', 'title': 't', 'description': 'd'}),
+                                                      (2, {'title': 't'})])
+    assert summary['written'] == 0
+    assert [e['line'] for e in summary['errors']] == [1, 2]
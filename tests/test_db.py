@@ -0,0 +1,16 @@
+import db
+
+
+def test_new_database_gets_incremental_vacuum_and_wal(tmp_path):
+    conn = db.connect(str(tmp_path / 'new.db'), auto_vacuum='INCREMENTAL')
+    conn.execute('CREATE TABLE t (x)')
+    conn.commit()
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    conn.close()
+
+
+def test_auto_vacuum_leaves_existing_database_alone(database):
+    conn = db.connect(database, auto_vacuum='INCREMENTAL')
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,24 @@
+import live_feed
+
+
+def message(conn, name):
+    conn.execute("INSERT INTO contact_messages (name, email, subject, message) VALUES (?, 'a@example.com', 'Hi', 'Hi')",
+                 (name,))
+
+
+def test_event_feed_is_capped_without_any_maintenance(conn):
+    conn.execute('DROP TRIGGER admin_events_cap')
+    live_feed.cap_events(conn, keep=2)
+    for name in 'ABC':
+        message(conn, name)
+    events, _ = live_feed.read_events(conn, 0)
+    assert [row['name'] for _, _, row in events] == ['B', 'C']
+
+
+def test_prune_drops_expired_events(conn):
+    message(conn, 'A')
+    conn.execute("UPDATE admin_events SET created_at = datetime('now', '-2 hours')")
+    message(conn, 'B')
+    live_feed.prune_events(conn, retention=3600)
+    events, _ = live_feed.read_events(conn, 0)
+    assert [row['name'] for _, _, row in events] == ['B']
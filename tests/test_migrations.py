@@ -0,0 +1,68 @@
+import os
+import shutil
+import threading
+import dashboard_stats
+import db
+import migrations
+
+LATEST = migrations.MIGRATIONS[-1][0]
+
+
+def test_fresh_database_is_migrated_to_latest(conn):
+    assert migrations.schema_version(conn) == LATEST
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'blog_posts', 'table_versions', 'dashboard_stats', 'content_changes', 'admin_events'} <= tables
+
+
+def test_migrate_is_idempotent(conn):
+    assert migrations.migrate(conn) == []
+    assert migrations.schema_version(conn) == LATEST
+
+
+def test_concurrent_migrations_apply_each_step_once(tmp_path):
+    path = str(tmp_path / 'race.db')
+    errors = []
+
+    def run():
+        conn = db.connect(path)
+        try:
+            migrations.migrate(conn)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    conn = db.connect(path)
+    assert migrations.schema_version(conn) == LATEST
+    conn.close()
+
+
+def test_unversioned_database_is_brought_up_to_date(tmp_path):
+    shipped = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'nextwave.db')
+    path = str(tmp_path / 'shipped.db')
+    shutil.copy(shipped, path)
+    conn = db.connect(path)
+    migrations.migrate(conn)
+    assert migrations.schema_version(conn) == LATEST
+    conn.execute('SELECT name, version FROM table_versions').fetchall()
+    conn.close()
+
+
+def test_route_queries_use_indexes_on_a_fresh_database(conn):
+    scans = [name for name, plan, full_scan in migrations.check_query_plans(conn) if full_scan]
+    assert scans == []
+
+
+def test_dashboard_counters_follow_the_tables(conn):
+    before = dashboard_stats.read_counters(conn)
+    conn.execute("INSERT INTO contact_messages (name, email, subject, message, status) "
+                 "VALUES ('A', 'a@example.com', 'Hello', 'Hi', 'unread')")
+    after = dashboard_stats.read_counters(conn)
+    assert after['unread_messages'] == before['unread_messages'] + 1
+    assert dashboard_stats.reconcile(conn, fix=False) == {}
@@ -0,0 +1,38 @@
+from flask import Flask
+import prerender
+
+
+def make_app(database, directory, **config):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config.update(DATABASE=database, PRERENDER_DIR=str(directory), **config)
+
+    @app.route('/about')
+    def about():
+        return 'live'
+
+    prerender.Prerenderer(app)
+    page = directory / 'about' / 'index.html'
+    page.parent.mkdir(parents=True)
+    page.write_text('snapshot')
+    return app
+
+
+def test_snapshot_is_served_while_watched(database, tmp_path):
+    app = make_app(database, tmp_path / 'snapshot')
+    assert app.extensions['prerender'].watch_interval == prerender.DEFAULT_WATCH_INTERVAL > 0
+    assert app.test_client().get('/about').get_data(as_text=True) == 'snapshot'
+
+
+def test_unwatched_snapshot_is_not_served(database, tmp_path):
+    app = make_app(database, tmp_path / 'snapshot', PRERENDER_WATCH_INTERVAL=0)
+    assert app.test_client().get('/about').get_data(as_text=True) == 'live'
+
+
+def test_change_log_is_capped_without_any_maintenance(conn):
+    conn.execute('DROP TRIGGER content_changes_cap')
+    prerender.cap_change_log(conn, keep=3)
+    for i in range(5):
+        conn.execute('INSERT INTO services (title, description) VALUES (?, ?)', (f'Service {i}', 'Text'))
+    ids = [row[0] for row in conn.execute('SELECT id FROM content_changes ORDER BY id')]
+    assert len(ids) == 3 and ids == list(range(ids[0], ids[0] + 3))
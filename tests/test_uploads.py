@@ -0,0 +1,13 @@
+import uploads
+
+
+def test_postprocess_records_metadata_outside_the_upload_folder(database, conn, tmp_path):
+    path = tmp_path / 'ab' / 'abcdef.pdf'
+    path.parent.mkdir()
+    path.write_bytes(b'%PDF-1.4 resume')
+
+    uploads.postprocess(database, str(path), 'Jane Doe CV.pdf', 'application/pdf', 15)
+
+    row = conn.execute('SELECT * FROM upload_metadata WHERE path = ?', (str(path),)).fetchone()
+    assert (row['original_name'], row['detected_type'], row['size']) == ('Jane Doe CV.pdf', 'application/pdf', 15)
+    assert sorted(p.name for p in path.parent.iterdir()) == ['abcdef.pdf']
@@ -0,0 +1,65 @@
+import json
+import time
+from flask import Flask
+import write_behind
+
+
+def make_queue(database, directory):
+    app = Flask(__name__)
+    app.config.update(DATABASE=database, WRITE_BEHIND_DIR=str(directory), WRITE_BEHIND_FSYNC=False)
+    return write_behind.WriteBehindQueue(app)
+
+
+def message(name):
+    return {'name': name, 'email': 'a@example.com', 'subject': 'Hello', 'message': 'Hi'}
+
+
+def test_poison_entry_is_dead_lettered_without_blocking_the_queue(database, conn, tmp_path):
+    queue = make_queue(database, tmp_path / 'journal')
+    queue.enqueue('contact_messages', message('A'))
+    poison = queue.enqueue('contact_messages', message(None))  # name is NOT NULL
+    queue.enqueue('contact_messages', message('B'))
+    queue.stop(timeout=5)
+
+    assert queue.stats()['queue_depth'] == 0
+    assert [row[0] for row in conn.execute('SELECT name FROM contact_messages ORDER BY id')] == ['A', 'B']
+    lines = (tmp_path / 'journal' / write_behind.DEAD_LETTER).read_text().splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [poison]
+    assert queue.stats()['dead_lettered'] == 1
+
+
+
+def orphan_journal(directory, entries):
+    directory.mkdir(exist_ok=True)
+    with open(directory / 'journal-999999.jsonl', 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+
+
+def test_orphaned_journal_is_replayed_at_startup(database, conn, tmp_path):
+    entries = [{'id': f'entry-{i}', 'kind': 'contact_messages', 'data': message(str(i)), 'ts': time.time()}
+               for i in range(3)]
+    orphan_journal(tmp_path / 'journal', entries)
+    make_queue(database, tmp_path / 'journal')
+
+    assert conn.execute('SELECT COUNT(*) FROM contact_messages').fetchone()[0] == 3
+    assert not (tmp_path / 'journal' / 'journal-999999.jsonl').exists()
+
+
+def test_applied_ids_outlive_retention_while_a_journal_needs_them(database, conn, tmp_path):
+    two_days_ago = time.time() - 2 * 24 * 3600
+    entries = [{'id': f'entry-{i}', 'kind': 'contact_messages', 'data': message(str(i)), 'ts': two_days_ago}
+               for i in range(3)]
+    write_behind.apply_entries(conn, entries)
+    conn.execute("UPDATE applied_submissions SET applied_at = datetime(?, 'unixepoch')", (two_days_ago,))
+    conn.commit()
+    queue = make_queue(database, tmp_path / 'journal')
+    orphan_journal(tmp_path / 'journal', entries)
+
+    queue.maintain(conn, force=True)
+    queue.replay()
+    assert conn.execute('SELECT COUNT(*) FROM contact_messages').fetchone()[0] == 3
+
+    # With no journal left, the ids expire as usual
+    queue.maintain(conn, force=True)
+    assert conn.execute('SELECT COUNT(*) FROM applied_submissions').fetchone()[0] == 0
@@ -0,0 +1,239 @@
+"""
+Nextwave Company Website - Resume uploads
+Uploads are streamed from the request body straight into a temp file in the
+upload folder while being hashed, then renamed to a content-addressed path,
+so identical files are stored once. Post-processing runs on a bounded
+background pool after the response has gone out, and records each file's
+metadata in the upload_metadata table: the upload folder is public, so
+nothing about the applicant is written next to the file.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # matches the 5MB limit in main.js
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 32
+INCOMING_DIR = '.incoming'
+
+# Leading bytes of the document types the application form accepts
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+    (b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+]
+
+
+def create_upload_table(c):
+    """Metadata of each stored upload, keyed by its path"""
+    c.execute('''CREATE TABLE IF NOT EXISTS upload_metadata (
+                    path TEXT PRIMARY KEY,
+                    original_name TEXT,
+                    declared_type TEXT,
+                    detected_type TEXT,
+                    size INTEGER NOT NULL,
+                    stored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID''')
+
+
+class UploadStats:
+    """Thread-safe counters for upload throughput and the processing queue"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.deduplicated = 0
+        self.queued = 0
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def record_upload(self, size, seconds, deduplicated):
+        with self._lock:
+            self.files += 1
+            self.bytes += size
+            self.seconds += seconds
+            self.deduplicated += deduplicated
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'files': self.files,
+                'bytes': self.bytes,
+                'deduplicated': self.deduplicated,
+                'throughput_bytes_per_sec': self.bytes / self.seconds if self.seconds else 0.0,
+                'queue_depth': self.queued - self.processed - self.failed,
+                'processed': self.processed,
+                'rejected': self.rejected,
+                'failed': self.failed,
+            }
+
+
+class HashingFile:
+    """Writable temp file that hashes and size-checks data as it arrives"""
+
+    def __init__(self, directory, max_size):
+        os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', delete=False)
+        self.path = self._file.name
+        self.max_size = max_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.started = time.perf_counter()
+        self.committed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise RequestEntityTooLarge()
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def close(self):
+        # Uploads that were never committed (failed validation, aborted
+        # requests) must not leave temp files behind
+        self._file.close()
+        if not self.committed:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request class that streams file parts into HashingFile objects"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        folder = current_app.config['UPLOAD_FOLDER']
+        return HashingFile(os.path.join(folder, INCOMING_DIR), current_app.config.get('MAX_CONTENT_LENGTH'))
+
+
+class UploadStore:
+    """Content-addressed resume storage with background post-processing"""
+
+    def __init__(self, app=None):
+        self.stats = UploadStats()
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAX_CONTENT_LENGTH', DEFAULT_MAX_CONTENT_LENGTH)
+        app.request_class = UploadRequest
+        self.folder = app.config['UPLOAD_FOLDER']
+        self.workers = app.config.get('UPLOAD_WORKERS', DEFAULT_WORKERS)
+        self.queue_size = app.config.get('UPLOAD_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        app.extensions['uploads'] = self
+
+    def _pool(self):
+        # Created lazily so each gunicorn worker gets its own threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload')
+            self._slots = threading.BoundedSemaphore(self.queue_size)
+        return self._executor
+
+    def save(self, file):
+        """Store an uploaded file under its SHA-256 and return the path
+
+        Identical content is stored once; the original filename only
+        contributes its extension.
+        """
+        stream = file.stream
+        if not isinstance(stream, HashingFile):
+            stream = self._spool(file)
+
+        stream.flush()
+        digest = stream.sha256.hexdigest()
+        extension = os.path.splitext(secure_filename(file.filename or ''))[1].lower()
+        directory = os.path.join(self.folder, digest[:2])
+        path = os.path.join(directory, digest + extension)
+        os.makedirs(directory, exist_ok=True)
+
+        deduplicated = os.path.exists(path)
+        if not deduplicated:
+            os.replace(stream.path, path)
+            stream.committed = True
+
+        stream.close()
+
+        self.stats.record_upload(stream.size, time.perf_counter() - stream.started, deduplicated)
+        if not deduplicated:
+            self.submit(postprocess, current_app.config['DATABASE'], path, file.filename, file.mimetype, stream.size)
+        return path
+
+    def _spool(self, file):
+        """Copy a file that bypassed UploadRequest through a HashingFile"""
+        stream = HashingFile(os.path.join(self.folder, INCOMING_DIR), None)
+        while True:
+            chunk = file.stream.read(64 * 1024)
+            if not chunk:
+                break
+            stream.write(chunk)
+        return stream
+
+    def submit(self, func, *args):
+        """Queue background work, dropping it when the queue is full"""
+        pool = self._pool()
+        if not self._slots.acquire(blocking=False):
+            self.stats.incr('rejected')
+            logger.warning('Upload processing queue full, skipping %s', func.__name__)
+            return None
+
+        self.stats.incr('queued')
+
+        def run():
+            try:
+                func(*args)
+                self.stats.incr('processed')
+            except Exception:
+                self.stats.incr('failed')
+                logger.exception('Upload post-processing failed')
+            finally:
+                self._slots.release()
+
+        return pool.submit(run)
+
+
+def sniff_type(path):
+    """Detect a document type from its leading bytes"""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    for signature, mimetype in SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    return None
+
+
+def postprocess(database, path, original_name, declared_type, size):
+    """Sniff the stored file's real type and record its metadata"""
+    detected = sniff_type(path)
+    if detected is None:
+        logger.warning('Upload %s is not a recognised document type', path)
+    conn = db.connect(database)
+    try:
+        conn.execute('INSERT OR REPLACE INTO upload_metadata (path, original_name, declared_type, detected_type, size) '
+                     'VALUES (?, ?, ?, ?, ?)', (path, original_name, declared_type, detected, size))
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,370 @@
+"""
+Nextwave Company Website - Write-behind queue for form submissions
+Contact messages and job applications are appended to a durable local
+journal and acknowledged immediately; a background writer flushes them to
+SQLite in batched transactions. Delivery is at-least-once, and an
+applied-id table makes replays idempotent. An entry the database rejects
+outright (not a lock or I/O error) is moved to a dead-letter file instead
+of blocking the entries behind it.
+
+Journals left by dead processes are replayed at startup and deleted once
+applied. The writer thread prunes old applied ids every MAINTENANCE_INTERVAL
+seconds, keeping any a remaining journal could still need.
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import atexit
+import sqlite3
+import threading
+import logging
+from collections import deque
+import db
+
+logger = logging.getLogger(__name__)
+
+# Journal kind -> columns accepted for the target table
+TABLES = {
+    'contact_messages': ('name', 'email', 'subject', 'message'),
+    'job_applications': ('job_id', 'name', 'email', 'phone', 'resume_path', 'cover_letter'),
+}
+
+DEFAULT_DIR = 'journal'
+DEAD_LETTER = 'dead-letter.jsonl'
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_INTERVAL = 0.1    # seconds the writer waits to gather a batch
+MAX_RETRY_DELAY = 5.0
+APPLIED_RETENTION = 24 * 3600  # seconds applied ids are kept to dedupe replays (longer while a journal needs them)
+MAINTENANCE_INTERVAL = 300.0   # seconds between applied id prunes
+
+
+def create_applied_table(c):
+    """Table recording which journal entries have reached the database"""
+    c.execute('''CREATE TABLE IF NOT EXISTS applied_submissions (
+                    id TEXT PRIMARY KEY,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID''')
+
+
+def apply_entries(conn, entries):
+    """Insert journal entries in one transaction, skipping ones already applied
+
+    Returns the number of rows written.
+    """
+    written = 0
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for entry in entries:
+            columns = TABLES.get(entry.get('kind'))
+            if columns is None:
+                logger.error('Dropping journal entry %s of unknown kind %r', entry.get('id'), entry.get('kind'))
+                continue
+            claimed = conn.execute('INSERT OR IGNORE INTO applied_submissions (id) VALUES (?)', (entry['id'],))
+            if claimed.rowcount == 0:
+                continue
+            data = entry['data']
+            conn.execute(
+                f"INSERT INTO {entry['kind']} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [data.get(column) for column in columns]
+            )
+            written += 1
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return written
+
+
+def prune_applied(conn, oldest_journaled=None):
+    """Forget applied ids older than APPLIED_RETENTION
+
+    An entry is applied after it is journaled, so ids applied since the
+    oldest entry still in a journal (`oldest_journaled`, a timestamp) are
+    kept however old, or replaying that journal would write duplicates.
+    """
+    cutoff = time.time() - APPLIED_RETENTION
+    if oldest_journaled is not None:
+        # applied_at has whole seconds; a minute's margin for clock steps
+        cutoff = min(cutoff, oldest_journaled - 60)
+    conn.execute("DELETE FROM applied_submissions WHERE applied_at < datetime(?, 'unixepoch')", (cutoff,))
+
+
+def oldest_journaled(directory):
+    """Timestamp of the oldest entry in any journal file, or None"""
+    oldest = None
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return None
+    for name in names:
+        if not name.startswith('journal-'):
+            continue
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                # Entries are appended in order, so the first is the oldest
+                ts = json.loads(f.readline())['ts']
+        except (OSError, ValueError, KeyError):
+            continue
+        oldest = ts if oldest is None else min(oldest, ts)
+    return oldest
+
+
+def read_journal(path):
+    """Entries in a journal file, skipping a torn final line"""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                logger.warning('Skipping unreadable journal line in %s', path)
+    return entries
+
+
+class WriteBehindQueue:
+    """Per-process journal plus background batch writer"""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = deque()
+        self._pid = None
+        self._journal = None
+        self._journal_path = None
+        self._thread = None
+        self._last_prune = 0.0
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.database = app.config['DATABASE']
+        self.directory = app.config.get('WRITE_BEHIND_DIR', DEFAULT_DIR)
+        self.batch_size = app.config.get('WRITE_BEHIND_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.interval = app.config.get('WRITE_BEHIND_INTERVAL', DEFAULT_INTERVAL)
+        self.fsync = app.config.get('WRITE_BEHIND_FSYNC', True)
+        self.enabled = app.config.get('WRITE_BEHIND_ENABLED', True)
+        app.extensions['write_behind'] = self
+
+        if self.enabled:
+            # Journals orphaned by a crash are applied now, not on the first request
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self.replay()
+            except Exception:
+                logger.exception('Replaying journals at startup failed; retrying on the first request')
+
+        @app.before_request
+        def start_write_behind():
+            self.start()
+
+        atexit.register(self.stop)
+
+    def _reset_stats(self):
+        self._flushed = 0
+        self._batches = 0
+        self._last_batch = 0
+        self._max_batch = 0
+        self._failures = 0
+        self._dead_lettered = 0
+        self._last_flush_lag = 0.0
+
+    def start(self):
+        """Open this process's journal, replay orphaned ones, start the writer
+
+        Cheap after the first call; re-runs in a forked gunicorn worker.
+        """
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._pending = deque()
+            self._reset_stats()
+            os.makedirs(self.directory, exist_ok=True)
+
+            path = os.path.join(self.directory, f'journal-{self._pid}.jsonl')
+            self._journal = open(path, 'a', encoding='utf-8')
+            # Held for the life of the process; a lockable journal is orphaned
+            fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._journal_path = path
+
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+        self.replay()
+
+    def replay(self):
+        """Apply journals left behind by processes that are no longer running"""
+        replayed = 0
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if not name.startswith('journal-') or path == self._journal_path:
+                continue
+            with open(path, 'a+', encoding='utf-8') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # owner is alive
+                entries = read_journal(path)
+                conn = db.connect(self.database)
+                try:
+                    for start in range(0, len(entries), self.batch_size):
+                        replayed += self.apply(conn, entries[start:start + self.batch_size])
+                finally:
+                    conn.close()
+                os.remove(path)
+        if replayed:
+            logger.info('Replayed %d journaled submissions', replayed)
+        return replayed
+
+    def enqueue(self, kind, data):
+        """Durably journal a submission and return its id"""
+        if kind not in TABLES:
+            raise ValueError(f'Unknown submission kind: {kind}')
+        entry = {'id': uuid.uuid4().hex, 'kind': kind, 'data': data, 'ts': time.time()}
+
+        if not self.enabled:
+            conn = db.connect(self.database)
+            try:
+                apply_entries(conn, [entry])
+                self.maintain(conn)
+            finally:
+                conn.close()
+            return entry['id']
+
+        self.start()
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending.append(entry)
+        self._wakeup.set()
+        return entry['id']
+
+    def _run(self):
+        conn = db.connect(self.database)
+        delay = None
+        while True:
+            woken = self._wakeup.wait(delay or MAINTENANCE_INTERVAL)
+            self._wakeup.clear()
+            # Let a burst accumulate so it is written in one transaction
+            if woken and len(self._pending) < self.batch_size:
+                time.sleep(self.interval)
+            try:
+                while self.flush_batch(conn):
+                    pass
+                self.maintain(conn)
+                delay = None
+            except Exception:
+                with self._stats_lock:
+                    self._failures += 1
+                logger.exception('Write-behind flush failed, retrying')
+                delay = min((delay or self.interval) * 2, MAX_RETRY_DELAY)
+
+    def flush_batch(self, conn):
+        """Write up to one batch of pending entries; False when none remain"""
+        with self._lock:
+            batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return False
+
+        self.apply(conn, batch)
+
+        with self._lock:
+            for _ in batch:
+                self._pending.popleft()
+            if not self._pending:
+                # Everything journaled is in the database: start a fresh journal
+                self._journal.truncate(0)
+
+        with self._stats_lock:
+            self._flushed += len(batch)
+            self._batches += 1
+            self._last_batch = len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._last_flush_lag = time.time() - batch[0]['ts']
+        return True
+
+    def apply(self, conn, entries):
+        """apply_entries(), dead-lettering entries that can never be written
+
+        Lock and I/O errors (OperationalError) propagate so the batch is
+        retried as a whole. Any other failure is retried one entry at a time,
+        already applied entries being skipped by id.
+        """
+        try:
+            return apply_entries(conn, entries)
+        except sqlite3.OperationalError:
+            raise
+        except Exception:
+            if len(entries) == 1:
+                self._dead_letter(entries[0])
+                return 0
+        written = 0
+        for entry in entries:
+            try:
+                written += apply_entries(conn, [entry])
+            except sqlite3.OperationalError:
+                raise
+            except Exception:
+                self._dead_letter(entry)
+        return written
+
+    def _dead_letter(self, entry):
+        """Set aside an entry the database rejects, for inspection and manual replay"""
+        logger.exception('Moving journal entry %s to %s', entry.get('id'), DEAD_LETTER)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, DEAD_LETTER), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        with self._stats_lock:
+            self._dead_lettered += 1
+
+    def maintain(self, conn, force=False):
+        """Prune applied ids if MAINTENANCE_INTERVAL has passed"""
+        if not force and time.time() - self._last_prune < MAINTENANCE_INTERVAL:
+            return
+        self._last_prune = time.time()
+        try:
+            prune_applied(conn, oldest_journaled(self.directory))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception('Pruning applied ids failed')
+
+    def stop(self, timeout=5.0):
+        """Give the writer a chance to drain before the process exits"""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            self._wakeup.set()
+            time.sleep(0.05)
+
+    def stats(self):
+        with self._lock:
+            depth = len(self._pending)
+            oldest = self._pending[0]['ts'] if depth else None
+        with self._stats_lock:
+            return {
+                'enabled': self.enabled,
+                'queue_depth': depth,
+                'lag_seconds': time.time() - oldest if oldest else 0.0,
+                'last_flush_lag_seconds': self._last_flush_lag,
+                'flushed': self._flushed,
+                'batches': self._batches,
+                'avg_batch_size': self._flushed / self._batches if self._batches else 0.0,
+                'last_batch_size': self._last_batch,
+                'max_batch_size': self._max_batch,
+                'failures': self._failures,
+                'dead_lettered': self._dead_lettered,
+            }